@@ -0,0 +1,111 @@
+"""
+Micro-benchmark of commit and modification filters.
+
+Compare applying lists of filters one by one with the compiled predicates on
+synthetic commits and modifications.
+
+Usage: python benchmarks/bench_filters.py [--records 2000000]
+"""
+import argparse
+import random
+import time
+
+from coverage_plot.fake_implementations import (
+    FakeCommit,
+    FakeDeveloper,
+    FakeModification,
+)
+from coverage_plot.git_changes import (
+    ExcludeAllModifications,
+    ExcludeAuthor,
+    ExcludeMessage,
+    IncludeAllCommits,
+    IncludeFile,
+    apply_commit_filters,
+    apply_modification_filters,
+    compile_commit_filters,
+    compile_modification_filters,
+)
+
+COMMIT_FILTERS = [
+    ExcludeAuthor("bot"),
+    ExcludeAuthor("ci"),
+    ExcludeMessage("yapf"),
+    ExcludeMessage("black"),
+    ExcludeMessage("literals"),
+    IncludeAllCommits(),
+]
+MODIFICATION_FILTERS = [
+    IncludeFile("*.py"),
+    IncludeFile("*.pyx"),
+    IncludeFile("*.pyi"),
+    ExcludeAllModifications(),
+]
+AUTHORS = ["John Doe", "Jane Roe", "dependabot", "Anna Smith"]
+MESSAGES = ["Fix a bug", "Add feature", "Apply black formatting", "Update docs"]
+EXTENSIONS = ["py", "pyi", "md", "txt", "cfg", "pyx", "js"]
+
+
+def make_commits(num_records: int):
+    rnd = random.Random(42)
+    return [
+        FakeCommit(
+            author=FakeDeveloper(name=rnd.choice(AUTHORS)),
+            msg=rnd.choice(MESSAGES),
+        )
+        for _ in range(num_records)
+    ]
+
+
+def make_modifications(num_records: int):
+    rnd = random.Random(42)
+    return [
+        FakeModification(
+            path=f"src/pkg_{rnd.randrange(100)}/mod_{i}.{rnd.choice(EXTENSIONS)}"
+        )
+        for i in range(num_records)
+    ]
+
+
+def measure(title: str, func, records) -> float:
+    start = time.perf_counter()
+    for record in records:
+        func(record)
+    elapsed = time.perf_counter() - start
+    print(f"{title:<40} {elapsed:8.3f}s")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--records", type=int, default=2_000_000)
+    args = parser.parse_args()
+
+    commits = make_commits(args.records)
+    baseline = measure(
+        "apply_commit_filters",
+        lambda commit: apply_commit_filters(commit, COMMIT_FILTERS),
+        commits,
+    )
+    compiled = measure(
+        "compile_commit_filters", compile_commit_filters(COMMIT_FILTERS), commits
+    )
+    print(f"{'speedup':<40} {baseline / compiled:8.2f}x\n")
+    del commits
+
+    modifications = make_modifications(args.records)
+    baseline = measure(
+        "apply_modification_filters",
+        lambda mod: apply_modification_filters(mod, MODIFICATION_FILTERS),
+        modifications,
+    )
+    compiled = measure(
+        "compile_modification_filters",
+        compile_modification_filters(MODIFICATION_FILTERS),
+        modifications,
+    )
+    print(f"{'speedup':<40} {baseline / compiled:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
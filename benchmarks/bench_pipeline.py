@@ -0,0 +1,253 @@
+"""
+Benchmark of the coverage-plot pipeline on synthetic reports and repositories.
+
+Measure wall time and peak memory of every pipeline stage, from importing the
+report to building the plot and mining the git history. Results are saved in a
+JSON file, and two result files can be compared to find regressions.
+
+Usage:
+    python benchmarks/bench_pipeline.py run [--sizes 1000,10000] [--commits 2000]
+        [--output results.json]
+    python benchmarks/bench_pipeline.py compare baseline.json results.json
+        [--threshold 1.2]
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from synthetic import (
+    make_git_repo,
+    make_paths,
+    write_cobertura_xml,
+    write_coverage_json,
+)
+
+from coverage_plot.git_changes import (
+    IncludeAllCommits,
+    IncludeAllModifications,
+    get_git_changes,
+)
+from coverage_plot.importance_filesize import FileSizeImportance
+from coverage_plot.importance_recency import GitImportance
+from coverage_plot.plot import (
+    build_tree,
+    export_df,
+    import_json_file,
+    import_xml_file,
+    make_path_components,
+    plot_treemap,
+)
+
+RESULTS_VERSION = 1
+DEFAULT_SIZES = "1000,10000,100000"
+
+
+def measure(
+    results: List[Dict[str, Any]],
+    stage: str,
+    size: int,
+    func: Callable[[], Any],
+    trace_memory: bool = True,
+) -> Any:
+    """
+    Run the stage, record its wall time and peak memory, and return its result.
+
+    Tracing memory allocations slows the code down, so the stage is run twice:
+    first for the wall time, then for the peak memory.
+    """
+    start = time.perf_counter()
+    result = func()
+    wall_time = time.perf_counter() - start
+
+    peak_memory = None
+    if trace_memory:
+        tracemalloc.start()
+        func()
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    results.append(
+        {
+            "stage": stage,
+            "size": size,
+            "wall_time": wall_time,
+            "peak_memory": peak_memory,
+        }
+    )
+    print(f"{stage:<24} {size:>8} {wall_time:10.3f}s {format_memory(peak_memory):>10}")
+    return result
+
+
+def bench_report(results: List[Dict[str, Any]], tmp_dir: str, size: int, memory: bool):
+    paths = make_paths(size)
+    xml_filename = os.path.join(tmp_dir, f"coverage-{size}.xml")
+    json_filename = os.path.join(tmp_dir, f"coverage-{size}.json")
+    with open(xml_filename, "wt") as fd:
+        write_cobertura_xml(fd, paths)
+    with open(json_filename, "wt") as fd:
+        write_coverage_json(fd, paths)
+
+    measure(
+        results, "import_xml_file", size, lambda: import_xml_file(xml_filename), memory
+    )
+    report = measure(
+        results,
+        "import_json_file",
+        size,
+        lambda: import_json_file(json_filename),
+        memory,
+    )
+    importance = FileSizeImportance(report)
+    report_df = measure(
+        results, "export_df", size, lambda: export_df(report, importance), memory
+    )
+    measure(
+        results,
+        "make_path_components",
+        size,
+        lambda: make_path_components(report_df),
+        memory,
+    )
+    measure(results, "build_tree", size, lambda: build_tree(report, importance), memory)
+    measure(
+        results, "plot_treemap", size, lambda: plot_treemap(report, importance), memory
+    )
+    os.unlink(xml_filename)
+    os.unlink(json_filename)
+
+
+def bench_git(
+    results: List[Dict[str, Any]], tmp_dir: str, size: int, commits: int, memory: bool
+):
+    git_root = os.path.join(tmp_dir, f"repo-{size}")
+    make_git_repo(git_root, make_paths(size), commits)
+
+    def count_changes():
+        changes = get_git_changes(
+            git_root, [IncludeAllCommits()], [IncludeAllModifications()]
+        )
+        return sum(1 for _ in changes)
+
+    measure(results, "get_git_changes", commits, count_changes, memory)
+    measure(results, "GitImportance", commits, lambda: GitImportance(git_root), memory)
+
+
+def run(args) -> None:
+    sizes = [int(size) for size in args.sizes.split(",")]
+    # Dependencies are imported on the first use, which would otherwise be
+    # measured as a part of the first stage that needs them
+    import pandas  # noqa: F401
+    import plotly.graph_objects  # noqa: F401
+
+    results: List[Dict[str, Any]] = []
+    with tempfile.TemporaryDirectory(prefix="coverage-plot-bench-") as tmp_dir:
+        for size in sizes:
+            bench_report(results, tmp_dir, size, args.memory)
+        if args.commits:
+            bench_git(results, tmp_dir, args.repo_files, args.commits, args.memory)
+
+    if args.output:
+        document = {
+            "version": RESULTS_VERSION,
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "results": results,
+        }
+        with open(args.output, "wt") as fd:
+            json.dump(document, fd, indent=2)
+
+
+def compare(args) -> None:
+    """Print changes between two result files, and fail on regressions."""
+    baseline = load_results(args.baseline)
+    current = load_results(args.current)
+    regressions = 0
+    for key, result in current.items():
+        if key not in baseline:
+            continue
+        stage, size = key
+        old = baseline[key]
+        time_ratio = result["wall_time"] / old["wall_time"]
+        memory_ratio = ratio(result["peak_memory"], old["peak_memory"])
+        regressed = time_ratio > args.threshold or (memory_ratio or 0) > args.threshold
+        regressions += regressed
+        memory_change = f"{memory_ratio:.2f}x" if memory_ratio is not None else "-"
+        print(
+            f"{stage:<24} {size:>8} time {time_ratio:6.2f}x memory {memory_change:>6}"
+            f"{'  REGRESSION' if regressed else ''}"
+        )
+    if regressions:
+        sys.exit(f"{regressions} stage(s) regressed by more than {args.threshold}x")
+
+
+def load_results(filename: str) -> Dict[Tuple[str, int], Dict[str, Any]]:
+    with open(filename, "rt") as fd:
+        document = json.load(fd)
+    if document.get("version") != RESULTS_VERSION:
+        sys.exit(f"Unsupported results version in {filename}")
+    return {(result["stage"], result["size"]): result for result in document["results"]}
+
+
+def ratio(new: Optional[int], old: Optional[int]) -> Optional[float]:
+    if new is None or not old:
+        return None
+    return new / old
+
+
+def format_memory(num_bytes: Optional[int]) -> str:
+    if num_bytes is None:
+        return "-"
+    return f"{num_bytes / 2 ** 20:.1f}MB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run the benchmarks")
+    run_parser.add_argument(
+        "--sizes",
+        default=DEFAULT_SIZES,
+        help=f"Comma-separated numbers of files in reports (default {DEFAULT_SIZES})",
+    )
+    run_parser.add_argument(
+        "--commits",
+        type=int,
+        default=2000,
+        help="Number of commits in the git repository, 0 to skip git benchmarks",
+    )
+    run_parser.add_argument(
+        "--repo-files", type=int, default=5000, help="Number of files in the repository"
+    )
+    run_parser.add_argument(
+        "--no-memory",
+        dest="memory",
+        action="store_false",
+        help="Don't measure peak memory, which runs every stage twice",
+    )
+    run_parser.add_argument("--output", help="Save results in the JSON file")
+    run_parser.set_defaults(func=run)
+
+    compare_parser = subparsers.add_parser("compare", help="Compare two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.2,
+        help="Report stages that got slower or bigger by this factor (default 1.2)",
+    )
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
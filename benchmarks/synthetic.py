@@ -0,0 +1,170 @@
+"""
+Generators of synthetic coverage reports and git repositories for benchmarks.
+
+Everything is deterministic for a given seed, and git repositories are built
+offline with "git fast-import".
+"""
+import json
+import os
+import random
+import subprocess
+from datetime import datetime, timedelta, timezone
+from typing import IO, Iterator, List, Tuple
+from xml.sax.saxutils import quoteattr
+
+# Number of subdirectories to choose from on every level of the tree
+BRANCHING = 8
+
+# Relative frequencies of file depths, from top-level files to 7 levels deep
+DEPTH_WEIGHTS = [1, 4, 8, 10, 7, 4, 2, 1]
+
+AUTHORS = [
+    ("John Doe", "john@example.com"),
+    ("Jane Roe", "jane@example.com"),
+    ("dependabot[bot]", "bot@example.com"),
+    ("Anna Smith", "anna@example.com"),
+]
+MESSAGES = ["Fix a bug", "Add a feature", "Refactor", "Apply black formatting"]
+
+
+def make_paths(num_files: int, seed: int = 42) -> List[str]:
+    """
+    Return unique relative paths of Python files in a package-like tree.
+
+    Directory names are shared between files, so that the tree has as many
+    directories as a real project of the same size.
+    """
+    rnd = random.Random(seed)
+    depths = rnd.choices(range(len(DEPTH_WEIGHTS)), DEPTH_WEIGHTS, k=num_files)
+    paths = []
+    for i, depth in enumerate(depths):
+        dirs = [f"pkg{rnd.randrange(BRANCHING)}" for _ in range(depth)]
+        paths.append("/".join(["src"] + dirs + [f"module_{i}.py"]))
+    return paths
+
+
+def make_line_hits(num_files: int, seed: int = 42) -> Iterator[Tuple[int, List[int]]]:
+    """
+    Generate statement line numbers and hit counts of every file.
+
+    Yield (num_statements, hits) pairs, where hits has a count for every
+    statement. File sizes follow the log-normal distribution, most files are
+    either well covered or not covered at all.
+    """
+    rnd = random.Random(seed)
+    for _ in range(num_files):
+        num_statements = max(1, min(int(rnd.lognormvariate(3, 0.8)), 1000))
+        coverage = rnd.choice([0.0, 0.5, 0.8, 0.95, 1.0])
+        hits = [
+            int(rnd.random() < coverage) * rnd.randint(1, 9)
+            for _ in range(num_statements)
+        ]
+        yield num_statements, hits
+
+
+def write_cobertura_xml(fd: IO[str], paths: List[str], seed: int = 42) -> None:
+    """Write the Cobertura XML report, as coverage.py does, for the files."""
+    fd.write('<?xml version="1.0" ?>\n')
+    fd.write('<coverage version="6.0" timestamp="0" lines-valid="0">\n')
+    fd.write("\t<sources>\n\t\t<source>/home/user/project</source>\n\t</sources>\n")
+    fd.write('\t<packages>\n\t\t<package name="src">\n\t\t\t<classes>\n')
+    for path, (_, hits) in zip(paths, make_line_hits(len(paths), seed)):
+        name = quoteattr(os.path.basename(path))
+        fd.write(f"\t\t\t\t<class name={name} filename={quoteattr(path)}>\n")
+        fd.write("\t\t\t\t\t<methods/>\n\t\t\t\t\t<lines>\n")
+        fd.writelines(
+            f'\t\t\t\t\t\t<line number="{number}" hits="{count}"/>\n'
+            for number, count in enumerate(hits, 1)
+        )
+        fd.write("\t\t\t\t\t</lines>\n\t\t\t\t</class>\n")
+    fd.write("\t\t\t</classes>\n\t\t</package>\n\t</packages>\n</coverage>\n")
+
+
+def write_coverage_json(fd: IO[str], paths: List[str], seed: int = 42) -> None:
+    """Write the coverage.json report, as coverage.py does, for the files."""
+    fd.write('{"meta": {"version": "6.0", "show_contexts": false}, "files": {')
+    for i, (path, (num_statements, hits)) in enumerate(
+        zip(paths, make_line_hits(len(paths), seed))
+    ):
+        executed = [number for number, count in enumerate(hits, 1) if count]
+        missing = [number for number, count in enumerate(hits, 1) if not count]
+        raw_file = {
+            "executed_lines": executed,
+            "summary": {
+                "covered_lines": len(executed),
+                "num_statements": num_statements,
+                "percent_covered": 100 * len(executed) / num_statements,
+                "missing_lines": len(missing),
+                "excluded_lines": 0,
+            },
+            "missing_lines": missing,
+            "excluded_lines": [],
+        }
+        fd.write(", " if i else "")
+        fd.write(f"{json.dumps(path)}: {json.dumps(raw_file)}")
+    fd.write("}}\n")
+
+
+def make_git_repo(
+    git_root: str,
+    paths: List[str],
+    num_commits: int,
+    days: int = 730,
+    seed: int = 42,
+) -> None:
+    """
+    Create a git repository with the history of changes of the files.
+
+    Every commit modifies a few files, with a bias towards a small set of hot
+    files, and commits are spread evenly over the last `days` days. The work
+    tree is checked out, so that the files can be stat'ed.
+    """
+    os.makedirs(git_root, exist_ok=True)
+    subprocess.run(["git", "init", "-q", git_root], check=True)
+    branch = subprocess.run(
+        ["git", "symbolic-ref", "HEAD"],
+        cwd=git_root,
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    ).stdout.strip()
+    importer = subprocess.Popen(
+        ["git", "fast-import", "--quiet"],
+        cwd=git_root,
+        stdin=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    assert importer.stdin is not None
+    write_fast_import_stream(importer.stdin, branch, paths, num_commits, days, seed)
+    importer.stdin.close()
+    if importer.wait() != 0:
+        raise RuntimeError("git fast-import failed")
+    subprocess.run(["git", "reset", "-q", "--hard"], cwd=git_root, check=True)
+
+
+def write_fast_import_stream(
+    fd: IO[str], branch: str, paths: List[str], num_commits: int, days: int, seed: int
+) -> None:
+    rnd = random.Random(seed)
+    hot_paths = rnd.sample(paths, max(1, len(paths) // 20))
+    start = datetime.now(timezone.utc) - timedelta(days=days)
+    step = timedelta(days=days) / max(num_commits, 1)
+
+    for i in range(num_commits):
+        name, email = rnd.choice(AUTHORS)
+        timestamp = int((start + step * i).timestamp())
+        message = f"{rnd.choice(MESSAGES)} #{i}\n"
+        fd.write(f"commit {branch}\n")
+        fd.write(f"author {name} <{email}> {timestamp} +0000\n")
+        fd.write(f"committer {name} <{email}> {timestamp} +0000\n")
+        fd.write(f"data {len(message.encode())}\n{message}\n")
+        if i == 0:
+            # The first commit adds all files
+            modified = paths
+        else:
+            modified = rnd.sample(hot_paths, min(3, len(hot_paths)))
+            modified += rnd.sample(paths, min(rnd.randint(0, 3), len(paths)))
+        for path in modified:
+            content = f"# {path} at revision {i}\n"
+            fd.write(f"M 100644 inline {path}\n")
+            fd.write(f"data {len(content.encode())}\n{content}\n")
@@ -1,4 +1,46 @@
-from coverage_plot.plot import import_json, import_xml, plot_sunburst, plot_treemap
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from coverage_plot.plot import (
+        import_json,
+        import_json_file,
+        import_sqlite,
+        import_xml,
+        import_xml_file,
+        plot_sunburst,
+        plot_treemap,
+        save_html,
+    )
+    from coverage_plot.profiling import Profiler
 
 __version__ = "0.3.2"
-__all__ = ["import_json", "import_xml", "plot_sunburst", "plot_treemap", "__version__"]
+__all__ = [
+    "import_json",
+    "import_json_file",
+    "import_sqlite",
+    "import_xml",
+    "import_xml_file",
+    "plot_sunburst",
+    "plot_treemap",
+    "save_html",
+    "Profiler",
+    "__version__",
+]
+
+
+def __getattr__(name: str) -> Any:
+    """
+    Import public functions on first access.
+
+    Importing the package doesn't load NumPy, so "coverage-plot --help" and
+    tools that only read __version__ start fast.
+    """
+    if name not in __all__:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    if name == "Profiler":
+        from coverage_plot.profiling import Profiler
+
+        return Profiler
+    from coverage_plot import plot
+
+    return getattr(plot, name)
@@ -0,0 +1,24 @@
+import contextlib
+import os
+import tempfile
+from typing import IO, Any, Iterator
+
+
+@contextlib.contextmanager
+def atomic_write(filename: str, mode: str = "wt", **kwargs: Any) -> Iterator[IO]:
+    """
+    Open a temporary file for writing, and move it to the filename on success.
+
+    Concurrent readers see either the old file or the whole new one, never a
+    half-written file. The temporary file is created in the same directory, and
+    is removed if writing fails. Extra arguments are passed to open().
+    """
+    dirname = os.path.dirname(os.path.abspath(filename))
+    fd, tmp_filename = tempfile.mkstemp(dir=dirname, suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode, **kwargs) as tmp_file:
+            yield tmp_file
+        os.replace(tmp_filename, filename)
+    except BaseException:
+        os.unlink(tmp_filename)
+        raise
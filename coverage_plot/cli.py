@@ -1,10 +1,38 @@
+import contextlib
+import multiprocessing
 import os
+import sys
+import threading
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, Callable, Iterator, Optional, TypeVar
 
 import click
+from click.core import ParameterSource
 
-from coverage_plot import import_json, import_xml, plot_sunburst, plot_treemap
-from coverage_plot.importance_filesize import FileSizeImportance
-from coverage_plot.importance_recency import GitImportance
+if TYPE_CHECKING:
+    from multiprocessing.connection import Connection
+
+    from plotly.graph_objs import Figure
+
+    from coverage_plot.importance_recency import GitImportance
+    from coverage_plot.path_filter import PathFilter
+    from coverage_plot.plot import Report
+    from coverage_plot.profiling import Profiler
+    from coverage_plot.report_cache import ReportCache
+
+T = TypeVar("T")
+
+# Options of importance and node folding, which diff plots don't use
+DIFF_IGNORED_OPTIONS = {
+    "importance_type",
+    "max_nodes",
+    "decay",
+    "decay_days",
+    "git_cache_dir",
+    "git_backend",
+    "git_workers",
+    "git_size_provider",
+}
 
 
 @click.command()
@@ -27,24 +55,423 @@ from coverage_plot.importance_recency import GitImportance
     default=None,
     help="Save the plot in the HTML file",
 )
-@click.argument("coverage_file", type=click.File(mode="rt"))
-def coverage_plot(plot_type, importance_type, show, save, coverage_file):
+@click.option(
+    "--plotlyjs",
+    default="inline",
+    type=click.Choice(["inline", "shared", "cdn"]),
+    help=(
+        "Set how the saved HTML file loads plotly.js: embedded in the file, "
+        "from a bundle shared by all files in the directory, or from the CDN"
+    ),
+)
+@click.option(
+    "--statements",
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help="JSON file with statement counts per file, for the .coverage data file",
+)
+@click.option(
+    "--report-cache-dir",
+    type=click.Path(file_okay=False, dir_okay=True, writable=True),
+    default=None,
+    help=(
+        "Cache imported reports in the directory to skip parsing the same file. "
+        "Not supported for .coverage data files"
+    ),
+)
+@click.option(
+    "--only",
+    multiple=True,
+    help=(
+        "Plot only files under the directory or path, relative to the repository "
+        "root. Can be given more than once"
+    ),
+)
+@click.option(
+    "--exclude",
+    multiple=True,
+    help="Leave out files under the directory or path. Can be given more than once",
+)
+@click.option(
+    "--max-depth",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Limit the depth of the plot, keeping deeper paths joined",
+)
+@click.option(
+    "--collapse-chains/--no-collapse-chains",
+    default=False,
+    help="Merge directories that have a single subdirectory and no files",
+)
+@click.option(
+    "--max-nodes",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Limit the number of nodes, folding the least important files together",
+)
+@click.option(
+    "--git-cache-dir",
+    type=click.Path(file_okay=False, dir_okay=True, writable=True),
+    default=None,
+    help="Cache git history in the directory to mine only new commits next time",
+)
+@click.option(
+    "--git-backend",
+    default="git",
+    type=click.Choice(["git", "pydriller"]),
+    help="Set the backend to mine git history with",
+)
+@click.option(
+    "--git-workers",
+    default=1,
+    type=click.IntRange(min=1),
+    help="Set the number of processes to mine git history with",
+)
+@click.option(
+    "--git-size-provider",
+    default="stat",
+    type=click.Choice(["stat", "git"]),
+    help=(
+        "Read file sizes from the work tree, or from the HEAD commit, which "
+        "doesn't need a checkout"
+    ),
+)
+@click.option(
+    "--decay",
+    default="hyperbolic",
+    type=click.Choice(["hyperbolic", "step", "exponential", "linear"]),
+    help="Set how the recency importance of files decays with the age of changes",
+)
+@click.option(
+    "--decay-days",
+    default=None,
+    type=click.FloatRange(min=0, min_open=True),
+    help=(
+        "Set the period of the hyperbolic decay (7 by default), the half-life of "
+        "the exponential one (30), or the window of the step (90) and linear "
+        "(365) ones"
+    ),
+)
+@click.option(
+    "--diff-base",
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help=(
+        "Plot the change of coverage since the base coverage file, sizing files "
+        "by lines instead of importance. Can't be combined with --max-nodes, "
+        "--importance-type, --decay, --decay-days, or --git-* options"
+    ),
+)
+@click.option(
+    "--diff-base-rev",
+    default=None,
+    help="Git revision of the base coverage file, to match files renamed since",
+)
+@click.option(
+    "--profile",
+    type=click.Path(dir_okay=False, writable=True, allow_dash=True),
+    default=None,
+    help="Save time and memory used by every stage as JSON, '-' for stderr",
+)
+@click.option(
+    "--serve/--no-serve",
+    default=False,
+    help=(
+        "Serve the plot over HTTP and update it when the coverage file changes, "
+        "until interrupted with Ctrl+C"
+    ),
+)
+@click.option("--host", default="127.0.0.1", help="Set the host to serve the plot on")
+@click.option(
+    "--port", default=8050, type=int, help="Set the port to serve the plot on"
+)
+@click.argument("coverage_file", type=click.Path(exists=True, dir_okay=False))
+def coverage_plot(
+    plot_type,
+    importance_type,
+    show,
+    save,
+    plotlyjs,
+    statements,
+    report_cache_dir,
+    only,
+    exclude,
+    max_depth,
+    collapse_chains,
+    max_nodes,
+    git_cache_dir,
+    git_backend,
+    git_workers,
+    git_size_provider,
+    decay,
+    decay_days,
+    diff_base,
+    diff_base_rev,
+    profile,
+    serve,
+    host,
+    port,
+    coverage_file,
+):
     """
-    Display a summary coverage plot from the coverage.json file.
+    Display a summary coverage plot from the coverage.json, coverage.xml, or
+    .coverage file.
     """
-    importers = {".json": import_json, ".xml": import_xml}
-    plotters = {"sunburst": plot_sunburst, "treemap": plot_treemap}
-
-    _, ext = os.path.splitext(coverage_file.name)
-    report = importers[ext](coverage_file.read())
+    check_options(click.get_current_context())
+    # Import heavy dependencies here, so that --help doesn't wait for them
+    from coverage_plot.decay import get_decay_curve
+    from coverage_plot.importance_filesize import FileSizeImportance
+    from coverage_plot.path_filter import PathFilter
+    from coverage_plot.plot import plot_sunburst, plot_treemap, save_html
+    from coverage_plot.profiling import Profiler, stage
+    from coverage_plot.report_cache import ReportCache
 
+    profiler = Profiler() if profile else None
+    cache = ReportCache(report_cache_dir) if report_cache_dir else None
+    # Files outside of the selection are skipped by importers and git mining
+    path_filter = PathFilter(only, exclude) if only or exclude else None
+    plotters = {"sunburst": plot_sunburst, "treemap": plot_treemap}
+    git_root = os.path.dirname(os.path.abspath(coverage_file))
+    background = contextlib.ExitStack()
+    git_importance = None
+    if importance_type == "recency" and not diff_base:
+        # Mine git history while the report is being imported. It's mined
+        # once, and reused by every render in the serve mode.
+        git_importance = background.enter_context(
+            run_in_background(
+                get_git_importance,
+                git_root,
+                cache_dir=git_cache_dir,
+                backend=git_backend,
+                workers=git_workers,
+                size_provider=git_size_provider,
+                path_filter=path_filter,
+                decay=get_decay_curve(decay, decay_days),
+            )
+        )
     importances = {
-        "size": lambda: FileSizeImportance(report),
-        "recency": lambda: GitImportance(os.path.dirname(coverage_file.name)),
+        "size": FileSizeImportance,
+        "recency": lambda report: git_importance.result(),
     }
-    importance = importances[importance_type]()
-    fig = plotters[plot_type](report, importance)
+    base_report = None
+
+    def render():
+        nonlocal base_report
+        report = import_report(coverage_file, statements, cache, path_filter, profiler)
+        if diff_base:
+            if base_report is None:
+                base_report = import_report(
+                    diff_base, statements, cache, path_filter, profiler
+                )
+            fig = plot_report_diff(
+                base_report,
+                report,
+                git_root,
+                diff_base_rev,
+                plot_type,
+                max_depth,
+                collapse_chains,
+                profiler,
+            )
+        else:
+            with stage(profiler, "importance"):
+                importance = importances[importance_type](report)
+            fig = plotters[plot_type](
+                report,
+                importance,
+                max_depth,
+                collapse_chains,
+                max_nodes,
+                profiler=profiler,
+            )
+        if save:
+            with stage(profiler, "write_html"):
+                save_html(fig, save, plotlyjs)
+        return fig
+
+    with background:
+        if serve:
+            serve_plot(coverage_file, render, host, port, show)
+        else:
+            fig = render()
+            if show:
+                fig.show()
+    if profiler:
+        if profile == "-":
+            profiler.dump(sys.stderr)
+        else:
+            with open(profile, "wt") as fd:
+                profiler.dump(fd)
+
+
+def check_options(ctx: click.Context) -> None:
+    """
+    Reject combinations of options that can't work together.
+
+    Git history is mined in the background, so errors are caught here instead of
+    surfacing after the report is imported.
+    """
+    from coverage_plot.plot import is_sqlite_file
+
+    params = ctx.params
+    if params["diff_base"]:
+        ignored = [
+            param.opts[0]
+            for param in ctx.command.params
+            if param.name in DIFF_IGNORED_OPTIONS
+            and ctx.get_parameter_source(param.name) != ParameterSource.DEFAULT
+        ]
+        if ignored:
+            raise click.UsageError(
+                f"{', '.join(ignored)} can't be combined with --diff-base", ctx
+            )
+    if params["git_backend"] == "pydriller" and params["git_workers"] > 1:
+        raise click.UsageError(
+            "--git-workers greater than 1 requires --git-backend git", ctx
+        )
+    for filename in filter(None, [params["coverage_file"], params["diff_base"]]):
+        is_sqlite = is_sqlite_file(filename)
+        if params["statements"] and not is_sqlite:
+            raise click.UsageError(
+                f"--statements only applies to .coverage data files, not {filename}",
+                ctx,
+            )
+        # Reports of .coverage data files are computed with SQLite queries, and
+        # aren't cached
+        if params["report_cache_dir"] and is_sqlite:
+            raise click.UsageError(
+                f"--report-cache-dir doesn't apply to .coverage data files, "
+                f"such as {filename}",
+                ctx,
+            )
+
+
+def import_report(
+    filename: str,
+    statements: Optional[str],
+    cache: Optional["ReportCache"],
+    path_filter: Optional["PathFilter"],
+    profiler: Optional["Profiler"],
+) -> "Report":
+    from coverage_plot.plot import (
+        import_json_file,
+        import_sqlite,
+        import_xml_file,
+        is_sqlite_file,
+        load_statement_counts,
+    )
+    from coverage_plot.profiling import stage
+
+    importers = {".json": import_json_file, ".xml": import_xml_file}
+    _, ext = os.path.splitext(filename)
+    with stage(profiler, "import") as stats:
+        if is_sqlite_file(filename):
+            counts = load_statement_counts(statements) if statements else None
+            report = import_sqlite(filename, counts, path_filter=path_filter)
+        else:
+            report = importers[ext](filename, cache=cache, path_filter=path_filter)
+        stats.items = len(report)
+    return report
+
+
+def plot_report_diff(
+    base_report: "Report",
+    report: "Report",
+    git_root: str,
+    base_rev: Optional[str],
+    plot_type: str,
+    max_depth: Optional[int],
+    collapse_chains: bool,
+    profiler: Optional["Profiler"],
+) -> "Figure":
+    from coverage_plot.diff import diff_reports, plot_diff
+    from coverage_plot.git_changes import get_renames
+    from coverage_plot.profiling import stage
+
+    renames = None
+    if base_rev:
+        renames = get_renames(git_root, base_rev)
+    with stage(profiler, "diff") as stats:
+        diff = diff_reports(base_report, report, renames)
+        stats.items = len(diff.paths)
+    with stage(profiler, "make_figure"):
+        return plot_diff(diff, plot_type, max_depth, collapse_chains)
+
+
+def serve_plot(
+    coverage_file: str,
+    render: Callable[[], "Figure"],
+    host: str,
+    port: int,
+    show: bool,
+) -> None:
+    import webbrowser
+
+    from coverage_plot.serve import PlotServer
+
+    server = PlotServer(coverage_file, render, host, port)
+    server.start()
+    click.echo(f"Serving the plot at {server.url}, press Ctrl+C to stop")
     if show:
-        fig.show()
-    if save:
-        fig.write_html(save)
+        webbrowser.open(server.url)
+    server.serve_forever()
+
+
+def get_git_importance(git_root: str, **kwargs) -> "GitImportance":
+    # Git mining modules are only imported if the recency importance is chosen
+    from coverage_plot.importance_recency import GitImportance
+
+    importance = GitImportance(git_root, **kwargs)
+    importance.prefetch_file_sizes()
+    return importance
+
+
+@contextlib.contextmanager
+def run_in_background(
+    function: Callable[..., T], *args, **kwargs
+) -> Iterator["Future[T]"]:
+    """
+    Call the function in another process, and yield the future of its result.
+
+    Git mining and report parsing are both CPU-bound Python code, and threads
+    would take turns on the GIL instead of running in parallel. The function,
+    its arguments, and its result have to be picklable. The process is
+    terminated when the block exits, e.g. if the report can't be imported.
+    """
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(
+        target=send_result, args=(sender, function, args, kwargs)
+    )
+    process.start()
+    sender.close()
+    future: "Future[T]" = Future()
+
+    def receive_result() -> None:
+        try:
+            succeeded, value = receiver.recv()
+        except EOFError:
+            future.set_exception(RuntimeError("Background process exited"))
+            return
+        if succeeded:
+            future.set_result(value)
+        else:
+            future.set_exception(value)
+
+    threading.Thread(target=receive_result, daemon=True).start()
+    try:
+        yield future
+    finally:
+        process.terminate()
+        process.join()
+
+
+def send_result(
+    connection: "Connection", function: Callable, args: tuple, kwargs: dict
+) -> None:
+    """Call the function in the background process, and send back its result."""
+    try:
+        result = (True, function(*args, **kwargs))
+    except BaseException as e:
+        result = (False, e)
+    connection.send(result)
+    connection.close()
@@ -0,0 +1,113 @@
+import abc
+from datetime import datetime
+from typing import Dict, Optional, Type
+
+import numpy as np
+from attrs import frozen
+
+# Importance of a file modified just now
+BASE_IMPORTANCE = 1000
+
+
+class DecayCurve(abc.ABC):
+    """
+    Generic interface for the decay of file importance with the age of changes.
+
+    Subclasses implement a method that converts an array of ages at once. Custom
+    curves can be passed to GitImportance as the decay parameter.
+    """
+
+    @abc.abstractmethod
+    def get_importances(self, age_days: np.ndarray) -> np.ndarray:
+        """
+        Return integer importance scores for non-negative ages in days.
+        """
+
+
+@frozen
+class HyperbolicDecay(DecayCurve):
+    """
+    Importance divided by the number of whole periods since the change.
+
+    The default one-week period gives 1000 in the first two weeks, 500 in the
+    third one, 333 in the fourth one, and so on.
+    """
+
+    period_days: float = 7
+
+    def get_importances(self, age_days: np.ndarray) -> np.ndarray:
+        periods = (np.floor(age_days) // self.period_days).astype(np.int64)
+        return BASE_IMPORTANCE // np.maximum(periods, 1)
+
+
+@frozen
+class StepDecay(DecayCurve):
+    """Full importance within the window, and zero after it."""
+
+    window_days: float = 90
+
+    def get_importances(self, age_days: np.ndarray) -> np.ndarray:
+        return np.where(age_days < self.window_days, BASE_IMPORTANCE, 0)
+
+
+@frozen
+class ExponentialDecay(DecayCurve):
+    """Importance halved every half-life."""
+
+    half_life_days: float = 30
+
+    def get_importances(self, age_days: np.ndarray) -> np.ndarray:
+        importances = BASE_IMPORTANCE * np.exp2(-age_days / self.half_life_days)
+        return np.floor(importances).astype(np.int64)
+
+
+@frozen
+class LinearDecay(DecayCurve):
+    """Importance decreasing linearly to zero at the end of the window."""
+
+    window_days: float = 365
+
+    def get_importances(self, age_days: np.ndarray) -> np.ndarray:
+        remaining = np.clip(1 - age_days / self.window_days, 0, 1)
+        return np.floor(BASE_IMPORTANCE * remaining).astype(np.int64)
+
+
+DECAY_CURVES: Dict[str, Type[DecayCurve]] = {
+    "hyperbolic": HyperbolicDecay,
+    "step": StepDecay,
+    "exponential": ExponentialDecay,
+    "linear": LinearDecay,
+}
+
+
+def get_decay_curve(name: str, days: Optional[float] = None) -> DecayCurve:
+    """
+    Return the decay curve by name.
+
+    The days are the period, the window, or the half-life of the curve. Curves
+    have their own defaults.
+    """
+    try:
+        curve_type = DECAY_CURVES[name]
+    except KeyError:
+        raise ValueError(f"Unknown decay curve: {name!r}") from None
+    if days is None:
+        return curve_type()
+    return curve_type(days)  # type: ignore
+
+
+def score_timestamps(
+    last_modified: np.ndarray, now: datetime, decay: DecayCurve
+) -> np.ndarray:
+    """
+    Convert an array of last-modified timestamps to importance scores at once.
+
+    Ages are counted from the same "now" for all timestamps, and changes from the
+    future are as important as the ones made right now. Missing timestamps (NaT)
+    get zero importance.
+    """
+    importances = np.zeros(len(last_modified), dtype=np.int64)
+    known = ~np.isnat(last_modified)
+    age = (np.datetime64(now, "us") - last_modified[known]) / np.timedelta64(1, "D")
+    importances[known] = decay.get_importances(np.maximum(age, 0))
+    return importances
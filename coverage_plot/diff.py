@@ -0,0 +1,307 @@
+from typing import TYPE_CHECKING, List, Mapping, Optional, Tuple, Type
+
+import numpy as np
+from attrs import define
+
+from coverage_plot.plot import (
+    ColumnarReport,
+    Report,
+    TreeLayout,
+    split_paths,
+)
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from plotly.graph_objs import Figure
+
+# File statuses in a ReportDiff
+UNCHANGED = "unchanged"
+MODIFIED = "modified"
+ADDED = "added"
+REMOVED = "removed"
+RENAMED = "renamed"
+
+
+@define
+class ReportDiff:
+    """
+    Coverage of files in the base and head reports, aligned by path.
+
+    Files missing on one side have zero lines there. Base files are listed under
+    their head paths if they were renamed.
+    """
+
+    paths: np.ndarray
+    status: np.ndarray
+    base_covered_lines: np.ndarray
+    base_missing_lines: np.ndarray
+    head_covered_lines: np.ndarray
+    head_missing_lines: np.ndarray
+
+    def base_percent_covered(self) -> np.ndarray:
+        return percent(self.base_covered_lines, self.base_missing_lines)
+
+    def head_percent_covered(self) -> np.ndarray:
+        return percent(self.head_covered_lines, self.head_missing_lines)
+
+    def percent_delta(self) -> np.ndarray:
+        """
+        Return the change of the percentage of covered code for every file.
+
+        Files that are added or removed, or have no lines on either side, don't
+        change the coverage of existing code, and their delta is zero.
+        """
+        return percent_delta(
+            self.base_covered_lines,
+            self.base_missing_lines,
+            self.head_covered_lines,
+            self.head_missing_lines,
+        )
+
+    def to_df(self) -> "pd.DataFrame":
+        """Convert the diff to a pandas DataFrame with per-file deltas."""
+        import pandas as pd
+
+        return pd.DataFrame(
+            {
+                "path": self.paths,
+                "status": self.status,
+                "base_percent_covered": self.base_percent_covered(),
+                "head_percent_covered": self.head_percent_covered(),
+                "covered_lines_delta": self.head_covered_lines
+                - self.base_covered_lines,
+                "missing_lines_delta": self.head_missing_lines
+                - self.base_missing_lines,
+                "percent_delta": self.percent_delta(),
+            }
+        )
+
+
+def diff_reports(
+    base: Report, head: Report, renames: Optional[Mapping[str, str]] = None
+) -> ReportDiff:
+    """
+    Align two reports by path and compare their coverage.
+
+    The renames map old paths of base files to their new paths in head, for
+    example, as returned by git_changes.get_renames(). If several base files end
+    up with the same path, their lines are added up.
+    """
+    base_report = ColumnarReport.from_mapping(base)
+    head_report = ColumnarReport.from_mapping(head)
+    base_paths = base_report.paths
+    renamed = np.zeros(len(base_paths), dtype=bool)
+    if renames:
+        base_paths = base_paths.copy()
+        for i, path in enumerate(base_paths):
+            new_path = renames.get(path)
+            if new_path is not None:
+                base_paths[i] = new_path
+                renamed[i] = True
+
+    paths, base_positions, head_positions = merge_paths(base_paths, head_report.paths)
+    base_covered_lines = scatter(base_positions, base_report.covered_lines, len(paths))
+    base_missing_lines = scatter(base_positions, base_report.missing_lines, len(paths))
+    head_covered_lines = scatter(head_positions, head_report.covered_lines, len(paths))
+    head_missing_lines = scatter(head_positions, head_report.missing_lines, len(paths))
+
+    in_base = np.zeros(len(paths), dtype=bool)
+    in_base[base_positions] = True
+    in_head = np.zeros(len(paths), dtype=bool)
+    in_head[head_positions] = True
+    is_renamed = np.zeros(len(paths), dtype=bool)
+    is_renamed[base_positions[renamed]] = True
+    unchanged = (base_covered_lines == head_covered_lines) & (
+        base_missing_lines == head_missing_lines
+    )
+    status = np.select(
+        [~in_head, ~in_base, is_renamed, unchanged],
+        [REMOVED, ADDED, RENAMED, UNCHANGED],
+        MODIFIED,
+    ).astype(object)
+    return ReportDiff(
+        paths=paths,
+        status=status,
+        base_covered_lines=base_covered_lines,
+        base_missing_lines=base_missing_lines,
+        head_covered_lines=head_covered_lines,
+        head_missing_lines=head_missing_lines,
+    )
+
+
+def merge_paths(
+    base_paths: np.ndarray, head_paths: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Return the sorted union of paths, and positions of base and head paths in it.
+
+    Both sides are sorted, and then merged by a stable sort of their
+    concatenation. NumPy sorts objects with timsort, which merges the two sorted
+    runs in linear time.
+    """
+    base_order = np.argsort(base_paths, kind="stable")
+    head_order = np.argsort(head_paths, kind="stable")
+    joined = np.concatenate([base_paths[base_order], head_paths[head_order]])
+    order = np.argsort(joined, kind="stable")
+    sorted_paths = joined[order]
+    is_new = np.ones(len(sorted_paths), dtype=bool)
+    is_new[1:] = sorted_paths[1:] != sorted_paths[:-1]
+    groups = np.cumsum(is_new) - 1
+
+    positions = np.empty(len(joined), dtype=np.intp)
+    positions[order] = groups
+    num_base = len(base_paths)
+    base_positions = np.empty(num_base, dtype=np.intp)
+    base_positions[base_order] = positions[:num_base]
+    head_positions = np.empty(len(head_paths), dtype=np.intp)
+    head_positions[head_order] = positions[num_base:]
+    return sorted_paths[is_new], base_positions, head_positions
+
+
+def scatter(positions: np.ndarray, column: np.ndarray, size: int) -> np.ndarray:
+    result = np.zeros(size, dtype=np.int64)
+    np.add.at(result, positions, column)
+    return result
+
+
+def percent(covered_lines: np.ndarray, missing_lines: np.ndarray) -> np.ndarray:
+    total_lines = covered_lines + missing_lines
+    return np.divide(
+        100.0 * covered_lines,
+        total_lines,
+        out=np.zeros(len(total_lines), dtype=np.float64),
+        where=total_lines != 0,
+    )
+
+
+def percent_delta(
+    base_covered_lines: np.ndarray,
+    base_missing_lines: np.ndarray,
+    head_covered_lines: np.ndarray,
+    head_missing_lines: np.ndarray,
+) -> np.ndarray:
+    both_sides = (base_covered_lines + base_missing_lines != 0) & (
+        head_covered_lines + head_missing_lines != 0
+    )
+    delta = percent(head_covered_lines, head_missing_lines) - percent(
+        base_covered_lines, base_missing_lines
+    )
+    return np.where(both_sides, delta, 0.0)
+
+
+@define
+class DiffTree:
+    """
+    Hierarchy of directories and files of a diff, ready to be plotted.
+
+    Directories sum up lines of their files on both sides. Node values are the
+    number of lines on the larger side, so that removed files are visible too.
+    """
+
+    ids: List[str]
+    labels: List[str]
+    parents: List[str]
+    values: np.ndarray
+    base_covered_lines: np.ndarray
+    base_missing_lines: np.ndarray
+    head_covered_lines: np.ndarray
+    head_missing_lines: np.ndarray
+
+    def percent_delta(self) -> np.ndarray:
+        return percent_delta(
+            self.base_covered_lines,
+            self.base_missing_lines,
+            self.head_covered_lines,
+            self.head_missing_lines,
+        )
+
+    def head_percent_covered(self) -> np.ndarray:
+        return percent(self.head_covered_lines, self.head_missing_lines)
+
+
+def build_diff_tree(
+    diff: ReportDiff, max_depth: Optional[int] = None, collapse_chains: bool = False
+) -> DiffTree:
+    """
+    Build the tree of directories and files of the diff.
+
+    See split_paths() for the meaning of max_depth and collapse_chains.
+    """
+    sizes = np.maximum(
+        diff.base_covered_lines + diff.base_missing_lines,
+        diff.head_covered_lines + diff.head_missing_lines,
+    )
+    selected = np.flatnonzero(sizes != 0)
+    components = split_paths(diff.paths[selected], max_depth, collapse_chains)
+    layout = TreeLayout.from_components(components)
+    return DiffTree(
+        ids=layout.ids,
+        labels=layout.labels,
+        parents=layout.parents,
+        values=layout.aggregate(sizes[selected]),
+        base_covered_lines=layout.aggregate(diff.base_covered_lines[selected]),
+        base_missing_lines=layout.aggregate(diff.base_missing_lines[selected]),
+        head_covered_lines=layout.aggregate(diff.head_covered_lines[selected]),
+        head_missing_lines=layout.aggregate(diff.head_missing_lines[selected]),
+    )
+
+
+def plot_diff(
+    diff: ReportDiff,
+    plot_type: str = "treemap",
+    max_depth: Optional[int] = None,
+    collapse_chains: bool = False,
+) -> "Figure":
+    """
+    Return a Figure that shows the change of coverage per file and directory.
+
+    Nodes are sized by the number of lines, and colored by the change of the
+    percentage of covered code, red for the drop and blue for the growth.
+    """
+    import plotly.graph_objects as go
+
+    trace_types = {"treemap": go.Treemap, "sunburst": go.Sunburst}
+    tree = build_diff_tree(diff, max_depth, collapse_chains)
+    return make_diff_figure(trace_types[plot_type], tree)
+
+
+def make_diff_figure(trace_type: Type, tree: DiffTree) -> "Figure":
+    import plotly.graph_objects as go
+
+    delta = tree.percent_delta().round(1)
+    # Keep the scale symmetric, so that zero is always in the middle
+    limit = max(float(np.abs(delta).max(initial=0)), 1.0)
+    customdata = np.column_stack(
+        [
+            tree.head_percent_covered().round(1),
+            tree.head_covered_lines - tree.base_covered_lines,
+            tree.head_missing_lines - tree.base_missing_lines,
+        ]
+    )
+    trace = trace_type(
+        ids=tree.ids,
+        labels=tree.labels,
+        parents=tree.parents,
+        values=tree.values,
+        branchvalues="total",
+        marker={"colors": delta, "coloraxis": "coloraxis"},
+        customdata=customdata,
+        hovertemplate=(
+            "id=%{id}<br>lines=%{value}<br>percent_covered=%{customdata[0]:.1f}"
+            "<br>percent_delta=%{color:+.1f}<br>covered_lines_delta=%{customdata[1]:+}"
+            "<br>missing_lines_delta=%{customdata[2]:+}<extra></extra>"
+        ),
+    )
+    figure = go.Figure(trace)
+    figure.update_layout(
+        coloraxis={
+            "colorscale": "RdBu",
+            "cmin": -limit,
+            "cmax": limit,
+            "cmid": 0,
+            "colorbar": {"title": {"text": "percent_delta"}},
+        },
+        legend={"tracegroupgap": 0},
+        margin={"t": 60},
+    )
+    return figure
@@ -43,6 +43,7 @@ class FakeCommit:
 
     author: FakeDeveloper = field(factory=FakeDeveloper)
     author_date: datetime.datetime = field(default=datetime.datetime(2023, 1, 1))
+    committer_date: datetime.datetime = field(default=datetime.datetime(2023, 1, 1))
     msg: str = field(default="Add a new feature")
     hash: str = field(default="1234567890abcdef1234567890abcdef12345678")
     modifications: List[FakeModification] = field(factory=list)
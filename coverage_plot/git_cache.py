@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import attrs
+from attrs import define, field
+
+from coverage_plot.atomic_write import atomic_write
+from coverage_plot.git_changes import CommitFilter, ModificationFilter
+from coverage_plot.path_filter import PathFilter
+
+CACHE_VERSION = 2
+
+
+@define
+class CacheEntry:
+    """
+    Result of mining the git history, as stored in the cache.
+
+    The change_dates map covers the commits since the `since` timestamp and up to
+    the `last_commit`, inclusive. Change dates are stored rather than the last
+    modifications, to select them for narrower time windows by the committer date.
+    """
+
+    since: datetime
+    last_commit: str
+    change_dates: Dict[str, List[Tuple[datetime, datetime]]] = field(factory=dict)
+
+
+@define
+class LastModifiedCache:
+    """
+    On-disk cache of last-modified maps.
+
+    Every repository and combination of filters gets a separate JSON file in the
+    cache directory. Histories mined with filters that don't have a stable key
+    (see get_filter_key()) aren't cached.
+    """
+
+    cache_dir: str
+
+    def load(
+        self,
+        git_root: str,
+        commit_filters: List[CommitFilter],
+        modification_filters: List[ModificationFilter],
+        path_filter: Optional[PathFilter] = None,
+    ) -> Optional[CacheEntry]:
+        """Return the cache entry, or None if it doesn't exist or can't be read."""
+        filename = self.get_filename(
+            git_root, commit_filters, modification_filters, path_filter
+        )
+        if filename is None:
+            return None
+        try:
+            with open(filename, "rt") as fd:
+                raw_entry = json.load(fd)
+        except (OSError, ValueError):
+            return None
+        if raw_entry.get("version") != CACHE_VERSION:
+            return None
+        return CacheEntry(
+            since=datetime.fromisoformat(raw_entry["since"]),
+            last_commit=raw_entry["last_commit"],
+            change_dates={
+                path: [
+                    (
+                        datetime.fromisoformat(committer_date),
+                        datetime.fromisoformat(author_date),
+                    )
+                    for committer_date, author_date in dates
+                ]
+                for path, dates in raw_entry["change_dates"].items()
+            },
+        )
+
+    def save(
+        self,
+        git_root: str,
+        commit_filters: List[CommitFilter],
+        modification_filters: List[ModificationFilter],
+        path_filter: Optional[PathFilter],
+        entry: CacheEntry,
+    ):
+        filename = self.get_filename(
+            git_root, commit_filters, modification_filters, path_filter
+        )
+        if filename is None:
+            return
+        raw_entry = {
+            "version": CACHE_VERSION,
+            "git_root": os.path.realpath(git_root),
+            "since": entry.since.isoformat(),
+            "last_commit": entry.last_commit,
+            "change_dates": {
+                path: [
+                    [committer_date.isoformat(), author_date.isoformat()]
+                    for committer_date, author_date in dates
+                ]
+                for path, dates in entry.change_dates.items()
+            },
+        }
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Concurrent readers never see a half-written entry
+        with atomic_write(filename) as fd:
+            json.dump(raw_entry, fd)
+
+    def get_filename(
+        self,
+        git_root: str,
+        commit_filters: List[CommitFilter],
+        modification_filters: List[ModificationFilter],
+        path_filter: Optional[PathFilter] = None,
+    ) -> Optional[str]:
+        """Return the name of the cache file, or None if it can't be cached."""
+        commit_keys = [get_filter_key(filt) for filt in commit_filters]
+        modification_keys = [get_filter_key(filt) for filt in modification_filters]
+        if None in commit_keys or None in modification_keys:
+            return None
+        key_parts = [os.path.realpath(git_root), commit_keys, modification_keys]
+        # Keep keys of unfiltered histories as they were
+        if path_filter is not None:
+            key_parts.append(repr(path_filter))
+        key = json.dumps(key_parts)
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"last-modified-{digest}.json")
+
+
+def get_filter_key(filt: object) -> Optional[str]:
+    """
+    Return the key of the filter that is the same in every process.
+
+    The key is made of the qualified class name and the fields of attrs classes.
+    Other filters may have reprs with memory addresses, and get None.
+    """
+    filter_type = type(filt)
+    if not attrs.has(filter_type):
+        return None
+    name = f"{filter_type.__module__}.{filter_type.__qualname__}"
+    return json.dumps([name, attrs.asdict(filt)], sort_keys=True, default=repr)
@@ -1,23 +1,50 @@
 import abc
 import enum
 import fnmatch
+import os
+import re
+import subprocess
 from datetime import datetime, timezone
-from typing import Generator, Iterator, List, Optional, Union
+from typing import (
+    IO,
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    Generator,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Pattern,
+    TypeVar,
+    Union,
+    cast,
+)
 
-import pydriller
 from attrs import frozen
-from pydriller import Commit, Modification
-from pydriller.domain.developer import Developer
 
 from coverage_plot.fake_implementations import (
     FakeCommit,
     FakeDeveloper,
     FakeModification,
 )
+from coverage_plot.path_filter import PathFilter
+
+if TYPE_CHECKING:
+    # Pydriller and GitPython are slow to import, and are only needed by the
+    # "pydriller" backend
+    from pydriller import Commit, Modification
+    from pydriller.domain.developer import Developer
+
+DeveloperT = Union["Developer", FakeDeveloper, "LogDeveloper"]
+CommitT = Union["Commit", FakeCommit, "LogCommit"]
+ModificationT = Union["Modification", FakeModification, "LogModification"]
+
+T = TypeVar("T")
 
-DeveloperT = Union[Developer, FakeDeveloper]
-CommitT = Union[Commit, FakeCommit]
-ModificationT = Union[Modification, FakeModification]
+# Format of a commit header for the "git log" backend. Headers start with the
+# record separator, and fields are split by the unit separator.
+GIT_LOG_FORMAT = "%x1e%H%x1f%an%x1f%ae%x1f%aI%x1f%cI%x1f%B"
 
 
 class FilterResult(enum.Enum):
@@ -33,6 +60,7 @@ class NormalizedModification:
     author_name: str
     author_email: str
     author_date: datetime
+    committer_date: datetime
     path: str
 
     @classmethod
@@ -42,13 +70,49 @@ class NormalizedModification:
             msg=commit.msg,
             author_name=commit.author.name,
             author_email=commit.author.email,
-            author_date=commit.author_date.astimezone(timezone.utc).replace(
-                tzinfo=None
-            ),
-            path=modification.old_path or modification.new_path,
+            author_date=to_naive_utc(commit.author_date),
+            committer_date=to_naive_utc(commit.committer_date),
+            path=cast(str, modification.old_path or modification.new_path),
         )
 
 
+def to_naive_utc(timestamp: datetime) -> datetime:
+    return timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+@frozen
+class LogDeveloper:
+    """Commit author, as parsed from the output of "git log"."""
+
+    name: str
+    email: str
+
+
+@frozen
+class LogModification:
+    """
+    Modified file, as parsed from the output of "git log".
+
+    Follows the pydriller's Modification: old_path is None for added files, and
+    new_path is None for deleted ones.
+    """
+
+    old_path: Optional[str]
+    new_path: Optional[str]
+
+
+@frozen
+class LogCommit:
+    """Commit, as parsed from the output of "git log"."""
+
+    hash: str
+    msg: str
+    author: LogDeveloper
+    author_date: datetime
+    committer_date: datetime
+    modifications: List[LogModification]
+
+
 class CommitFilter(abc.ABC):
     @abc.abstractmethod
     def filter_commit(self, commit: CommitT) -> FilterResult:
@@ -132,11 +196,26 @@ class IncludeAllModifications(ModificationFilter):
         return FilterResult.INCLUDE
 
 
+DONT_KNOW = FilterResult.DONT_KNOW
+
+# Results of filters that decide on every object
+CATCH_ALL_RESULTS = {
+    ExcludeAllCommits: FilterResult.EXCLUDE,
+    IncludeAllCommits: FilterResult.INCLUDE,
+    ExcludeAllModifications: FilterResult.EXCLUDE,
+    IncludeAllModifications: FilterResult.INCLUDE,
+}
+
+
 def get_git_changes(
     git_root: str,
     commit_filters: List[CommitFilter],
     modification_filters: List[ModificationFilter],
     since: Optional[datetime] = None,
+    from_commit: Optional[str] = None,
+    backend: str = "git",
+    commits: Optional[List[str]] = None,
+    path_filter: Optional[PathFilter] = None,
 ) -> Generator[NormalizedModification, None, None]:
     """
     Take a git repository and iterate over the list of modifications.
@@ -144,22 +223,265 @@ def get_git_changes(
     The commit_filters and modification_filters parameters are required. If you want to
     accept all the commits, and all the modifications, pass
     [IncludeAllCommits()], [IncludeAllModifications()]
+
+    If from_commit is set, only the commits from it (inclusive) to HEAD are
+    taken, and the since parameter is ignored.
+
+    The backend is either "git", which reads the output of "git log" and doesn't
+    compute diffs, or "pydriller".
+
+    If the list of commit hashes is set, only these commits are taken, and the
+    other selectors are ignored. This is only supported by the "git" backend.
+
+    If the path filter is set, only modifications of the selected files are
+    taken. The "git" backend passes it to git as pathspecs, so that commits
+    without such modifications are skipped by git itself.
+    """
+    if from_commit:
+        since = None
+    repo_commits: Iterable[CommitT]
+    if backend == "git":
+        repo_commits = iter_git_log(git_root, since, from_commit, commits, path_filter)
+    elif backend == "pydriller":
+        if commits is not None:
+            raise ValueError("Selecting commits is not supported by pydriller")
+        import pydriller
+
+        repo_commits = pydriller.RepositoryMining(
+            git_root, since=since, from_commit=from_commit
+        ).traverse_commits()
+    else:
+        raise ValueError(f"Unknown git backend: {backend!r}")
+    modifications = filter_modifications(
+        repo_commits, commit_filters, modification_filters
+    )
+    if backend != "git" and path_filter is not None:
+        modifications = (mod for mod in modifications if path_filter.matches(mod.path))
+    return modifications
+
+
+def list_commits(
+    git_root: str,
+    since: Optional[datetime] = None,
+    from_commit: Optional[str] = None,
+    path_filter: Optional[PathFilter] = None,
+) -> List[str]:
+    """
+    Return hashes of the commits that get_git_changes() would take.
+    """
+    args = get_revision_args(since, from_commit)
+    pathspecs = get_pathspecs(path_filter)
+    return run_git(git_root, "rev-list", *args, "--", *pathspecs).split()
+
+
+def get_revision_args(
+    since: Optional[datetime] = None, from_commit: Optional[str] = None
+) -> List[str]:
+    """
+    Return git arguments to select the commits since the date or from the commit.
+
+    Naive datetimes are in UTC.
+    """
+    if from_commit:
+        # Exclude parents of the commit to keep the commit itself
+        return ["HEAD", f"^{from_commit}^@"]
+    if since:
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return [f"--since={since.isoformat()}", "HEAD"]
+    return ["HEAD"]
+
+
+def iter_git_log(
+    git_root: str,
+    since: Optional[datetime] = None,
+    from_commit: Optional[str] = None,
+    commits: Optional[List[str]] = None,
+    path_filter: Optional[PathFilter] = None,
+) -> Generator[LogCommit, None, None]:
+    """
+    Iterate over the commits of a repository, parsing the output of "git log".
+
+    Only the names of modified files are requested, so git doesn't compute diffs.
+    The output is parsed lazily, as it comes. If the path filter is set, only the
+    commits that modify the selected files are listed, with these files only.
+    """
+    if commits is not None and not commits:
+        # Without revisions, git would fall back to HEAD
+        return
+    cmd = [
+        "git",
+        "log",
+        "-z",
+        "-M",
+        "--name-status",
+        "--no-show-signature",
+        "--encoding=UTF-8",
+        f"--format={GIT_LOG_FORMAT}",
+    ]
+    if commits is None:
+        cmd += get_revision_args(since, from_commit)
+    else:
+        cmd += ["--no-walk=unsorted", "--stdin"]
+    cmd += ["--", *get_pathspecs(path_filter)]
+
+    proc = subprocess.Popen(
+        cmd,
+        cwd=git_root,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    try:
+        # Git reads all the revisions from stdin before it starts writing the
+        # output, so there is no risk of a deadlock
+        stdin = cast(IO[bytes], proc.stdin)
+        if commits:
+            stdin.write("".join(f"{commit}\n" for commit in commits).encode())
+        stdin.close()
+        yield from parse_git_log(iter_nul_separated(cast(IO[bytes], proc.stdout)))
+        stderr = cast(IO[bytes], proc.stderr).read()
+        if proc.wait() != 0:
+            raise subprocess.CalledProcessError(proc.returncode, cmd, stderr=stderr)
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+        proc.wait()
+        cast(IO[bytes], proc.stdout).close()
+        cast(IO[bytes], proc.stderr).close()
+
+
+def parse_git_log(tokens: Iterator[str]) -> Generator[LogCommit, None, None]:
+    """
+    Parse the output of "git log -z --name-status" split by NUL characters.
+    """
+    commit: Optional[LogCommit] = None
+    for token in tokens:
+        if token.startswith("\x1e"):
+            if commit:
+                yield commit
+            fields = token[1:].split("\x1f", 5)
+            commit_hash, name, email, author_date, committer_date, msg = fields
+            commit = LogCommit(
+                hash=commit_hash,
+                msg=msg.strip(),
+                author=LogDeveloper(name=name, email=email),
+                author_date=datetime.fromisoformat(author_date),
+                committer_date=datetime.fromisoformat(committer_date),
+                modifications=[],
+            )
+            continue
+        status = token.lstrip("\n")
+        if not status or commit is None:
+            continue
+        path = next(tokens)
+        if status[0] in "RC":
+            modification = LogModification(old_path=path, new_path=next(tokens))
+        elif status[0] == "A":
+            modification = LogModification(old_path=None, new_path=path)
+        elif status[0] == "D":
+            modification = LogModification(old_path=path, new_path=None)
+        else:
+            modification = LogModification(old_path=path, new_path=path)
+        commit.modifications.append(modification)
+    if commit:
+        yield commit
+
+
+def iter_nul_separated(
+    stream: IO[bytes], chunk_size: int = 64 * 1024
+) -> Generator[str, None, None]:
+    remainder = b""
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        *tokens, remainder = (remainder + chunk).split(b"\0")
+        for token in tokens:
+            yield token.decode("utf-8", errors="surrogateescape")
+    if remainder:
+        yield remainder.decode("utf-8", errors="surrogateescape")
+
+
+def get_head_commit(git_root: str) -> str:
+    """Return the hash of the HEAD commit of a git repository."""
+    return run_git(git_root, "rev-parse", "HEAD").strip()
+
+
+def is_ancestor(git_root: str, commit: str, descendant: str) -> bool:
+    """
+    Return True if the commit is an ancestor of the descendant, or the same commit.
+
+    Unknown commits, e.g. removed by garbage collection after a history rewrite,
+    are not ancestors of anything.
+    """
+    cmd = ["git", "merge-base", "--is-ancestor", commit, descendant]
+    result = subprocess.run(cmd, cwd=git_root, capture_output=True)
+    return result.returncode == 0
+
+
+def get_renames(git_root: str, base: str, head: str = "HEAD") -> Dict[str, str]:
+    """
+    Return the map from old to new paths of files renamed between two revisions.
+    """
+    output = run_git(git_root, "diff", "-z", "-M", "--name-status", base, head)
+    tokens = iter(output.split("\0"))
+    renames = {}
+    for status in tokens:
+        if not status:
+            continue
+        path = next(tokens)
+        if status[0] in "RC":
+            new_path = next(tokens)
+            if status[0] == "R":
+                renames[path] = new_path
+    return renames
+
+
+def get_blob_sizes(git_root: str, revision: str = "HEAD") -> Dict[str, int]:
+    """
+    Return the map from paths to sizes of all files at the revision.
+
+    The sizes are read from the object database with a single "git ls-tree" call,
+    so the work tree doesn't have to be checked out. Paths are relative to the
+    root of the repository.
     """
-    commits = pydriller.RepositoryMining(git_root, since=since).traverse_commits()
-    return filter_modifications(commits, commit_filters, modification_filters)
+    output = run_git(git_root, "ls-tree", "-r", "-l", "-z", "--full-tree", revision)
+    sizes = {}
+    for entry in output.split("\0"):
+        if not entry:
+            continue
+        # <mode> SP <type> SP <object> SP+ <size> TAB <path>
+        info, path = entry.split("\t", 1)
+        _, object_type, _, size = info.split()
+        if object_type == "blob":
+            sizes[path] = int(size)
+    return sizes
+
+
+def get_pathspecs(path_filter: Optional[PathFilter]) -> List[str]:
+    return [] if path_filter is None else path_filter.get_pathspecs()
+
+
+def run_git(git_root: str, *args: str) -> str:
+    result = subprocess.run(
+        ["git", *args], cwd=git_root, capture_output=True, text=True, check=True
+    )
+    return result.stdout
 
 
 def filter_modifications(
-    commits: Iterator[Commit],
+    commits: Iterable[CommitT],
     commit_filters: List[CommitFilter],
     modification_filters: List[ModificationFilter],
 ) -> Generator[NormalizedModification, None, None]:
+    filter_commit = compile_commit_filters(commit_filters)
+    filter_modification = compile_modification_filters(modification_filters)
     for commit in commits:
-        if apply_commit_filters(commit, commit_filters) == FilterResult.EXCLUDE:
+        if filter_commit(commit) == FilterResult.EXCLUDE:
             continue
         for mod in commit.modifications:
-            filter_result = apply_modification_filters(mod, modification_filters)
-            if filter_result == FilterResult.EXCLUDE:
+            if filter_modification(mod) == FilterResult.EXCLUDE:
                 continue
             yield NormalizedModification.from_commit_modification(commit, mod)
 
@@ -180,3 +502,146 @@ def apply_modification_filters(
         if result in (FilterResult.INCLUDE, FilterResult.EXCLUDE):
             return result
     raise RuntimeError(f"Don't know what to do with modification {modification}")
+
+
+def compile_commit_filters(
+    commit_filters: List[CommitFilter],
+) -> Callable[[CommitT], FilterResult]:
+    """
+    Compile the list of commit filters to a single function.
+
+    The function returns the same results as apply_commit_filters(), but works
+    faster. Consecutive ExcludeAuthor and ExcludeMessage filters are merged, and
+    all their substrings are searched with one regular expression per field.
+    """
+    steps: List[Callable[[CommitT], FilterResult]] = []
+    authors: List[str] = []
+    messages: List[str] = []
+
+    def flush_excludes():
+        if authors or messages:
+            steps.append(exclude_commits(authors, messages))
+        authors.clear()
+        messages.clear()
+
+    for filt in commit_filters:
+        if type(filt) is ExcludeAuthor:
+            authors.append(filt.author_name)
+        elif type(filt) is ExcludeMessage:
+            messages.append(filt.message)
+        elif type(filt) in CATCH_ALL_RESULTS:
+            # The filters after the catch-all one are never reached
+            flush_excludes()
+            return compile_steps(steps, CATCH_ALL_RESULTS[type(filt)])
+        else:
+            flush_excludes()
+            steps.append(filt.filter_commit)
+    flush_excludes()
+    return compile_steps(steps, None, "commit")
+
+
+def compile_modification_filters(
+    modification_filters: List[ModificationFilter],
+) -> Callable[[ModificationT], FilterResult]:
+    """
+    Compile the list of modification filters to a single function.
+
+    The function returns the same results as apply_modification_filters(), but
+    works faster. Patterns of consecutive IncludeFile filters are merged in one
+    precompiled regular expression.
+    """
+    steps: List[Callable[[ModificationT], FilterResult]] = []
+    patterns: List[str] = []
+
+    def flush_includes():
+        if patterns:
+            steps.append(include_files(patterns))
+        patterns.clear()
+
+    for filt in modification_filters:
+        if type(filt) is IncludeFile:
+            patterns.append(filt.file_pattern)
+        elif type(filt) in CATCH_ALL_RESULTS:
+            # The filters after the catch-all one are never reached
+            flush_includes()
+            return compile_steps(steps, CATCH_ALL_RESULTS[type(filt)])
+        else:
+            flush_includes()
+            steps.append(filt.filter_modification)
+    flush_includes()
+    return compile_steps(steps, None, "modification")
+
+
+def exclude_commits(
+    authors: List[str], messages: List[str]
+) -> Callable[[CommitT], FilterResult]:
+    """Return the step to exclude commits by author and message substrings."""
+    author_re = compile_substrings(authors)
+    message_re = compile_substrings(messages)
+
+    def step(commit: CommitT) -> FilterResult:
+        author = commit.author
+        if author_re.search(author.name) or author_re.search(author.email):
+            return FilterResult.EXCLUDE
+        if message_re.search(commit.msg):
+            return FilterResult.EXCLUDE
+        return FilterResult.DONT_KNOW
+
+    return step
+
+
+def include_files(patterns: List[str]) -> Callable[[ModificationT], FilterResult]:
+    """Return the step to include modifications by file patterns."""
+    regex = re.compile(
+        "|".join(fnmatch.translate(os.path.normcase(pattern)) for pattern in patterns)
+    )
+
+    def step(modification: ModificationT) -> FilterResult:
+        path = cast(str, modification.old_path or modification.new_path)
+        if regex.match(os.path.normcase(path)):
+            return FilterResult.INCLUDE
+        return FilterResult.DONT_KNOW
+
+    return step
+
+
+def compile_substrings(substrings: List[str]) -> Pattern[str]:
+    if not substrings:
+        # Never matches
+        return re.compile(r"(?!)")
+    return re.compile("|".join(re.escape(substring) for substring in substrings))
+
+
+def compile_steps(
+    steps: List[Callable[[T], FilterResult]],
+    default: Optional[FilterResult],
+    object_name: str = "object",
+) -> Callable[[T], FilterResult]:
+    """
+    Chain filter steps in a function that returns the first decisive result.
+
+    If none of the steps decide, the function returns the default result, or
+    raises RuntimeError if there's no default.
+    """
+    if not steps and default is not None:
+        return lambda obj: cast(FilterResult, default)
+    if len(steps) == 1 and default is not None:
+        # The most common case: merged filters followed by a catch-all one
+        step = steps[0]
+
+        def apply_step(obj: T) -> FilterResult:
+            result = step(obj)
+            return cast(FilterResult, default) if result is DONT_KNOW else result
+
+        return apply_step
+
+    def apply_steps(obj: T) -> FilterResult:
+        for step in steps:
+            result = step(obj)
+            if result is not DONT_KNOW:
+                return result
+        if default is None:
+            raise RuntimeError(f"Don't know what to do with {object_name} {obj}")
+        return default
+
+    return apply_steps
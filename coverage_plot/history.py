@@ -0,0 +1,260 @@
+import json
+import os
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from attrs import define, field, frozen
+
+from coverage_plot.plot import ColumnarReport, Report
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from plotly.graph_objs import Figure
+
+# Line counts of a file in a snapshot. Paths are stored once, in the dictionary,
+# and records refer to them by their positions there.
+RECORD_DTYPE = np.dtype(
+    [("path_id", "<u4"), ("covered_lines", "<u4"), ("missing_lines", "<u4")]
+)
+
+
+@frozen
+class Snapshot:
+    """Report of a commit, stored as records [offset, offset + length)."""
+
+    commit: str
+    timestamp: datetime
+    offset: int
+    length: int
+
+    @property
+    def records(self) -> slice:
+        """Return the slice of the records array with the snapshot records."""
+        return slice(self.offset, self.offset + self.length)
+
+
+@define
+class CoverageHistory:
+    """
+    Append-only store of coverage reports over time.
+
+    The store is a directory with three files:
+
+    - paths.bin, every path once, terminated by NUL characters, in the order of
+      their ids.
+    - records.bin, an array of RECORD_DTYPE records, one per file per snapshot.
+    - snapshots.jsonl, one line per snapshot, pointing to its records.
+
+    A snapshot is written to its line in snapshots.jsonl last, so that an
+    interrupted append leaves no visible traces. Queries map records to memory,
+    and read one snapshot at a time. The store supports a single writer.
+    """
+
+    directory: str
+    _paths: Optional[List[str]] = field(default=None, init=False, repr=False)
+    _path_ids: Optional[Dict[str, int]] = field(default=None, init=False, repr=False)
+    _paths_size: int = field(default=0, init=False, repr=False)
+
+    def append(self, report: Report, commit: str, timestamp: datetime) -> Snapshot:
+        """
+        Add the report of the commit to the history.
+
+        Raise ValueError if the commit is in the history already.
+        """
+        snapshots, snapshots_size = self.load_snapshots()
+        if any(snapshot.commit == commit for snapshot in snapshots):
+            raise ValueError(f"Commit {commit} is in the history already")
+        os.makedirs(self.directory, exist_ok=True)
+        columnar = ColumnarReport.from_mapping(report)
+        path_ids = self.add_paths(columnar.paths)
+
+        records = np.empty(len(path_ids), dtype=RECORD_DTYPE)
+        records["path_id"] = path_ids
+        records["covered_lines"] = columnar.covered_lines
+        records["missing_lines"] = columnar.missing_lines
+        records.sort(order="path_id")
+        offset = max((s.offset + s.length for s in snapshots), default=0)
+        with open(self.get_filename("records.bin"), "ab") as fd:
+            # Drop records left at the end of the file by interrupted appends
+            fd.truncate(offset * RECORD_DTYPE.itemsize)
+            fd.write(records.tobytes())
+
+        snapshot = Snapshot(commit, timestamp, offset, len(records))
+        raw_snapshot = {
+            "commit": commit,
+            "timestamp": timestamp.isoformat(),
+            "offset": offset,
+            "length": len(records),
+        }
+        with open(self.get_filename("snapshots.jsonl"), "ab") as fd:
+            fd.truncate(snapshots_size)
+            fd.write(json.dumps(raw_snapshot).encode("utf-8") + b"\n")
+        return snapshot
+
+    def snapshots(self) -> List[Snapshot]:
+        """Return all snapshots, in the order they were added."""
+        snapshots, _ = self.load_snapshots()
+        return snapshots
+
+    def load_snapshots(self) -> Tuple[List[Snapshot], int]:
+        """
+        Return all snapshots and the size of their lines in snapshots.jsonl.
+
+        The text after the last line break is left by an interrupted append, and is
+        ignored.
+        """
+        try:
+            with open(self.get_filename("snapshots.jsonl"), "rb") as fd:
+                raw_snapshots = fd.read()
+        except FileNotFoundError:
+            return [], 0
+        size = raw_snapshots.rfind(b"\n") + 1
+        snapshots = []
+        for line in raw_snapshots[:size].splitlines():
+            raw_snapshot = json.loads(line)
+            snapshots.append(
+                Snapshot(
+                    commit=raw_snapshot["commit"],
+                    timestamp=datetime.fromisoformat(raw_snapshot["timestamp"]),
+                    offset=raw_snapshot["offset"],
+                    length=raw_snapshot["length"],
+                )
+            )
+        return snapshots, size
+
+    def get_report(self, commit: str) -> ColumnarReport:
+        """
+        Return the report of the commit, to plot it as any other report.
+
+        Raise KeyError if the commit is not in the history.
+        """
+        for snapshot in self.snapshots():
+            if snapshot.commit == commit:
+                records = self.read_records()[snapshot.records]
+                paths = np.array(self.get_paths(), dtype=object)
+                return ColumnarReport(
+                    paths[records["path_id"]],
+                    records["covered_lines"].astype(np.int64),
+                    records["missing_lines"].astype(np.int64),
+                )
+        raise KeyError(commit)
+
+    def trend(self, prefix: str = "") -> "pd.DataFrame":
+        """
+        Return coverage of files under the prefix in every snapshot.
+
+        The prefix is a directory, such as "src/api", or a file path. An empty
+        prefix selects all files. The DataFrame has the commit, timestamp,
+        covered_lines, missing_lines, and percent_covered columns.
+        """
+        import pandas as pd
+
+        paths = self.get_paths()
+        selected = np.fromiter(
+            (is_under(path, prefix) for path in paths), dtype=bool, count=len(paths)
+        )
+        snapshots = self.snapshots()
+        covered_lines = np.zeros(len(snapshots), dtype=np.int64)
+        missing_lines = np.zeros(len(snapshots), dtype=np.int64)
+        all_records = self.read_records()
+        for i, snapshot in enumerate(snapshots):
+            records = all_records[snapshot.records]
+            mask = selected[records["path_id"]]
+            covered_lines[i] = records["covered_lines"][mask].sum()
+            missing_lines[i] = records["missing_lines"][mask].sum()
+        total_lines = covered_lines + missing_lines
+        percent_covered = np.divide(
+            100.0 * covered_lines,
+            total_lines,
+            out=np.zeros(len(total_lines), dtype=np.float64),
+            where=total_lines != 0,
+        )
+        return pd.DataFrame(
+            {
+                "commit": [snapshot.commit for snapshot in snapshots],
+                "timestamp": [snapshot.timestamp for snapshot in snapshots],
+                "covered_lines": covered_lines,
+                "missing_lines": missing_lines,
+                "percent_covered": percent_covered,
+            }
+        )
+
+    def read_records(self) -> np.ndarray:
+        """Map records of all snapshots to memory, without reading them."""
+        filename = self.get_filename("records.bin")
+        if not os.path.exists(filename) or not os.path.getsize(filename):
+            return np.empty(0, dtype=RECORD_DTYPE)
+        return np.memmap(filename, dtype=RECORD_DTYPE, mode="r")
+
+    def get_paths(self) -> List[str]:
+        """Return the dictionary of paths, indexed by their ids."""
+        if self._paths is None:
+            try:
+                with open(self.get_filename("paths.bin"), "rb") as fd:
+                    raw_paths = fd.read()
+            except FileNotFoundError:
+                raw_paths = b""
+            # Ignore the text after the last terminator, left by an interrupted
+            # append
+            self._paths_size = raw_paths.rfind(b"\0") + 1
+            self._paths = raw_paths[: self._paths_size].decode("utf-8").split("\0")
+            self._paths.pop()
+        return self._paths
+
+    def add_paths(self, paths: Iterable[str]) -> np.ndarray:
+        """Return ids of the paths, adding new ones to the dictionary."""
+        known_paths = self.get_paths()
+        if self._path_ids is None:
+            self._path_ids = {path: i for i, path in enumerate(known_paths)}
+        path_ids = self._path_ids
+        new_paths: List[str] = []
+        ids = []
+        for path in paths:
+            path_id = path_ids.get(path)
+            if path_id is None:
+                path_id = path_ids[path] = len(known_paths) + len(new_paths)
+                new_paths.append(path)
+            ids.append(path_id)
+        if new_paths:
+            raw_paths = "".join(f"{path}\0" for path in new_paths).encode("utf-8")
+            with open(self.get_filename("paths.bin"), "ab") as fd:
+                fd.truncate(self._paths_size)
+                fd.write(raw_paths)
+            self._paths_size += len(raw_paths)
+            known_paths.extend(new_paths)
+        return np.array(ids, dtype=np.uint32)
+
+    def get_filename(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+
+def is_under(path: str, prefix: str) -> bool:
+    """Return True if the path is the prefix itself or is in the prefix directory."""
+    prefix = prefix.rstrip("/")
+    return not prefix or path == prefix or path.startswith(f"{prefix}/")
+
+
+def plot_trend(history: CoverageHistory, prefixes: List[str]) -> "Figure":
+    """Return a Figure with coverage of every prefix over time, one line each."""
+    import plotly.graph_objects as go
+
+    figure = go.Figure()
+    for prefix in prefixes:
+        trend = history.trend(prefix)
+        figure.add_trace(
+            go.Scatter(
+                x=trend["timestamp"],
+                y=trend["percent_covered"].round(1),
+                customdata=trend["commit"],
+                mode="lines+markers",
+                name=prefix or "(all files)",
+                hovertemplate="%{x}<br>%{customdata}<br>percent_covered=%{y:.1f}",
+            )
+        )
+    figure.update_layout(
+        xaxis={"title": {"text": "timestamp"}},
+        yaxis={"title": {"text": "percent_covered"}, "range": [0, 100]},
+        margin={"t": 60},
+    )
+    return figure
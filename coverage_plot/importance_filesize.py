@@ -1,7 +1,10 @@
+from typing import Iterable
+
+import numpy as np
 from attrs import define
 
 from coverage_plot.importance_interface import Importance
-from coverage_plot.plot import Report
+from coverage_plot.plot import ColumnarReport, Report
 
 
 @define
@@ -15,3 +18,9 @@ class FileSizeImportance(Importance):
         if not file_coverage:
             return 0
         return file_coverage.total_lines()
+
+    def get_importances(self, filenames: Iterable[str]) -> np.ndarray:
+        report = ColumnarReport.from_mapping(self.coverage_report)
+        if filenames is report.paths:
+            return report.total_lines()
+        return report.total_lines()[report.get_indices(filenames)]
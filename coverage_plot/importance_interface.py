@@ -1,4 +1,7 @@
 import abc
+from typing import Iterable
+
+import numpy as np
 
 
 class Importance(abc.ABC):
@@ -6,7 +9,8 @@ class Importance(abc.ABC):
     Generic interface for importance metrics.
 
     Subclasses of Importance implement a method that takes the filename, and return
-    an importance score for it.
+    an importance score for it. Subclasses that can score many files at once more
+    efficiently override get_importances() as well.
     """
 
     @abc.abstractmethod
@@ -14,3 +18,10 @@ class Importance(abc.ABC):
         """
         Return an importance score for a file.
         """
+
+    def get_importances(self, filenames: Iterable[str]) -> np.ndarray:
+        """
+        Return an array of importance scores for files.
+        """
+        scores = (self.get_importance(filename) for filename in filenames)
+        return np.fromiter(scores, dtype=np.int64)
@@ -1,9 +1,13 @@
 import os
+from concurrent.futures import ProcessPoolExecutor
 from datetime import MINYEAR, datetime, timedelta
-from typing import Dict, Iterator, List, cast
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, cast
 
-from attrs import define, field
+import numpy as np
+from attrs import define, field, validators
 
+from coverage_plot.decay import DecayCurve, HyperbolicDecay, score_timestamps
+from coverage_plot.git_cache import CacheEntry, LastModifiedCache
 from coverage_plot.git_changes import (
     CommitFilter,
     ExcludeAllModifications,
@@ -13,9 +17,27 @@ from coverage_plot.git_changes import (
     IncludeFile,
     ModificationFilter,
     NormalizedModification,
+    get_blob_sizes,
     get_git_changes,
+    get_head_commit,
+    is_ancestor,
+    list_commits,
 )
 from coverage_plot.importance_interface import Importance
+from coverage_plot.path_filter import PathFilter
+
+# Number of commit shards per worker for parallel mining
+SHARDS_PER_WORKER = 4
+
+# Dates of the changes of a file, as (committer date, author date) pairs. Changes
+# that are older by both dates than another change are left out, as they can't be
+# the last modification in any time window.
+ChangeDates = List[Tuple[datetime, datetime]]
+
+# Arguments of mine_shard(): git root, filters, commit hashes, and path filter
+ShardTask = Tuple[
+    str, List[CommitFilter], List[ModificationFilter], List[str], Optional[PathFilter]
+]
 
 
 def year_ago():
@@ -37,48 +59,335 @@ class GitImportance(Importance):
         factory=lambda: [IncludeFile("*.py"), ExcludeAllModifications()]
     )
     since: datetime = field(factory=year_ago)
+    cache_dir: Optional[str] = None
+    backend: str = "git"
+    workers: int = 1
+    size_provider: str = field(
+        default="stat", validator=validators.in_(("stat", "git"))
+    )
+    revision: str = "HEAD"
+    path_filter: Optional[PathFilter] = None
+    decay: DecayCurve = field(factory=HyperbolicDecay)
+    # Reference time to count the age of changes from, the same for all files
+    now: datetime = field(factory=datetime.utcnow)
     last_modified_dict: Dict[str, datetime] = field(
         factory=dict, init=False, repr=False
     )
+    file_sizes: Dict[str, int] = field(factory=dict, init=False, repr=False)
+    blob_sizes: Optional[Dict[str, int]] = field(default=None, init=False, repr=False)
 
     def __attrs_post_init__(self):
-        git_changes = get_git_changes(
+        if self.cache_dir is None:
+            self.last_modified_dict = self.mine_last_modified()
+        else:
+            self.last_modified_dict = self.get_cached_last_modified(self.cache_dir)
+
+    def mine_last_modified(self) -> Dict[str, datetime]:
+        return get_last_modified(
+            self.git_root,
+            self.commit_filters,
+            self.modification_filters,
+            since=self.since,
+            backend=self.backend,
+            workers=self.workers,
+            path_filter=self.path_filter,
+        )
+
+    def mine_change_dates(
+        self, from_commit: Optional[str] = None
+    ) -> Dict[str, ChangeDates]:
+        return get_change_dates(
             self.git_root,
             self.commit_filters,
             self.modification_filters,
             since=self.since,
+            from_commit=from_commit,
+            backend=self.backend,
+            workers=self.workers,
+            path_filter=self.path_filter,
+        )
+
+    def get_cached_last_modified(self, cache_dir: str) -> Dict[str, datetime]:
+        """
+        Get the last-modified map, only mining the commits missing in the cache.
+
+        The cache is reused if it covers the whole time window, and if its last
+        commit is still an ancestor of HEAD. Otherwise, e.g., after a history
+        rewrite, it's rebuilt from scratch.
+        """
+        cache = LastModifiedCache(cache_dir)
+        cache_key = (
+            self.git_root,
+            self.commit_filters,
+            self.modification_filters,
+            self.path_filter,
         )
-        self.last_modified_dict = convert_to_last_modified(git_changes)
+        head = get_head_commit(self.git_root)
+        entry = cache.load(*cache_key)
+        if (
+            entry is None
+            or entry.since > self.since
+            or not is_ancestor(self.git_root, entry.last_commit, head)
+        ):
+            entry = CacheEntry(since=self.since, last_commit=head)
+            entry.change_dates = self.mine_change_dates()
+            cache.save(*cache_key, entry)
+        elif entry.last_commit != head:
+            new_changes = self.mine_change_dates(from_commit=entry.last_commit)
+            merge_change_dates(entry.change_dates, new_changes)
+            entry.last_commit = head
+            cache.save(*cache_key, entry)
+
+        # The cache may cover a longer time window than requested. Commits are
+        # selected by the committer date, as "git log --since" does.
+        return select_last_modified(entry.change_dates, self.since)
 
     def get_importance(self, filename: str) -> int:
         imp1 = self.get_recency_importance(filename)
         imp2 = self.get_filesize_importance(filename)
         return imp1 * imp2
 
+    def get_importances(self, filenames: Iterable[str]) -> np.ndarray:
+        filenames = list(filenames)
+        recency = self.get_recency_importances(filenames)
+        filesize = np.zeros(len(filenames), dtype=np.int64)
+        # The size doesn't matter for files that weren't modified recently, so
+        # there's no need to stat them
+        for i in np.flatnonzero(recency):
+            filesize[i] = self.get_filesize_importance(filenames[i])
+        return recency * filesize
+
+    def get_recency_importances(self, filenames: List[str]) -> np.ndarray:
+        last_modified = np.array(
+            [self.last_modified_dict.get(filename) for filename in filenames],
+            dtype="datetime64[us]",
+        )
+        return score_timestamps(last_modified, self.now, self.decay)
+
     def get_recency_importance(self, filename: str) -> int:
         last_modified = self.last_modified_dict.get(filename)
         if last_modified is None:
             return 0
-        return timestamp_to_importance(last_modified)
+        return timestamp_to_importance(last_modified, self.now, self.decay)
 
     def get_filesize_importance(self, filename: str) -> int:
-        absolute_filename = os.path.join(self.git_root, filename)
-        try:
-            return os.stat(absolute_filename).st_size
-        except FileNotFoundError:
-            return 0
+        size = self.file_sizes.get(filename)
+        if size is None:
+            size = self.file_sizes[filename] = self.get_file_size(filename)
+        return size
+
+    def prefetch_file_sizes(self) -> None:
+        """
+        Get sizes of all recently modified files in advance.
+
+        Only these files have non-zero importance, so that get_importances()
+        doesn't touch the file system afterwards. Prefetching is useful in a
+        background thread, while the coverage report is being imported.
+        """
+        for filename in self.last_modified_dict:
+            self.get_filesize_importance(filename)
+
+    def get_file_size(self, filename: str) -> int:
+        """
+        Return the size of the file, or zero if it doesn't exist.
+
+        The "stat" size provider reads sizes from the work tree, one file at a
+        time. The "git" one reads sizes of all files at the revision from the
+        object database at once, and works without a checkout.
+        """
+        if self.size_provider == "stat":
+            absolute_filename = os.path.join(self.git_root, filename)
+            try:
+                return os.stat(absolute_filename).st_size
+            except FileNotFoundError:
+                return 0
+        if self.blob_sizes is None:
+            self.blob_sizes = get_blob_sizes(self.git_root, self.revision)
+        return self.blob_sizes.get(filename, 0)
 
 
-def timestamp_to_importance(last_modified: datetime) -> int:
+def timestamp_to_importance(
+    last_modified: datetime,
+    now: Optional[datetime] = None,
+    decay: Optional[DecayCurve] = None,
+) -> int:
     """
     Convert the timestamps to an importance metric.
     """
-    base_importance = 1000
-    now = datetime.utcnow()
-    modified_weeks_ago = (now - last_modified).days // 7
-    if modified_weeks_ago <= 0:
-        return base_importance
-    return base_importance // modified_weeks_ago
+    last_modified_array = np.array([last_modified], dtype="datetime64[us]")
+    return int(timestamps_to_importance(last_modified_array, now, decay)[0])
+
+
+def timestamps_to_importance(
+    last_modified: np.ndarray,
+    now: Optional[datetime] = None,
+    decay: Optional[DecayCurve] = None,
+) -> np.ndarray:
+    """
+    Convert an array of timestamps to importance metrics at once.
+
+    By default, the importance is 1000 divided by the number of weeks since the
+    change, counted from the current time.
+    """
+    if now is None:
+        now = datetime.utcnow()
+    if decay is None:
+        decay = HyperbolicDecay()
+    return score_timestamps(last_modified, now, decay)
+
+
+def get_last_modified(
+    git_root: str,
+    commit_filters: List[CommitFilter],
+    modification_filters: List[ModificationFilter],
+    since: Optional[datetime] = None,
+    from_commit: Optional[str] = None,
+    backend: str = "git",
+    workers: int = 1,
+    path_filter: Optional[PathFilter] = None,
+) -> Dict[str, datetime]:
+    """
+    Mine the git history and return the dict from filename to last modification.
+
+    See get_change_dates() for the meaning of the parameters.
+    """
+    change_dates = get_change_dates(
+        git_root,
+        commit_filters,
+        modification_filters,
+        since=since,
+        from_commit=from_commit,
+        backend=backend,
+        workers=workers,
+        path_filter=path_filter,
+    )
+    return select_last_modified(change_dates)
+
+
+def get_change_dates(
+    git_root: str,
+    commit_filters: List[CommitFilter],
+    modification_filters: List[ModificationFilter],
+    since: Optional[datetime] = None,
+    from_commit: Optional[str] = None,
+    backend: str = "git",
+    workers: int = 1,
+    path_filter: Optional[PathFilter] = None,
+) -> Dict[str, ChangeDates]:
+    """
+    Mine the git history and return the dict from filename to its change dates.
+
+    With more than one worker, the commits are split into shards, mined in a pool
+    of processes, and the results are merged. Only the "git" backend supports it.
+    If the path filter is set, only the selected files are mined.
+    """
+    if workers <= 1:
+        git_changes = get_git_changes(
+            git_root,
+            commit_filters,
+            modification_filters,
+            since=since,
+            from_commit=from_commit,
+            backend=backend,
+            path_filter=path_filter,
+        )
+        return convert_to_change_dates(git_changes)
+
+    if backend != "git":
+        raise ValueError(f"Parallel mining is not supported by {backend!r} backend")
+    commits = list_commits(git_root, since, from_commit, path_filter)
+    # Smaller shards even out the load when some commits are larger than others
+    shard_size = max(1, -(-len(commits) // (workers * SHARDS_PER_WORKER)))
+    bounds = [*range(0, len(commits), shard_size), len(commits)]
+    tasks = [
+        (
+            git_root,
+            commit_filters,
+            modification_filters,
+            commits[start:end],
+            path_filter,
+        )
+        for start, end in zip(bounds, bounds[1:])
+    ]
+    change_dates: Dict[str, ChangeDates] = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for shard_change_dates in executor.map(mine_shard, tasks):
+            merge_change_dates(change_dates, shard_change_dates)
+    return change_dates
+
+
+def mine_shard(task: ShardTask) -> Dict[str, ChangeDates]:
+    """Mine the shard of commits in a worker process."""
+    git_root, commit_filters, modification_filters, commits, path_filter = task
+    git_changes = get_git_changes(
+        git_root,
+        commit_filters,
+        modification_filters,
+        commits=commits,
+        path_filter=path_filter,
+    )
+    return convert_to_change_dates(git_changes)
+
+
+def convert_to_change_dates(
+    modifications: Iterator[NormalizedModification],
+) -> Dict[str, ChangeDates]:
+    """
+    Take modifications and return the dict from filename to its change dates.
+    """
+    change_dates: Dict[str, ChangeDates] = {}
+    for mod in modifications:
+        add_change_date(
+            change_dates.setdefault(mod.path, []), mod.committer_date, mod.author_date
+        )
+    return change_dates
+
+
+def add_change_date(
+    dates: ChangeDates, committer_date: datetime, author_date: datetime
+) -> None:
+    """Add the dates of a change, dropping the changes it supersedes."""
+    for other_committer_date, other_author_date in dates:
+        if other_committer_date >= committer_date and other_author_date >= author_date:
+            return
+    dates[:] = [
+        (other_committer_date, other_author_date)
+        for other_committer_date, other_author_date in dates
+        if other_committer_date > committer_date or other_author_date > author_date
+    ]
+    dates.append((committer_date, author_date))
+
+
+def merge_change_dates(
+    target: Dict[str, ChangeDates], source: Dict[str, ChangeDates]
+) -> Dict[str, ChangeDates]:
+    """Merge the source change dates into the target ones."""
+    for path, dates in source.items():
+        target_dates = target.setdefault(path, [])
+        for committer_date, author_date in dates:
+            add_change_date(target_dates, committer_date, author_date)
+    return target
+
+
+def select_last_modified(
+    change_dates: Dict[str, ChangeDates], since: Optional[datetime] = None
+) -> Dict[str, datetime]:
+    """
+    Return the last modification of every file, from its change dates.
+
+    If since is set, only the changes committed since then are taken, like "git
+    log --since" does, and files without such changes are left out.
+    """
+    last_modified_dict = {}
+    for path, dates in change_dates.items():
+        author_dates = [
+            author_date
+            for committer_date, author_date in dates
+            if since is None or committer_date >= since
+        ]
+        if author_dates:
+            last_modified_dict[path] = max(author_dates)
+    return last_modified_dict
 
 
 def convert_to_last_modified(
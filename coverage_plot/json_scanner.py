@@ -0,0 +1,165 @@
+import codecs
+import json
+import re
+from json.decoder import scanstring  # type: ignore
+from typing import IO, Any, Iterator
+
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+STRUCTURAL = re.compile(r'["\[\]{}]')
+STRING_TAIL = re.compile(r'(?:[^"\\]|\\.)*"', re.DOTALL)
+SCALAR = re.compile(r"[^,:\]}\s]*")
+
+
+class JSONScanner:
+    """
+    Incremental reader of a JSON document.
+
+    The scanner reads the stream chunk by chunk and lets the caller walk objects
+    key by key. Values the caller is not interested in are skipped without
+    creating any Python objects, so memory usage only depends on the size of the
+    values that are actually read.
+    """
+
+    chunk_size = 64 * 1024
+
+    def __init__(self, stream: IO):
+        self.stream = stream
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.json_decoder = json.JSONDecoder()
+
+    def iter_object(self) -> Iterator[str]:
+        """
+        Iterate over the keys of the object starting at the current position.
+
+        The caller must consume the value of every yielded key, either with
+        read_value(), skip_value() or another iter_object().
+        """
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.read_string()
+            self.expect(":")
+            yield key
+            char = self.peek()
+            self.pos += 1
+            if char == "}":
+                return
+            if char != ",":
+                raise self.error(f"Expected ',' or '}}', got {char!r}")
+
+    def read_value(self) -> Any:
+        """Decode the value at the current position."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.json_decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # A number at the end of the buffer may continue in the next chunk
+            if end == len(self.buf) and self.fill():
+                continue
+            self.pos = end
+            return value
+
+    def read_string(self) -> str:
+        self.peek()
+        while True:
+            if self.buf[self.pos] != '"':
+                raise self.error("Expected a string")
+            try:
+                value, self.pos = scanstring(self.buf, self.pos + 1)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            return value
+
+    def skip_value(self) -> None:
+        """Move past the value at the current position without decoding it."""
+        char = self.peek()
+        if char == '"':
+            self.pos += 1
+            self.skip_string_tail()
+        elif char in "[{":
+            self.skip_container()
+        else:
+            self.skip_scalar()
+
+    def skip_string_tail(self) -> None:
+        while True:
+            match = STRING_TAIL.match(self.buf, self.pos)
+            if match:
+                self.pos = match.end()
+                return
+            if not self.fill():
+                raise self.error("Unterminated string")
+
+    def skip_container(self) -> None:
+        depth = 0
+        while True:
+            match = STRUCTURAL.search(self.buf, self.pos)
+            if not match:
+                # Nothing interesting left in the buffer, drop it altogether
+                self.pos = len(self.buf)
+                if not self.fill():
+                    raise self.error("Unterminated container")
+                continue
+            self.pos = match.end()
+            char = match.group()
+            if char == '"':
+                self.skip_string_tail()
+            elif char in "[{":
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return
+
+    def skip_scalar(self) -> None:
+        while True:
+            self.pos = SCALAR.match(self.buf, self.pos).end()  # type: ignore
+            if self.pos < len(self.buf) or not self.fill():
+                return
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise self.error(f"Expected {char!r}")
+        self.pos += 1
+
+    def peek(self) -> str:
+        """Skip whitespace and return the next character."""
+        while True:
+            self.pos = WHITESPACE.match(self.buf, self.pos).end()  # type: ignore
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                raise self.error("Unexpected end of document")
+
+    def fill(self) -> bool:
+        """
+        Read the next chunk from the stream to the buffer.
+
+        Return False if the stream is exhausted.
+        """
+        if self.eof:
+            return False
+        chunk = ""
+        while not chunk:
+            raw = self.stream.read(self.chunk_size)
+            if not raw:
+                self.eof = True
+                return False
+            chunk = self.decoder.decode(raw) if isinstance(raw, bytes) else raw
+        pos, self.pos = self.pos, 0
+        self.buf = self.buf[pos:] + chunk
+        return True
+
+    def error(self, message: str) -> json.JSONDecodeError:
+        return json.JSONDecodeError(message, self.buf, self.pos)
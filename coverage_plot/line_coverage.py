@@ -0,0 +1,235 @@
+import functools
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+from xml.etree import ElementTree as ET
+
+import numpy as np
+from attrs import define, field
+
+from coverage_plot.json_scanner import JSONScanner
+from coverage_plot.path_filter import PathFilter
+from coverage_plot.plot import (
+    ColumnarReport,
+    FileCoverage,
+    Source,
+    open_source,
+    parse_xml_classes,
+)
+
+# Statement and executed lines of a file, as bitmaps
+LineBitmaps = Tuple[int, int]
+
+
+@define(eq=False)
+class LineReport(Mapping[str, FileCoverage]):
+    """
+    Coverage report with the lines of every file, not only their numbers.
+
+    Statement and executed lines are bitmaps, stored as Python integers where bit
+    N is set if line N is a statement or was executed, like numbits of
+    coverage.py. Unlike line counts, bitmaps of reports of the same code can be
+    merged: a line executed in any of the reports is executed in the result.
+
+    Paths are sorted. The report behaves as a read-only mapping of FileCoverage
+    objects, so it can be passed to export_df() and the plot functions as is.
+    """
+
+    paths: np.ndarray
+    statements: np.ndarray
+    executed: np.ndarray
+    _columnar: Optional[ColumnarReport] = field(default=None, init=False, repr=False)
+
+    @classmethod
+    def from_mapping(cls, files: Mapping[str, LineBitmaps]) -> "LineReport":
+        """Create the report from the mapping of paths to their line bitmaps."""
+        paths = sorted(files)
+        statements = np.empty(len(paths), dtype=object)
+        executed = np.empty(len(paths), dtype=object)
+        for i, path in enumerate(paths):
+            statements[i], executed[i] = files[path]
+        return cls(np.array(paths, dtype=object), statements, executed)
+
+    def to_columnar(self) -> ColumnarReport:
+        """Count covered and missing lines of every file."""
+        if self._columnar is None:
+            covered = np.bitwise_and(self.statements, self.executed)
+            missing = np.bitwise_and(self.statements, np.invert(self.executed))
+            self._columnar = ColumnarReport(
+                self.paths, count_bits(covered), count_bits(missing)
+            )
+        return self._columnar
+
+    def merge(self, other: "LineReport") -> "LineReport":
+        return merge_line_reports([self, other])
+
+    def __getitem__(self, filename: str) -> FileCoverage:
+        return self.to_columnar()[filename]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.paths)
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+
+def merge_line_reports(reports: Sequence[LineReport]) -> LineReport:
+    """
+    Merge line bitmaps of the reports, file by file.
+
+    Reports of shards of the same test suite usually list the same files, and
+    their bitmaps are combined without aligning the paths.
+    """
+    reports = [report for report in reports if len(report)]
+    if not reports:
+        return LineReport.from_mapping({})
+    first = reports[0]
+    if all(np.array_equal(report.paths, first.paths) for report in reports[1:]):
+        return LineReport(
+            first.paths,
+            functools.reduce(np.bitwise_or, [report.statements for report in reports]),
+            functools.reduce(np.bitwise_or, [report.executed for report in reports]),
+        )
+    paths, positions = np.unique(
+        np.concatenate([report.paths for report in reports]), return_inverse=True
+    )
+    statements = np.concatenate([report.statements for report in reports])
+    executed = np.concatenate([report.executed for report in reports])
+    return LineReport(
+        paths,
+        scatter_or(positions, statements, len(paths)),
+        scatter_or(positions, executed, len(paths)),
+    )
+
+
+def scatter_or(positions: np.ndarray, bitmaps: np.ndarray, size: int) -> np.ndarray:
+    result = np.zeros(size, dtype=object)
+    np.bitwise_or.at(result, positions, bitmaps)
+    return result
+
+
+def make_bitmap(line_numbers: Iterable[int]) -> int:
+    """Return the bitmap with bits of the line numbers set."""
+    numbers = np.fromiter(line_numbers, dtype=np.int64)
+    if not len(numbers):
+        return 0
+    bits = np.zeros(numbers.max() + 1, dtype=bool)
+    bits[numbers] = True
+    return int.from_bytes(np.packbits(bits, bitorder="little").tobytes(), "little")
+
+
+def count_bits(bitmaps: np.ndarray) -> np.ndarray:
+    return np.fromiter(
+        (bin(bitmap).count("1") for bitmap in bitmaps),
+        dtype=np.int64,
+        count=len(bitmaps),
+    )
+
+
+def import_json_lines(
+    source: Source, path_filter: Optional[PathFilter] = None
+) -> LineReport:
+    """
+    Create a LineReport from a coverage.json file.
+
+    Statements are the executed and missing lines. Other per-line arrays, such as
+    contexts, are skipped over.
+    """
+    files = {}
+    with open_source(source) as stream:
+        scanner = JSONScanner(stream)
+        for key in scanner.iter_object():
+            if key != "files":
+                scanner.skip_value()
+                continue
+            for filename in scanner.iter_object():
+                if path_filter is not None and not path_filter.matches(filename):
+                    scanner.skip_value()
+                    continue
+                lines: Dict[str, List[int]] = {
+                    "executed_lines": [],
+                    "missing_lines": [],
+                }
+                for key in scanner.iter_object():
+                    if key in lines:
+                        lines[key] = scanner.read_value()
+                    else:
+                        scanner.skip_value()
+                executed = make_bitmap(lines["executed_lines"])
+                files[filename] = (
+                    executed | make_bitmap(lines["missing_lines"]),
+                    executed,
+                )
+    return LineReport.from_mapping(files)
+
+
+def import_xml_lines(
+    source: Source, path_filter: Optional[PathFilter] = None
+) -> LineReport:
+    """
+    Create a LineReport from a Cobertura XML file.
+
+    Every <line> of a <class> is a statement, and the ones with hits are executed.
+    """
+    return LineReport.from_mapping(
+        dict(parse_xml_classes(source, read_xml_line_bitmaps, path_filter))
+    )
+
+
+def read_xml_line_bitmaps(class_elem: ET.Element) -> LineBitmaps:
+    statements = []
+    executed = []
+    for line in class_elem.iterfind("lines/line"):
+        number = int(line.attrib["number"])
+        statements.append(number)
+        if line.attrib["hits"] != "0":
+            executed.append(number)
+    return make_bitmap(statements), make_bitmap(executed)
+
+
+def import_lines_file(
+    filename: str, path_filter: Optional[PathFilter] = None
+) -> LineReport:
+    """
+    Create a LineReport from a coverage.json or coverage.xml file.
+
+    The .coverage data file doesn't record which lines are statements, and isn't
+    supported.
+    """
+    importers = {".json": import_json_lines, ".xml": import_xml_lines}
+    _, ext = os.path.splitext(filename)
+    if ext not in importers:
+        raise ValueError(f"Can't read line coverage from {filename}")
+    return importers[ext](filename, path_filter)
+
+
+def import_shards(
+    filenames: Sequence[str],
+    workers: int = 1,
+    path_filter: Optional[PathFilter] = None,
+) -> LineReport:
+    """
+    Import line coverage of shards of a test suite, and merge it.
+
+    With more than one worker, the files are split between worker processes,
+    every worker merges the reports of its files, and the partial reports are
+    merged at the end. Reports are merged as soon as they are imported, so that
+    only two of them are in memory at a time.
+    """
+    if workers <= 1 or len(filenames) <= 1:
+        return import_shard_group(filenames, path_filter)
+    groups: List[Sequence[str]] = [filenames[i::workers] for i in range(workers)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        partial_reports = executor.map(
+            import_shard_group, groups, itertools.repeat(path_filter)
+        )
+        return functools.reduce(LineReport.merge, partial_reports)
+
+
+def import_shard_group(
+    filenames: Sequence[str], path_filter: Optional[PathFilter] = None
+) -> LineReport:
+    """Import and merge the reports one by one, in a worker process."""
+    reports = (import_lines_file(filename, path_filter) for filename in filenames)
+    return functools.reduce(LineReport.merge, reports, LineReport.from_mapping({}))
@@ -0,0 +1,69 @@
+import hashlib
+from typing import Iterable, List, Tuple
+
+from attrs import field, frozen
+
+
+def normalize_prefixes(prefixes: Iterable[str]) -> Tuple[str, ...]:
+    """Strip slashes and "./" from the prefixes, and drop empty ones."""
+    normalized = set()
+    for prefix in prefixes:
+        prefix = prefix.strip("/")
+        while prefix.startswith("./"):
+            prefix = prefix[2:]
+        if prefix and prefix != ".":
+            normalized.add(prefix)
+    return tuple(sorted(normalized))
+
+
+@frozen
+class PathFilter:
+    """
+    Selection of files by path prefixes, such as "services/billing".
+
+    A prefix is a directory or a file path, relative to the root of the
+    repository. Files are selected if they are under any of the include prefixes,
+    or there are none, and not under any of the exclude prefixes.
+
+    Importers and git mining take the filter to skip other files as early as
+    possible, so that the cost of a run depends on the size of the selection.
+    """
+
+    include: Tuple[str, ...] = field(default=(), converter=normalize_prefixes)
+    exclude: Tuple[str, ...] = field(default=(), converter=normalize_prefixes)
+    # Prefixes with trailing slashes, to match them with a single startswith()
+    _include_dirs: Tuple[str, ...] = field(init=False, repr=False, eq=False)
+    _exclude_dirs: Tuple[str, ...] = field(init=False, repr=False, eq=False)
+
+    @_include_dirs.default
+    def _make_include_dirs(self) -> Tuple[str, ...]:
+        return tuple(f"{prefix}/" for prefix in self.include)
+
+    @_exclude_dirs.default
+    def _make_exclude_dirs(self) -> Tuple[str, ...]:
+        return tuple(f"{prefix}/" for prefix in self.exclude)
+
+    def matches(self, path: str) -> bool:
+        """Return True if the file is selected."""
+        path = f"{path}/"
+        if self._include_dirs and not path.startswith(self._include_dirs):
+            return False
+        return not path.startswith(self._exclude_dirs)
+
+    def get_pathspecs(self) -> List[str]:
+        """
+        Return git pathspecs that select the same files.
+
+        Pathspecs are relative to the top of the repository, and prefixes are
+        taken literally, without expanding wildcards.
+        """
+        pathspecs = [f":(top,literal){prefix}" for prefix in self.include]
+        if not pathspecs:
+            pathspecs.append(":(top)")
+        pathspecs += [f":(top,literal,exclude){prefix}" for prefix in self.exclude]
+        return pathspecs
+
+    def get_key(self) -> str:
+        """Return a short digest of the filter, to tell apart cached results."""
+        key = "\0".join(["+", *self.include, "-", *self.exclude])
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
@@ -1,59 +1,401 @@
+import contextlib
+import io
 import json
 import os
-from typing import Dict
+import pathlib
+import sqlite3
+from array import array
+from collections import defaultdict
+from typing import (
+    IO,
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+    cast,
+)
 from xml.etree import ElementTree as ET
 
-import pandas as pd
-import plotly.express as px
-from attrs import frozen
-from plotly.graph_objs import Figure
+import numpy as np
+from attrs import define, field, frozen
 
+from coverage_plot.atomic_write import atomic_write
 from coverage_plot.importance_interface import Importance
+from coverage_plot.json_scanner import JSONScanner
+from coverage_plot.path_filter import PathFilter
+from coverage_plot.profiling import Profiler, stage
+
+if TYPE_CHECKING:
+    # Pandas and plotly are slow to import, so functions that need them import
+    # them on the first call. Importers only depend on NumPy.
+    import pandas as pd
+    from plotly.graph_objs import Figure
+
+    from coverage_plot.report_cache import ReportCache
 
 # Coverage Report, where str is a filename, and "FileCoverage"
-# is the coverage result
-Report = Dict[str, "FileCoverage"]
+# is the coverage result. Importers return ColumnarReport objects, but any
+# mapping, including plain dicts, is accepted everywhere.
+Report = Mapping[str, "FileCoverage"]
+
+T = TypeVar("T")
+
+# Coverage file to read from: either a path, or a file object
+Source = Union[str, "os.PathLike[str]", IO]
+
+# Version of the importers' output. Bump it when importers start returning
+# different reports for the same input, to invalidate cached reports.
+IMPORTER_VERSION = 1
+
+# Size of coverage.json files decoded with json.load() instead of JSONScanner.
+# json.load() is about twice as fast, but takes about five times the file size
+# of memory.
+JSON_LOAD_MAX_SIZE = 16 * 2**20
+
 
+def import_json(
+    content: str,
+    cache: Optional["ReportCache"] = None,
+    path_filter: Optional[PathFilter] = None,
+) -> Report:
+    """
+    Create a Report object from JSON-encoded content.
 
-def import_json(content: str) -> Report:
-    """Create a Report object from JSON-encoded content."""
+    If the cache is given, the report is loaded from it or saved to it. If the
+    path filter is given, other files are left out.
+    """
+    if cache is not None:
+        key = cache.get_content_key(
+            content.encode("utf-8"), get_importer_name("json", path_filter)
+        )
+        return cache.get_or_import(key, lambda: import_json(content, None, path_filter))
     content_dict = json.loads(content)
-    return import_dict(content_dict)
+    return import_dict(content_dict, path_filter)
+
+
+def import_json_file(
+    source: Source,
+    cache: Optional["ReportCache"] = None,
+    path_filter: Optional[PathFilter] = None,
+) -> Report:
+    """
+    Create a Report object from a coverage.json file.
+
+    Only file summaries are decoded. Per-line arrays (executed_lines,
+    missing_lines, contexts, etc.) are skipped over without being loaded in memory,
+    and so are whole entries of files that don't match the path filter. Files up
+    to JSON_LOAD_MAX_SIZE bytes are decoded at once, which is faster. If the
+    cache is given, see import_cached().
+    """
+    if cache is not None:
+        return import_cached(cache, source, "json", import_json_file, path_filter)
+    if not hasattr(source, "read") and os.path.getsize(source) <= JSON_LOAD_MAX_SIZE:
+        with open_source(source) as fd:
+            return import_dict(json.load(fd), path_filter)
+    builder = ReportBuilder()
+    with open_source(source) as stream:
+        scanner = JSONScanner(stream)
+        for key in scanner.iter_object():
+            if key != "files":
+                scanner.skip_value()
+                continue
+            for filename in scanner.iter_object():
+                if path_filter is not None and not path_filter.matches(filename):
+                    scanner.skip_value()
+                    continue
+                for key in scanner.iter_object():
+                    if key != "summary":
+                        scanner.skip_value()
+                        continue
+                    summary = scanner.read_value()
+                    builder.add(
+                        filename, summary["covered_lines"], summary["missing_lines"]
+                    )
+    return builder.build()
 
 
-def import_dict(raw_report: Dict) -> Report:
+def import_dict(raw_report: Dict, path_filter: Optional[PathFilter] = None) -> Report:
     """Create a Report object from coverage.json."""
-    report: Report = {}
+    builder = ReportBuilder()
     for filename, raw_coverage in raw_report["files"].items():
-        coverage = FileCoverage.from_dict(raw_coverage)
-        report[filename] = coverage
-    return report
-
-
-def import_xml(content: str) -> Report:
-    report: Report = {}
-
-    def is_covered(line_tag):
-        return line_tag.attrib["hits"] != "0"
-
-    tree = ET.fromstring(content)
-    source = str(tree.findtext("sources/source"))
-    if not source:
-        source = ""
-    root = os.path.basename(source)
-    for tag in tree.iter("class"):
-        filename = os.path.join(root, tag.attrib["filename"])
-        line_tags = tag.findall("lines/line")
-        covered_lines = sum([1 for line in line_tags if is_covered(line)], 0)
-        missing_lines = sum([1 for line in line_tags if not is_covered(line)], 0)
-        coverage = FileCoverage(
-            covered_lines=covered_lines, missing_lines=missing_lines
+        if path_filter is not None and not path_filter.matches(filename):
+            continue
+        summary = raw_coverage["summary"]
+        builder.add(filename, summary["covered_lines"], summary["missing_lines"])
+    return builder.build()
+
+
+def import_xml(
+    content: str,
+    cache: Optional["ReportCache"] = None,
+    path_filter: Optional[PathFilter] = None,
+) -> Report:
+    """
+    Create a Report object from XML-encoded content.
+
+    If the cache is given, the report is loaded from it or saved to it. If the
+    path filter is given, other files are left out.
+    """
+    if cache is not None:
+        key = cache.get_content_key(
+            content.encode("utf-8"), get_importer_name("xml", path_filter)
         )
-        report[filename] = coverage
-    return report
+        return cache.get_or_import(key, lambda: import_xml(content, None, path_filter))
+    return import_xml_file(io.StringIO(content), path_filter=path_filter)
+
+
+def import_xml_file(
+    source: Source,
+    cache: Optional["ReportCache"] = None,
+    path_filter: Optional[PathFilter] = None,
+) -> Report:
+    """
+    Create a Report object from a Cobertura XML file.
+
+    The file is parsed incrementally, and every <class> element is dropped as soon
+    as its lines are counted, so the memory footprint doesn't depend on the size
+    of the file. Lines of files that don't match the path filter aren't counted.
+    If the cache is given, see import_cached().
+    """
+    if cache is not None:
+        return import_cached(cache, source, "xml", import_xml_file, path_filter)
+    builder = ReportBuilder()
+    for path, (covered_lines, missing_lines) in parse_xml_classes(
+        source, count_xml_lines, path_filter
+    ):
+        builder.add(path, covered_lines, missing_lines)
+    return builder.build()
+
 
+def parse_xml_classes(
+    source: Source,
+    read_class: Callable[[ET.Element], T],
+    path_filter: Optional[PathFilter] = None,
+) -> List[Tuple[str, T]]:
+    """
+    Read every <class> element of a Cobertura XML file with the function.
+
+    Return paths of the files, prefixed with the name of the source directory,
+    and what the function returned for them. The file is parsed incrementally,
+    and every element is dropped as soon as it's read. Files that don't match the
+    path filter aren't read.
+    """
+    root: Optional[str] = None
+    results: List[Tuple[str, T]] = []
+    parents: List[ET.Element] = []
+
+    for event, elem in ET.iterparse(source, events=("start", "end")):
+        if event == "start":
+            parents.append(elem)
+            continue
+        parents.pop()
+        if elem.tag == "source" and root is None:
+            root = os.path.basename(elem.text or "")
+        elif elem.tag == "class":
+            filename = elem.attrib["filename"]
+            # Without the root yet, the file is filtered at the end
+            if root is None or is_selected(os.path.join(root, filename), path_filter):
+                results.append((filename, read_class(elem)))
+        else:
+            continue
+        # Detach processed elements from the tree to free the memory. Processed
+        # siblings are removed right away, so the parent never has more than one
+        # child here.
+        elem.clear()
+        if parents:
+            parents[-1].remove(elem)
+
+    # Sources may come after the classes, so the root is applied at the end
+    root = root or ""
+    results = [(os.path.join(root, filename), result) for filename, result in results]
+    if path_filter is not None:
+        results = [item for item in results if path_filter.matches(item[0])]
+    return results
+
+
+def count_xml_lines(class_elem: ET.Element) -> Tuple[int, int]:
+    """Return the numbers of covered and missing lines of the <class> element."""
+    covered_lines = missing_lines = 0
+    for line in class_elem.iterfind("lines/line"):
+        if line.attrib["hits"] != "0":
+            covered_lines += 1
+        else:
+            missing_lines += 1
+    return covered_lines, missing_lines
+
+
+def is_selected(path: str, path_filter: Optional[PathFilter]) -> bool:
+    return path_filter is None or path_filter.matches(path)
+
+
+def import_cached(
+    cache: "ReportCache",
+    source: Source,
+    importer_name: str,
+    importer: Callable[..., Report],
+    path_filter: Optional[PathFilter] = None,
+) -> Report:
+    """
+    Load the report of the file from the cache, or import it and save it there.
 
-def export_df(report: Report, importance: Importance) -> pd.DataFrame:
+    File objects can't be hashed without consuming them, so they are always
+    imported without the cache. Reports of the same file with different path
+    filters are cached separately.
+    """
+    if hasattr(source, "read"):
+        return importer(source, path_filter=path_filter)
+    key = cache.get_file_key(
+        os.fspath(cast(str, source)), get_importer_name(importer_name, path_filter)
+    )
+    return cache.get_or_import(key, lambda: importer(source, path_filter=path_filter))
+
+
+def get_importer_name(importer_name: str, path_filter: Optional[PathFilter]) -> str:
+    """Return the importer name for cache keys, telling path filters apart."""
+    if path_filter is None:
+        return importer_name
+    return f"{importer_name}-{path_filter.get_key()}"
+
+
+@contextlib.contextmanager
+def open_source(source: Source) -> Iterator[IO]:
+    """Open the source for binary reading, unless it's a file object already."""
+    if hasattr(source, "read"):
+        yield cast(IO, source)
+    else:
+        with open(cast(str, source), "rb") as fd:
+            yield fd
+
+
+def import_sqlite(
+    filename: str,
+    statements: Optional[Mapping[str, int]] = None,
+    root: Optional[str] = None,
+    path_filter: Optional[PathFilter] = None,
+) -> Report:
+    """
+    Create a Report object from the .coverage data file of coverage.py.
+
+    The data file records executed lines only. The number of missing lines is
+    computed from `statements`, a mapping from file names to the number of
+    statements in them (see load_statement_counts()). Without it, files have no
+    missing lines, and so do files missing from it.
+
+    File names are relative to `root`, which defaults to the directory of the
+    data file. Executed lines of files that don't match the path filter aren't
+    read.
+    """
+    if root is None:
+        root = os.path.dirname(os.path.abspath(filename))
+    uri = pathlib.Path(filename).absolute().as_uri() + "?mode=ro"
+    with contextlib.closing(sqlite3.connect(uri, uri=True)) as connection:
+        connection.create_aggregate(
+            "numbits_union_count", 1, NumbitsUnionCount  # type: ignore
+        )
+        connection.create_function(
+            "is_selected",
+            1,
+            lambda path: is_selected(os.path.relpath(path, root), path_filter),
+            deterministic=True,
+        )
+        has_arcs = connection.execute(
+            "SELECT value FROM meta WHERE key = 'has_arcs'"
+        ).fetchone()
+        if has_arcs and has_arcs[0] in ("1", "True"):
+            query = SQLITE_ARC_LINES_QUERY
+        else:
+            query = SQLITE_LINE_BITS_QUERY
+        executed = {
+            os.path.relpath(path, root): executed_lines
+            for path, executed_lines in connection.execute(query)
+        }
+
+    builder = ReportBuilder()
+    if statements is None:
+        for path, executed_lines in executed.items():
+            builder.add(path, executed_lines, 0)
+        return builder.build()
+    for path in sorted(executed.keys() | statements.keys()):
+        if not is_selected(path, path_filter):
+            continue
+        executed_lines = executed.get(path, 0)
+        num_statements = statements.get(path, executed_lines)
+        covered_lines = min(executed_lines, num_statements)
+        builder.add(path, covered_lines, num_statements - covered_lines)
+    return builder.build()
+
+
+# Both queries read lines of the files selected by the path filter only
+SQLITE_LINE_BITS_QUERY = """
+    WITH selected_file AS (SELECT id, path FROM file WHERE is_selected(path))
+    SELECT selected_file.path, numbits_union_count(line_bits.numbits)
+    FROM selected_file
+    LEFT JOIN line_bits ON line_bits.file_id = selected_file.id
+    GROUP BY selected_file.id
+"""
+
+SQLITE_ARC_LINES_QUERY = """
+    WITH selected_file AS (SELECT id, path FROM file WHERE is_selected(path))
+    SELECT selected_file.path, COUNT(DISTINCT lines.lineno)
+    FROM selected_file LEFT JOIN (
+        SELECT file_id, fromno AS lineno FROM arc
+        WHERE fromno > 0 AND file_id IN (SELECT id FROM selected_file)
+        UNION
+        SELECT file_id, tono AS lineno FROM arc
+        WHERE tono > 0 AND file_id IN (SELECT id FROM selected_file)
+    ) AS lines ON lines.file_id = selected_file.id
+    GROUP BY selected_file.id
+"""
+
+
+class NumbitsUnionCount:
+    """
+    SQLite aggregate to count lines in the union of coverage.py numbits.
+
+    Numbits are bitmaps where bit N is set if line N is executed. Blobs are
+    combined as big integers, without expanding them to lists of line numbers.
+    """
+
+    def __init__(self):
+        self.union = 0
+
+    def step(self, numbits: Optional[bytes]):
+        if numbits:
+            self.union |= int.from_bytes(numbits, "little")
+
+    def finalize(self) -> int:
+        return bin(self.union).count("1")
+
+
+def is_sqlite_file(filename: str) -> bool:
+    """Return True if the file is an SQLite database, like the .coverage file."""
+    with open(filename, "rb") as fd:
+        return fd.read(16) == b"SQLite format 3\x00"
+
+
+def load_statement_counts(filename: str) -> Dict[str, int]:
+    """
+    Load the statement counts for import_sqlite().
+
+    The file is a JSON object mapping file names to the number of statements in
+    them, e.g. {"app/models.py": 120}.
+    """
+    with open(filename, "rt") as fd:
+        return {path: int(count) for path, count in json.load(fd).items()}
+
+
+def export_df(
+    report: Report, importance: Importance, profiler: Optional[Profiler] = None
+) -> "pd.DataFrame":
     """
     Covert Report and Importance objects to a pandas DataFrame.
 
@@ -63,39 +405,122 @@ def export_df(report: Report, importance: Importance) -> pd.DataFrame:
     - name (the file name)
     - total_lines (total lines in the source file, as counted by coverage)
     - percent_covered (the percentage of the line)
+
+    If the profiler is given, scoring and building the DataFrame are recorded as
+    stages.
     """
-    records = []
-    for filename, coverage in report.items():
-        if filename == "":
-            continue
-        imp = importance.get_importance(filename)
-        if imp == 0:
-            continue
-        record = {
-            "path": filename,
-            "name": os.path.basename(filename),
-            "percent_covered": coverage.percent_covered(),
-            "importance": imp,
-        }
-        records.append(record)
+    import pandas as pd
 
-    def _sorter(record_: Dict) -> str:
-        return record_["path"]
+    with stage(profiler, "score_report") as stats:
+        scored_report, importances = score_report(report, importance)
+        stats.items = len(scored_report)
+    with stage(profiler, "export_df") as stats:
+        paths = scored_report.paths
+        df = pd.DataFrame(
+            {
+                "path": paths,
+                "name": [os.path.basename(filename) for filename in paths],
+                "percent_covered": scored_report.percent_covered(),
+                "importance": importances,
+            }
+        )
+        stats.items = len(df)
+    return df
 
-    records = sorted(records, key=_sorter)
-    return pd.DataFrame(records)
 
+def score_report(
+    report: Report, importance: Importance
+) -> Tuple["ColumnarReport", np.ndarray]:
+    """
+    Score files of the report by importance.
 
-def make_path_components(report_df: pd.DataFrame) -> pd.DataFrame:
+    Return the report with files of non-zero importance only, sorted by path, and
+    the array of their importance scores.
+    """
+    columnar = ColumnarReport.from_mapping(report)
+    paths = columnar.paths
+    importances = np.zeros(len(paths), dtype=np.int64)
+    if (paths != "").all():
+        importances[:] = importance.get_importances(paths)
+    else:
+        named = np.flatnonzero(paths != "")
+        importances[named] = importance.get_importances(paths[named])
+
+    selected = np.flatnonzero(importances != 0)
+    selected = selected[np.argsort(paths[selected], kind="stable")]
+    return columnar.take(selected), importances[selected]
+
+
+def make_path_components(
+    report_df: "pd.DataFrame",
+    max_depth: Optional[int] = None,
+    collapse_chains: bool = False,
+) -> "pd.DataFrame":
     """
     Generate a dataframe with path components.
+
+    Components go to the columns p0..pN. Shorter paths are padded with missing
+    values. See split_paths() for the meaning of max_depth and collapse_chains.
+    """
+    import pandas as pd
+
+    components = split_paths(report_df["path"], max_depth, collapse_chains)
+    df = pd.DataFrame(components, index=report_df.index)
+    df.columns = [f"p{i}" for i in range(df.shape[1])]
+    return df
+
+
+def split_paths(
+    paths: Iterable[str],
+    max_depth: Optional[int] = None,
+    collapse_chains: bool = False,
+) -> List[List[str]]:
     """
+    Split paths to lists of their components.
+
+    If max_depth is set, the components beyond it are kept joined in the last
+    one. If collapse_chains is set, a directory that has a single subdirectory and
+    no files is merged with it. For example, if all the files are in "src/app",
+    it becomes one component.
+    """
+    components = [path.split("/") for path in paths]
+    if collapse_chains:
+        components = collapse_single_child_chains(components)
+    if max_depth is not None:
+        if max_depth < 1:
+            raise ValueError(f"max_depth must be positive, got {max_depth}")
+        last = max_depth - 1
+        components = [
+            (
+                chunks
+                if len(chunks) <= max_depth
+                else chunks[:last] + ["/".join(chunks[last:])]
+            )
+            for chunks in components
+        ]
+    return components
+
+
+def collapse_single_child_chains(components: List[List[str]]) -> List[List[str]]:
+    children: Dict[Tuple[str, ...], Set[str]] = defaultdict(set)
+    for chunks in components:
+        for i in range(len(chunks)):
+            children[tuple(chunks[:i])].add(chunks[i])
 
-    def splitter(path):
-        chunks = {f"p{i}": component for i, component in enumerate(path.split("/"))}
-        return pd.Series(chunks)
+    def is_chain(prefix: Tuple[str, ...], child: str) -> bool:
+        # A directory with the only child, which is a directory too
+        return len(children[prefix]) == 1 and prefix + (child,) in children
 
-    return report_df["path"].apply(splitter)
+    collapsed = []
+    for chunks in components:
+        merged = chunks[:1]
+        for i in range(1, len(chunks)):
+            if is_chain(tuple(chunks[:i]), chunks[i]):
+                merged[-1] += "/" + chunks[i]
+            else:
+                merged.append(chunks[i])
+        collapsed.append(merged)
+    return collapsed
 
 
 @frozen
@@ -108,7 +533,10 @@ class FileCoverage:
 
     @classmethod
     def from_dict(cls, raw_coverage: Dict):
-        summary = raw_coverage["summary"]
+        return cls.from_summary(raw_coverage["summary"])
+
+    @classmethod
+    def from_summary(cls, summary: Dict):
         return FileCoverage(summary["covered_lines"], summary["missing_lines"])
 
     def percent_covered(self) -> float:
@@ -119,33 +547,549 @@ class FileCoverage:
         return 100.0 * self.covered_lines / covered_and_missing
 
 
-def plot_sunburst(report: Report, importance: Importance) -> Figure:
-    """Return a sunburst Figure object from a report."""
-    df = export_df(report, importance)
-    path_components = make_path_components(df)
-    summary = pd.concat([df, path_components], axis=1)
-    return px.sunburst(
-        summary,
-        names="name",
-        path=path_components.columns,
-        values="importance",
-        color="percent_covered",
-        color_continuous_scale="RdYlGn",
-        range_color=[0, 100],
+@define(eq=False)
+class ColumnarReport(Mapping[str, FileCoverage]):
+    """
+    Coverage report stored as arrays, one element per file.
+
+    The report behaves as a read-only mapping from file names to FileCoverage
+    objects, but doesn't create them unless asked to.
+    """
+
+    paths: np.ndarray
+    covered_lines: np.ndarray
+    missing_lines: np.ndarray
+    _index: Optional[Dict[str, int]] = field(default=None, init=False, repr=False)
+
+    @classmethod
+    def from_mapping(cls, report: Report) -> "ColumnarReport":
+        if isinstance(report, ColumnarReport):
+            return report
+        # Other array-backed reports, such as LineReport, convert themselves
+        to_columnar = getattr(report, "to_columnar", None)
+        if to_columnar is not None:
+            return to_columnar()
+        builder = ReportBuilder()
+        for filename, coverage in report.items():
+            builder.add(filename, coverage.covered_lines, coverage.missing_lines)
+        return builder.build()
+
+    def __getitem__(self, filename: str) -> FileCoverage:
+        i = self.get_index()[filename]
+        return FileCoverage(int(self.covered_lines[i]), int(self.missing_lines[i]))
+
+    def get_index(self) -> Dict[str, int]:
+        """Return the dict from file names to their positions in the arrays."""
+        if self._index is None:
+            self._index = {path: i for i, path in enumerate(self.paths)}
+        return self._index
+
+    def get_indices(self, filenames: Iterable[str]) -> np.ndarray:
+        """
+        Return positions of files in the arrays.
+
+        Raise KeyError if any of the files is not in the report.
+        """
+        index = self.get_index()
+        return np.fromiter((index[filename] for filename in filenames), dtype=np.intp)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.paths)
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def take(self, indices: np.ndarray) -> "ColumnarReport":
+        """Return the report with files at the given positions only."""
+        return ColumnarReport(
+            paths=self.paths[indices],
+            covered_lines=self.covered_lines[indices],
+            missing_lines=self.missing_lines[indices],
+        )
+
+    def total_lines(self) -> np.ndarray:
+        return self.covered_lines + self.missing_lines
+
+    def percent_covered(self) -> np.ndarray:
+        """Return the percentage of the covered code for every file."""
+        total_lines = self.total_lines()
+        percent = np.zeros(len(self.paths), dtype=np.float64)
+        np.divide(
+            100.0 * self.covered_lines, total_lines, out=percent, where=total_lines != 0
+        )
+        return percent
+
+    def to_df(self) -> "pd.DataFrame":
+        """
+        Convert the report to a pandas DataFrame.
+
+        The DataFrame has the path, covered_lines, missing_lines, and
+        percent_covered columns.
+        """
+        import pandas as pd
+
+        return pd.DataFrame(
+            {
+                "path": self.paths,
+                "covered_lines": self.covered_lines,
+                "missing_lines": self.missing_lines,
+                "percent_covered": self.percent_covered(),
+            },
+            copy=False,
+        )
+
+
+@define
+class ReportBuilder:
+    """
+    Helper for importers to fill a ColumnarReport file by file.
+
+    If the same file is added more than once, the last record wins.
+    """
+
+    paths: List[str] = field(factory=list)
+    covered_lines: array = field(factory=lambda: array("q"))
+    missing_lines: array = field(factory=lambda: array("q"))
+
+    def add(self, filename: str, covered_lines: int, missing_lines: int):
+        self.paths.append(filename)
+        self.covered_lines.append(covered_lines)
+        self.missing_lines.append(missing_lines)
+
+    def build(self) -> ColumnarReport:
+        paths = np.array(self.paths, dtype=object)
+        covered_lines = np.array(self.covered_lines, dtype=np.int64)
+        missing_lines = np.array(self.missing_lines, dtype=np.int64)
+        index = {path: i for i, path in enumerate(self.paths)}
+        if len(index) == len(paths):
+            report = ColumnarReport(paths, covered_lines, missing_lines)
+            report._index = index
+            return report
+        selected = np.sort(np.fromiter(index.values(), dtype=np.intp))
+        return ColumnarReport(
+            paths[selected], covered_lines[selected], missing_lines[selected]
+        )
+
+
+@define
+class CoverageTree:
+    """
+    Hierarchy of directories and files, ready to be plotted.
+
+    Nodes are stored in parallel arrays, in the order of a depth-first traversal.
+    Every directory node sums up the values and lines of its descendants.
+    """
+
+    ids: List[str]
+    labels: List[str]
+    parents: List[str]
+    values: np.ndarray
+    covered_lines: np.ndarray
+    missing_lines: np.ndarray
+
+    def percent_covered(self) -> np.ndarray:
+        """
+        Return the percentage of the covered code for every node.
+
+        Directory coverage is weighted by the number of lines in their files.
+        """
+        return ColumnarReport(
+            np.array(self.ids, dtype=object), self.covered_lines, self.missing_lines
+        ).percent_covered()
+
+
+def build_tree(
+    report: Report,
+    importance: Importance,
+    max_depth: Optional[int] = None,
+    collapse_chains: bool = False,
+    max_nodes: Optional[int] = None,
+    profiler: Optional[Profiler] = None,
+) -> CoverageTree:
+    """
+    Build the tree of directories and files of the report.
+
+    Node values are importance scores. See split_paths() for the meaning of
+    max_depth and collapse_chains, and fold_tree() for the meaning of max_nodes.
+    If the profiler is given, every step is recorded as a stage.
+    """
+    with stage(profiler, "score_report") as stats:
+        scored_report, importances = score_report(report, importance)
+        stats.items = len(scored_report)
+    with stage(profiler, "split_paths") as stats:
+        components = split_paths(scored_report.paths, max_depth, collapse_chains)
+        stats.items = len(components)
+    with stage(profiler, "build_tree") as stats:
+        tree = assemble_tree(scored_report, importances, components)
+        stats.items = len(tree.ids)
+    if max_nodes is not None:
+        with stage(profiler, "fold_tree") as stats:
+            tree = fold_tree(tree, max_nodes)
+            stats.items = len(tree.ids)
+    return tree
+
+
+def assemble_tree(
+    scored_report: "ColumnarReport",
+    importances: np.ndarray,
+    components: List[List[str]],
+) -> CoverageTree:
+    """Build the tree from files and their path components."""
+    layout = TreeLayout.from_components(components)
+    return CoverageTree(
+        ids=layout.ids,
+        labels=layout.labels,
+        parents=layout.parents,
+        values=layout.aggregate(importances),
+        covered_lines=layout.aggregate(scored_report.covered_lines),
+        missing_lines=layout.aggregate(scored_report.missing_lines),
+    )
+
+
+@define
+class TreeLayout:
+    """
+    Nodes of the tree, and the files that every node includes.
+
+    The pairs of file_positions and node_positions elements map files to all the
+    nodes on their paths, from the top-level directory to the file itself.
+    """
+
+    ids: List[str]
+    labels: List[str]
+    parents: List[str]
+    file_positions: np.ndarray
+    node_positions: np.ndarray
+
+    @classmethod
+    def from_components(cls, components: List[List[str]]) -> "TreeLayout":
+        """Build the layout in a single pass over path components of files."""
+        node_index: Dict[str, int] = {}
+        ids: List[str] = []
+        labels: List[str] = []
+        parents: List[str] = []
+        file_positions = array("q")
+        node_positions = array("q")
+        for file_position, chunks in enumerate(components):
+            parent_id = ""
+            for chunk in chunks:
+                node_id = f"{parent_id}/{chunk}" if parent_id else chunk
+                i = node_index.get(node_id)
+                if i is None:
+                    i = node_index[node_id] = len(ids)
+                    ids.append(node_id)
+                    labels.append(chunk)
+                    parents.append(parent_id)
+                file_positions.append(file_position)
+                node_positions.append(i)
+                parent_id = node_id
+        return cls(
+            ids=ids,
+            labels=labels,
+            parents=parents,
+            file_positions=np.array(file_positions, dtype=np.intp),
+            node_positions=np.array(node_positions, dtype=np.intp),
+        )
+
+    def aggregate(self, column: np.ndarray) -> np.ndarray:
+        """Return the sums of the per-file column for every node."""
+        totals = np.zeros(len(self.ids), dtype=np.int64)
+        np.add.at(totals, self.node_positions, column[self.file_positions])
+        return totals
+
+
+def fold_tree(tree: CoverageTree, max_nodes: int) -> CoverageTree:
+    """
+    Fold the least important nodes to fit the tree in the node budget.
+
+    Nodes are folded in the order of their values, from the smallest one, until
+    the tree fits in the budget. Then the most important folded nodes that fit in
+    the rest of the budget are unfolded again. Folded files and directories are
+    replaced with a "(N other files)" node in their parent directory, which keeps
+    their total value and lines. Ties are broken by depth (deeper nodes first)
+    and id, so the result is deterministic.
+    """
+    if max_nodes < 1:
+        raise ValueError(f"max_nodes must be positive, got {max_nodes}")
+    num_nodes = len(tree.ids)
+    if num_nodes <= max_nodes:
+        return tree
+
+    # Nodes go in the depth-first order, so parents come before their children
+    index = {node_id: i for i, node_id in enumerate(tree.ids)}
+    parent_of = [index.get(parent_id, ROOT) for parent_id in tree.parents]
+    num_files = count_files(parent_of)
+    folded = choose_folded_nodes(tree, parent_of, max_nodes)
+
+    hidden = [False] * len(tree.ids)
+    for members in folded.values():
+        for i in members:
+            hidden[i] = True
+    visible = []
+    for i, parent in enumerate(parent_of):
+        hidden[i] = hidden[i] or (parent != ROOT and hidden[parent])
+        if not hidden[i]:
+            visible.append(i)
+
+    ids = [tree.ids[i] for i in visible]
+    labels = [tree.labels[i] for i in visible]
+    parents = [tree.parents[i] for i in visible]
+    aggregates = [
+        (parent, members)
+        for parent, members in folded.items()
+        if parent == ROOT or not hidden[parent]
+    ]
+    for parent, members in aggregates:
+        label = f"({sum(num_files[i] for i in members)} other files)"
+        parent_id = "" if parent == ROOT else tree.ids[parent]
+        ids.append(f"{parent_id}/{label}" if parent_id else label)
+        labels.append(label)
+        parents.append(parent_id)
+
+    def combine(column: np.ndarray) -> np.ndarray:
+        sums = [column[members].sum() for _, members in aggregates]
+        return np.concatenate([column[visible], np.array(sums, dtype=np.int64)])
+
+    return CoverageTree(
+        ids=ids,
+        labels=labels,
+        parents=parents,
+        values=combine(tree.values),
+        covered_lines=combine(tree.covered_lines),
+        missing_lines=combine(tree.missing_lines),
     )
 
 
-def plot_treemap(report: Report, importance: Importance):
-    """Return a treemap Figure object from a report."""
-    df = export_df(report, importance)
-    path_components = make_path_components(df)
-    summary = pd.concat([df, path_components], axis=1)
-    return px.treemap(
-        summary,
-        names="name",
-        path=path_components.columns,
-        values="importance",
-        color="percent_covered",
-        color_continuous_scale="RdYlGn",
-        range_color=[0, 100],
+def choose_folded_nodes(
+    tree: CoverageTree, parent_of: List[int], max_nodes: int
+) -> Dict[int, List[int]]:
+    """
+    Return the nodes to fold for fold_tree(), grouped by their parent index.
+    """
+    num_nodes = len(parent_of)
+    depth = [0] * num_nodes
+    for i, parent in enumerate(parent_of):
+        if parent != ROOT:
+            depth[i] = depth[parent] + 1
+    # Number of nodes in the subtree that remain visible after folding
+    visible_size = [1] * num_nodes
+    for i in reversed(range(num_nodes)):
+        if parent_of[i] != ROOT:
+            visible_size[parent_of[i]] += visible_size[i]
+    is_leaf = [size == 1 for size in visible_size]
+
+    # Descendants never have larger values, so they are folded before ancestors
+    values = tree.values.tolist()
+    order = sorted(range(num_nodes), key=lambda i: (values[i], -depth[i], tree.ids[i]))
+    folded: Dict[int, List[int]] = defaultdict(list)
+    fold_order = []
+    for i in order:
+        if num_nodes <= max_nodes:
+            break
+        parent = parent_of[i]
+        new_aggregate = not folded[parent]
+        folded[parent].append(i)
+        fold_order.append(i)
+        delta = int(new_aggregate) - visible_size[i]
+        num_nodes += delta
+        add_visible_size(visible_size, parent_of, parent, delta)
+
+    unfold_nodes(folded, fold_order, parent_of, visible_size, num_nodes, max_nodes)
+
+    # Replacing a single file with an aggregate node doesn't save anything
+    return {
+        parent: members
+        for parent, members in folded.items()
+        if len(members) > 1 or (members and not is_leaf[members[0]])
+    }
+
+
+def unfold_nodes(
+    folded: Dict[int, List[int]],
+    fold_order: List[int],
+    parent_of: List[int],
+    visible_size: List[int],
+    num_nodes: int,
+    max_nodes: int,
+) -> None:
+    """
+    Unfold the most important of the folded nodes that fit in the budget again.
+
+    Folding a directory may free more nodes than needed, and the nodes folded
+    before it may fit again.
+    """
+    is_folded = [False] * len(parent_of)
+    for i in fold_order:
+        is_folded[i] = True
+    for i in reversed(fold_order):
+        parent = parent_of[i]
+        if is_folded_ancestor(is_folded, parent_of, parent):
+            continue
+        delta = visible_size[i] - int(len(folded[parent]) == 1)
+        if num_nodes + delta > max_nodes:
+            continue
+        folded[parent].remove(i)
+        is_folded[i] = False
+        num_nodes += delta
+        add_visible_size(visible_size, parent_of, parent, delta)
+
+
+def add_visible_size(
+    visible_size: List[int], parent_of: List[int], parent: int, delta: int
+) -> None:
+    """Add the delta to the visible sizes of the parent and its ancestors."""
+    while parent != ROOT:
+        visible_size[parent] += delta
+        parent = parent_of[parent]
+
+
+def is_folded_ancestor(is_folded: List[bool], parent_of: List[int], node: int) -> bool:
+    """Return True if the node or any of its ancestors is folded."""
+    while node != ROOT:
+        if is_folded[node]:
+            return True
+        node = parent_of[node]
+    return False
+
+
+def count_files(parent_of: List[int]) -> List[int]:
+    """Return the number of files in the subtree of every node."""
+    num_files = [0] * len(parent_of)
+    for i in reversed(range(len(parent_of))):
+        num_files[i] = num_files[i] or 1
+        if parent_of[i] != ROOT:
+            num_files[parent_of[i]] += num_files[i]
+    return num_files
+
+
+# Parent index of top-level nodes in fold_tree()
+ROOT = -1
+
+
+def plot_sunburst(
+    report: Report,
+    importance: Importance,
+    max_depth: Optional[int] = None,
+    collapse_chains: bool = False,
+    max_nodes: Optional[int] = None,
+    profiler: Optional[Profiler] = None,
+) -> "Figure":
+    """
+    Return a sunburst Figure object from a report.
+
+    See build_tree() for the meaning of the optional parameters.
+    """
+    import plotly.graph_objects as go
+
+    tree = build_tree(
+        report, importance, max_depth, collapse_chains, max_nodes, profiler
     )
+    with stage(profiler, "make_figure") as stats:
+        figure = make_figure(go.Sunburst, tree)
+        stats.items = len(tree.ids)
+    return figure
+
+
+def plot_treemap(
+    report: Report,
+    importance: Importance,
+    max_depth: Optional[int] = None,
+    collapse_chains: bool = False,
+    max_nodes: Optional[int] = None,
+    profiler: Optional[Profiler] = None,
+) -> "Figure":
+    """
+    Return a treemap Figure object from a report.
+
+    See build_tree() for the meaning of the optional parameters.
+    """
+    import plotly.graph_objects as go
+
+    tree = build_tree(
+        report, importance, max_depth, collapse_chains, max_nodes, profiler
+    )
+    with stage(profiler, "make_figure") as stats:
+        figure = make_figure(go.Treemap, tree)
+        stats.items = len(tree.ids)
+    return figure
+
+
+def make_figure(trace_type: Type, tree: CoverageTree) -> "Figure":
+    """
+    Return a Figure with the trace of a given type built from the tree.
+
+    The figure looks like the one of plotly.express, with nodes colored by the
+    percentage of covered code.
+    """
+    import plotly.graph_objects as go
+
+    trace = trace_type(
+        ids=tree.ids,
+        labels=tree.labels,
+        parents=tree.parents,
+        values=tree.values,
+        branchvalues="total",
+        # Hover labels show one decimal place, and shorter numbers serialize to
+        # a smaller page
+        marker={"colors": tree.percent_covered().round(1), "coloraxis": "coloraxis"},
+        hovertemplate=(
+            "id=%{id}<br>importance=%{value}<br>"
+            "percent_covered=%{color:.1f}<extra></extra>"
+        ),
+    )
+    figure = go.Figure(trace)
+    figure.update_layout(
+        coloraxis={
+            "colorscale": "RdYlGn",
+            "cmin": 0,
+            "cmax": 100,
+            "colorbar": {"title": {"text": "percent_covered"}},
+        },
+        legend={"tracegroupgap": 0},
+        margin={"t": 60},
+    )
+    return figure
+
+
+def save_html(figure: "Figure", filename: str, plotlyjs: str = "inline") -> None:
+    """
+    Save the figure in the HTML file.
+
+    The plotlyjs argument defines how the page loads plotly.js:
+
+    - "inline" embeds the bundle in the page (default).
+    - "shared" writes the bundle to a file next to the page, once per directory,
+      and references it. Many pages in one directory share it, and work offline.
+    - "cdn" loads the bundle from the CDN.
+    """
+    include_plotlyjs: Union[bool, str]
+    if plotlyjs == "inline":
+        include_plotlyjs = True
+    elif plotlyjs == "cdn":
+        include_plotlyjs = "cdn"
+    elif plotlyjs == "shared":
+        dirname = os.path.dirname(os.path.abspath(filename))
+        include_plotlyjs = write_plotlyjs(dirname)
+    else:
+        raise ValueError(f"Unknown plotly.js mode: {plotlyjs!r}")
+    figure.write_html(filename, include_plotlyjs=include_plotlyjs)
+
+
+def write_plotlyjs(dirname: str) -> str:
+    """
+    Write the plotly.js bundle to the directory unless it's already there.
+
+    Return the name of the bundle file, relative to the directory. The name
+    includes the plotly.js version, so pages saved by different plotly versions
+    don't overwrite each other's bundle.
+    """
+    import plotly.offline
+
+    basename = f"plotly-{plotly.offline.get_plotlyjs_version()}.min.js"
+    filename = os.path.join(dirname, basename)
+    if os.path.exists(filename):
+        return basename
+    # Pages saved concurrently never see a half-written bundle
+    with atomic_write(filename, encoding="utf-8") as fd:
+        fd.write(plotly.offline.get_plotlyjs())
+    return basename
@@ -0,0 +1,94 @@
+import contextlib
+import json
+import sys
+import time
+from typing import IO, Any, ContextManager, Dict, Iterator, List, Optional
+
+from attrs import asdict, define, field
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    # Not available on Windows, peak memory is not measured there
+    resource = None  # type: ignore
+
+
+@define
+class StageStats:
+    """
+    Resources used by a pipeline stage.
+
+    Memory is the growth of the peak resident set size of the process during the
+    stage, in bytes. It's zero for stages that fit in the memory that the process
+    has already used, and None where it can't be measured.
+    """
+
+    name: str
+    wall_time: float = 0.0
+    cpu_time: float = 0.0
+    peak_memory_delta: Optional[int] = None
+    items: Optional[int] = None
+
+
+@define
+class Profiler:
+    """
+    Collector of per-stage statistics.
+
+    Pass the profiler to the plot functions, or wrap your own code with stage():
+
+        profiler = Profiler()
+        with profiler.stage("import") as stats:
+            report = import_json_file("coverage.json")
+            stats.items = len(report)
+        plot_treemap(report, importance, profiler=profiler)
+        profiler.dump(sys.stderr)
+    """
+
+    stages: List[StageStats] = field(factory=list)
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[StageStats]:
+        """
+        Measure the code in the with block as a stage.
+
+        The block can set the `items` attribute of the yielded object to the
+        number of processed items. Stages may be nested.
+        """
+        stats = StageStats(name)
+        start_memory = get_peak_memory()
+        start_cpu_time = time.process_time()
+        start_wall_time = time.perf_counter()
+        try:
+            yield stats
+        finally:
+            stats.wall_time = time.perf_counter() - start_wall_time
+            stats.cpu_time = time.process_time() - start_cpu_time
+            end_memory = get_peak_memory()
+            if start_memory is not None and end_memory is not None:
+                stats.peak_memory_delta = end_memory - start_memory
+            self.stages.append(stats)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"stages": [asdict(stats) for stats in self.stages]}
+
+    def dump(self, fd: IO[str]) -> None:
+        """Write statistics to the file as JSON."""
+        json.dump(self.to_dict(), fd, indent=2)
+        fd.write("\n")
+
+
+def stage(profiler: Optional[Profiler], name: str) -> ContextManager[StageStats]:
+    """Return profiler.stage(name), or a no-op context if the profiler is None."""
+    if profiler is None:
+        return contextlib.nullcontext(StageStats(name))
+    return profiler.stage(name)
+
+
+def get_peak_memory() -> Optional[int]:
+    """Return the peak resident set size of the process, in bytes."""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from attrs import define, field
+
+from coverage_plot.atomic_write import atomic_write
+from coverage_plot.plot import IMPORTER_VERSION, ColumnarReport, Report
+
+# Default limit of the total size of cached reports
+DEFAULT_MAX_BYTES = 1024**3
+
+# Number of files whose content hashes are remembered in the stat index
+MAX_INDEX_ENTRIES = 1000
+
+# Files changed that recently may change again without changing their times, so
+# their hashes are not remembered
+RACY_NANOSECONDS = 2 * 10**9
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+@define
+class ReportCache:
+    """
+    On-disk cache of imported reports.
+
+    Reports are keyed by the hash of the coverage file content, the importer, and
+    the importer version. They are stored as NumPy arrays, and loading them takes
+    a fraction of the time of parsing the file. When the total size of the cache
+    exceeds max_bytes, the least recently used reports are removed.
+
+    To avoid hashing large files on every run, the cache remembers their hashes
+    along with their size and change times, the same way as the git index.
+    """
+
+    cache_dir: str
+    max_bytes: int = DEFAULT_MAX_BYTES
+    _stat_index: Optional[Dict[str, List]] = field(default=None, init=False)
+
+    def get_or_import(self, key: str, importer: Callable[[], Report]) -> Report:
+        """Load the report by key, or import and save it if it's not cached."""
+        report = self.load(key)
+        if report is None:
+            report = ColumnarReport.from_mapping(importer())
+            self.save(key, report)
+        return report
+
+    def get_file_key(self, filename: str, importer_name: str) -> str:
+        """Return the cache key of the report imported from the file."""
+        filename = os.path.realpath(filename)
+        stat = os.stat(filename)
+        signature = [stat.st_size, stat.st_mtime_ns, stat.st_ctime_ns, stat.st_ino]
+        index = self.get_stat_index()
+        entry = index.get(filename)
+        if entry is not None and entry[:-1] == signature:
+            digest = entry[-1]
+        else:
+            digest = hash_file(filename)
+            changed_at = max(stat.st_mtime_ns, stat.st_ctime_ns)
+            if time.time_ns() - changed_at > RACY_NANOSECONDS:
+                index.pop(filename, None)
+                index[filename] = signature + [digest]
+                self.save_stat_index()
+        return make_key(importer_name, digest)
+
+    def get_content_key(self, content: bytes, importer_name: str) -> str:
+        """Return the cache key of the report imported from the content."""
+        return make_key(importer_name, hashlib.sha256(content).hexdigest())
+
+    def load(self, key: str) -> Optional[ColumnarReport]:
+        """Return the cached report, or None if it's not in the cache."""
+        filename = self.get_filename(key)
+        try:
+            with np.load(filename, allow_pickle=False) as data:
+                raw_paths = data["paths"].tobytes().decode("utf-8")
+                covered_lines = data["covered_lines"]
+                missing_lines = data["missing_lines"]
+        except (OSError, ValueError, KeyError):
+            return None
+        # Mark the report as recently used. The file may have been evicted by
+        # another process since, or the cache may be read-only.
+        try:
+            os.utime(filename)
+        except OSError:
+            pass
+        paths = raw_paths.split("\0") if len(covered_lines) else []
+        return ColumnarReport(
+            np.array(paths, dtype=object),
+            covered_lines.astype(np.int64),
+            missing_lines.astype(np.int64),
+        )
+
+    def save(self, key: str, report: ColumnarReport) -> None:
+        # Paths can't contain NUL characters, so they are stored as one string
+        raw_paths = "\0".join(report.paths).encode("utf-8")
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with atomic_write(self.get_filename(key), "wb") as fd:
+            np.savez(
+                fd,
+                paths=np.frombuffer(raw_paths, dtype=np.uint8),
+                covered_lines=report.covered_lines,
+                missing_lines=report.missing_lines,
+            )
+        self.evict()
+
+    def evict(self) -> None:
+        """Remove the least recently used reports to fit in max_bytes."""
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.startswith("report-") and entry.name.endswith(".npz"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+
+    def get_filename(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"report-{key}.npz")
+
+    def get_stat_index(self) -> Dict[str, List]:
+        if self._stat_index is None:
+            try:
+                with open(self.get_stat_index_filename(), "rt") as fd:
+                    self._stat_index = json.load(fd)
+            except (OSError, ValueError):
+                self._stat_index = {}
+        return self._stat_index  # type: ignore
+
+    def save_stat_index(self) -> None:
+        index = self.get_stat_index()
+        while len(index) > MAX_INDEX_ENTRIES:
+            del index[next(iter(index))]
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with atomic_write(self.get_stat_index_filename()) as fd:
+            json.dump(index, fd)
+
+    def get_stat_index_filename(self) -> str:
+        return os.path.join(self.cache_dir, "stat-index.json")
+
+
+def make_key(importer_name: str, digest: str) -> str:
+    return f"{importer_name}-v{IMPORTER_VERSION}-{digest}"
+
+
+def hash_file(filename: str) -> str:
+    digest = hashlib.sha256()
+    with open(filename, "rb") as fd:
+        for chunk in iter(lambda: fd.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
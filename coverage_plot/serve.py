@@ -0,0 +1,215 @@
+import functools
+import hashlib
+import os
+import sys
+import threading
+import time
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TYPE_CHECKING, Callable, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from attrs import define, field
+
+if TYPE_CHECKING:
+    from plotly.graph_objs import Figure
+
+# How long the browser waits for a new version of the page in one request
+LONG_POLL_SECONDS = 30
+
+# Reloads the page as soon as the server has a new version of it. Every request
+# waits on the server until the version changes or the long poll times out.
+RELOAD_SCRIPT = """
+<script>
+(function poll(version) {
+  fetch("/version?after=" + version)
+    .then(function (response) { return response.text(); })
+    .then(function (newVersion) {
+      if (newVersion !== String(version)) { location.reload(); } else { poll(version); }
+    })
+    .catch(function () { setTimeout(function () { poll(version); }, 1000); });
+})(%d);
+</script>
+"""
+
+WAITING_PAGE = "<html><body>Waiting for a valid %s...</body></html>"
+
+
+@define
+class PlotPage:
+    """The latest rendered page, and the number of times it was rendered."""
+
+    html: str = ""
+    version: int = 0
+    condition: threading.Condition = field(factory=threading.Condition, repr=False)
+
+    def update(self, html: str) -> None:
+        with self.condition:
+            self.version += 1
+            self.html = html.replace(
+                "</body>", RELOAD_SCRIPT % self.version + "</body>"
+            )
+            self.condition.notify_all()
+
+    def wait_for_update(self, version: int, timeout: float) -> int:
+        """Wait until the page version differs from the given one, and return it."""
+        with self.condition:
+            self.condition.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+
+@define
+class FileWatcher:
+    """
+    Detector of changes in the file content.
+
+    The file is hashed only when its size or modification time change, and
+    changes are reported only when the hash changes too, so that touching the
+    file doesn't trigger anything.
+    """
+
+    filename: str
+    signature: Optional[Tuple[int, int]] = None
+    digest: Optional[str] = None
+
+    def poll(self) -> bool:
+        """Return True if the content changed since the previous call."""
+        try:
+            stat = os.stat(self.filename)
+        except FileNotFoundError:
+            # Coverage tools remove the file before writing a new one
+            return False
+        signature = (stat.st_size, stat.st_mtime_ns)
+        if signature == self.signature:
+            return False
+        self.signature = signature
+        with open(self.filename, "rb") as fd:
+            digest = hashlib.sha256(fd.read()).hexdigest()
+        if digest == self.digest:
+            return False
+        self.digest = digest
+        return True
+
+
+@define
+class PlotServer:
+    """
+    Local HTTP server of a plot that is rendered again when the file changes.
+
+    The render function is called in the thread that calls refresh(). It should
+    keep expensive state, such as mined git history, between calls.
+    """
+
+    filename: str
+    render: Callable[[], "Figure"]
+    host: str = "127.0.0.1"
+    port: int = 8050
+    page: PlotPage = field(factory=PlotPage)
+    watcher: FileWatcher = field(init=False)
+    _server: Optional[ThreadingHTTPServer] = field(default=None, init=False)
+
+    @watcher.default
+    def _make_watcher(self) -> FileWatcher:
+        return FileWatcher(self.filename)
+
+    @property
+    def url(self) -> str:
+        assert self._server is not None
+        return f"http://{self.host}:{self._server.server_port}/"
+
+    def start(self) -> None:
+        """Render the page and start serving it in a background thread."""
+        if not self.refresh():
+            self.page.update(WAITING_PAGE % self.filename)
+        self._server = ThreadingHTTPServer(
+            (self.host, self.port), make_handler(self.page)
+        )
+        self._server.daemon_threads = True
+        thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        thread.start()
+
+    def refresh(self) -> bool:
+        """
+        Render the page again if the file content changed.
+
+        Errors, e.g. when the file is still being written, are printed, and the
+        previous version of the page is served until the next change.
+        """
+        if not self.watcher.poll():
+            return False
+        try:
+            figure = self.render()
+        except Exception:
+            traceback.print_exc(file=sys.stderr)
+            return False
+        self.page.update(figure.to_html(include_plotlyjs="/plotly.min.js"))
+        return True
+
+    def serve_forever(self, interval: float = 0.5) -> None:
+        """Poll the file until interrupted with Ctrl+C."""
+        try:
+            while True:
+                time.sleep(interval)
+                self.refresh()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def make_handler(page: PlotPage) -> type:
+    class PlotRequestHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            url = urlparse(self.path)
+            if url.path == "/":
+                self.respond("text/html", page.html)
+            elif url.path == "/plotly.min.js":
+                self.respond("application/javascript", get_plotlyjs(), cache=True)
+            elif url.path == "/version":
+                after = parse_version(url.query)
+                if after is None:
+                    self.send_error(400, "The version must be an integer")
+                    return
+                version = page.wait_for_update(after, LONG_POLL_SECONDS)
+                self.respond("text/plain", str(version))
+            else:
+                self.send_error(404)
+
+        def respond(self, content_type: str, text: str, cache: bool = False) -> None:
+            body = text.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            if cache:
+                self.send_header("Cache-Control", "max-age=86400")
+            else:
+                self.send_header("Cache-Control", "no-store")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args) -> None:
+            # Browsers poll the server all the time, don't print every request
+            pass
+
+    return PlotRequestHandler
+
+
+def parse_version(query: str) -> Optional[int]:
+    """Return the "after" version of the query, or None if it isn't an integer."""
+    try:
+        return int(parse_qs(query).get("after", ["0"])[0])
+    except ValueError:
+        return None
+
+
+@functools.lru_cache(maxsize=None)
+def get_plotlyjs() -> str:
+    import plotly.offline
+
+    return plotly.offline.get_plotlyjs()
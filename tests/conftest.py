@@ -0,0 +1,55 @@
+import os
+import subprocess
+from typing import Optional
+
+import pytest
+
+
+class GitRepo:
+    """Helper to create throwaway git repositories in tests."""
+
+    def __init__(self, root):
+        self.root = str(root)
+        os.makedirs(self.root, exist_ok=True)
+        self.git("init", "-q")
+
+    def git(
+        self,
+        *args: str,
+        author_date: str = "2023-01-01T12:00:00+00:00",
+        committer_date: Optional[str] = None,
+    ) -> str:
+        env = dict(
+            os.environ,
+            GIT_AUTHOR_NAME="John Doe",
+            GIT_AUTHOR_EMAIL="john.doe@example.com",
+            GIT_COMMITTER_NAME="John Doe",
+            GIT_COMMITTER_EMAIL="john.doe@example.com",
+            GIT_AUTHOR_DATE=author_date,
+            GIT_COMMITTER_DATE=committer_date or author_date,
+        )
+        result = subprocess.run(
+            ["git", *args],
+            cwd=self.root,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        return result.stdout
+
+    def commit(self, files, message="Update files", **kwargs) -> str:
+        """Write files, commit them, and return the hash of the commit."""
+        for path, content in files.items():
+            filename = os.path.join(self.root, path)
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            with open(filename, "wt") as fd:
+                fd.write(content)
+            self.git("add", path)
+        self.git("commit", "-q", "-m", message, **kwargs)
+        return self.git("rev-parse", "HEAD").strip()
+
+
+@pytest.fixture
+def git_repo(tmp_path):
+    return GitRepo(tmp_path / "repo")
@@ -0,0 +1,25 @@
+import pytest
+
+from coverage_plot.atomic_write import atomic_write
+
+
+def test_atomic_write(tmp_path):
+    filename = tmp_path / "data.json"
+    filename.write_text("old")
+    with atomic_write(str(filename)) as fd:
+        fd.write("new")
+        # The file is replaced only when writing is done
+        assert filename.read_text() == "old"
+    assert filename.read_text() == "new"
+    assert [path.name for path in tmp_path.iterdir()] == ["data.json"]
+
+
+def test_atomic_write_error(tmp_path):
+    filename = tmp_path / "data.bin"
+    filename.write_bytes(b"old")
+    with pytest.raises(ZeroDivisionError):
+        with atomic_write(str(filename), "wb") as fd:
+            fd.write(b"new")
+            1 / 0
+    assert filename.read_bytes() == b"old"
+    assert [path.name for path in tmp_path.iterdir()] == ["data.bin"]
@@ -0,0 +1,163 @@
+import contextlib
+import json
+import os
+import sqlite3
+import time
+
+import pytest
+from click.testing import CliRunner
+
+from coverage_plot.cli import coverage_plot, run_in_background
+
+
+def write_coverage_json(filename, files):
+    report = {
+        "files": {
+            path: {
+                "summary": {
+                    "covered_lines": covered_lines,
+                    "missing_lines": missing_lines,
+                    "num_statements": covered_lines + missing_lines,
+                }
+            }
+            for path, (covered_lines, missing_lines) in files.items()
+        }
+    }
+    with open(filename, "wt") as fd:
+        json.dump(report, fd)
+
+
+def test_recency_plot(git_repo, tmp_path):
+    git_repo.commit({"app/foo.py": "foo = 1\n"})
+    coverage_file = os.path.join(git_repo.root, "coverage.json")
+    write_coverage_json(coverage_file, {"app/foo.py": (1, 0), "app/bar.py": (1, 1)})
+    output = str(tmp_path / "plot.html")
+
+    result = CliRunner().invoke(
+        coverage_plot,
+        ["--importance-type", "recency", "--no-show", "--save", output, coverage_file],
+    )
+    assert result.exit_code == 0, result.output
+    assert os.path.getsize(output)
+
+
+def test_recency_plot_decay(git_repo):
+    git_repo.commit({"app/foo.py": "foo = 1\n"})
+    coverage_file = os.path.join(git_repo.root, "coverage.json")
+    write_coverage_json(coverage_file, {"app/foo.py": (1, 0)})
+
+    args = ["--importance-type", "recency", "--no-show", coverage_file]
+    result = CliRunner().invoke(
+        coverage_plot, ["--decay", "exponential", "--decay-days", "14", *args]
+    )
+    assert result.exit_code == 0, result.output
+    result = CliRunner().invoke(coverage_plot, ["--decay-days", "0", *args])
+    assert result.exit_code != 0
+
+
+def test_only(tmp_path, monkeypatch):
+    coverage_file = str(tmp_path / "coverage.json")
+    write_coverage_json(
+        coverage_file, {"services/billing/api.py": (1, 0), "services/auth.py": (1, 1)}
+    )
+    figures = []
+    monkeypatch.setattr(
+        "plotly.graph_objs.Figure.show", lambda fig: figures.append(fig)
+    )
+
+    result = CliRunner().invoke(
+        coverage_plot, ["--only", "services/billing/", coverage_file]
+    )
+    assert result.exit_code == 0, result.output
+    (figure,) = figures
+    assert "services/billing/api.py" in figure.data[0].ids
+    assert "services/auth.py" not in figure.data[0].ids
+
+
+def test_recency_plot_git_errors(tmp_path):
+    # The report is fine, but there's no git repository to mine
+    coverage_file = str(tmp_path / "coverage.json")
+    write_coverage_json(coverage_file, {"app/foo.py": (1, 0)})
+
+    result = CliRunner().invoke(
+        coverage_plot, ["--importance-type", "recency", "--no-show", coverage_file]
+    )
+    assert result.exit_code != 0
+    assert result.exception is not None
+
+
+def test_parallel_pydriller(git_repo):
+    git_repo.commit({"app/foo.py": "foo = 1\n"})
+    coverage_file = os.path.join(git_repo.root, "coverage.json")
+    write_coverage_json(coverage_file, {"app/foo.py": (1, 0)})
+
+    result = CliRunner().invoke(
+        coverage_plot,
+        [
+            *("--importance-type", "recency", "--no-show"),
+            *("--git-backend", "pydriller", "--git-workers", "2"),
+            coverage_file,
+        ],
+    )
+    assert result.exit_code == 2
+    assert "--git-workers" in result.output
+
+
+def test_statements_with_json_report(tmp_path):
+    coverage_file = str(tmp_path / "coverage.json")
+    write_coverage_json(coverage_file, {"app/foo.py": (1, 0)})
+    statements = tmp_path / "statements.json"
+    statements.write_text(json.dumps({"app/foo.py": 1}))
+
+    result = CliRunner().invoke(
+        coverage_plot,
+        ["--statements", str(statements), "--no-show", coverage_file],
+    )
+    assert result.exit_code == 2
+    assert "--statements" in result.output
+
+
+def test_report_cache_dir_with_coverage_db(tmp_path):
+    coverage_file = str(tmp_path / ".coverage")
+    with contextlib.closing(sqlite3.connect(coverage_file)) as connection:
+        connection.execute("CREATE TABLE meta (key text, value text)")
+
+    result = CliRunner().invoke(
+        coverage_plot,
+        ["--report-cache-dir", str(tmp_path / "cache"), "--no-show", coverage_file],
+    )
+    assert result.exit_code == 2
+    assert "--report-cache-dir" in result.output
+
+
+def test_diff_base_options(tmp_path):
+    coverage_file = str(tmp_path / "coverage.json")
+    write_coverage_json(coverage_file, {"app/foo.py": (1, 0)})
+    args = ["--diff-base", coverage_file, "--no-show", coverage_file]
+
+    result = CliRunner().invoke(coverage_plot, args)
+    assert result.exit_code == 0, result.output
+
+    # Options that diff plots don't use are rejected instead of being ignored
+    result = CliRunner().invoke(
+        coverage_plot, ["--max-nodes", "10", "--git-workers", "2", *args]
+    )
+    assert result.exit_code == 2
+    assert "--max-nodes, --git-workers can't be combined" in result.output
+
+
+def test_run_in_background():
+    with run_in_background(os.getpid) as future:
+        assert future.result(timeout=30) != os.getpid()
+    with run_in_background(int, "42") as future:
+        assert future.result(timeout=30) == 42
+    with run_in_background(int, "not a number") as future:
+        with pytest.raises(ValueError):
+            future.result(timeout=30)
+
+
+def test_run_in_background_terminates_process():
+    with run_in_background(time.sleep, 60) as future:
+        pass
+    with pytest.raises(RuntimeError):
+        future.result(timeout=30)
@@ -1,13 +1,29 @@
+import io
+import json
+import sqlite3
+
+import numpy as np
 import pandas as pd
+import pytest
 
 from coverage_plot.importance_filesize import FileSizeImportance
+from coverage_plot.json_scanner import JSONScanner
+from coverage_plot.path_filter import PathFilter
 from coverage_plot.plot import (
+    ColumnarReport,
     FileCoverage,
+    ReportBuilder,
+    build_tree,
     export_df,
     import_json,
+    import_json_file,
+    import_sqlite,
     import_xml,
+    import_xml_file,
     make_path_components,
     plot_sunburst,
+    plot_treemap,
+    save_html,
 )
 
 
@@ -36,6 +52,110 @@ def test_json_importer():
     assert report["foo.py"].percent_covered() == 40.0
     assert report["foo.py"].total_lines() == 5
 
+    summary = {"covered_lines": 2, "missing_lines": 3, "num_statements": 5}
+    assert FileCoverage.from_summary(summary) == report["foo.py"]
+    assert FileCoverage.from_dict({"summary": summary}) == report["foo.py"]
+
+
+def test_json_file_importer(tmp_path, monkeypatch):
+    raw_report = {
+        "meta": {"version": "7.2.3", "show_contexts": True},
+        "files": {
+            f"app/mod_{i}.py": {
+                "executed_lines": list(range(1, i + 2)),
+                "summary": {"covered_lines": i + 1, "missing_lines": 3},
+                "missing_lines": [100, 101, 102],
+                "excluded_lines": [],
+                "contexts": {"1": ["test_foo|run", 'with "quotes" and \\ ]}']},
+            }
+            for i in range(50)
+        },
+        "totals": {"covered_lines": 1275, "missing_lines": 150},
+    }
+    coverage_json = tmp_path / "coverage.json"
+    coverage_json.write_text(json.dumps(raw_report))
+    # Make sure that values and strings cross the chunk boundaries
+    monkeypatch.setattr(JSONScanner, "chunk_size", 7)
+
+    report = import_json_file(str(coverage_json))
+    assert report == import_json(json.dumps(raw_report))
+    assert report["app/mod_9.py"] == FileCoverage(10, 3)
+    assert import_json_file(io.BytesIO(coverage_json.read_bytes())) == report
+
+    # Larger files are scanned too
+    monkeypatch.setattr("coverage_plot.plot.JSON_LOAD_MAX_SIZE", 0)
+    assert import_json_file(str(coverage_json)) == report
+
+
+def make_coverage_db(filename, has_arcs, files):
+    connection = sqlite3.connect(filename)
+    connection.executescript(
+        """
+        CREATE TABLE meta (key text, value text, unique (key));
+        CREATE TABLE file (id integer primary key, path text, unique (path));
+        CREATE TABLE line_bits (file_id integer, context_id integer, numbits blob);
+        CREATE TABLE arc (
+            file_id integer, context_id integer, fromno integer, tono integer
+        );
+        """
+    )
+    connection.execute("INSERT INTO meta VALUES ('has_arcs', ?)", (has_arcs,))
+    for file_id, (path, rows) in enumerate(files.items(), 1):
+        connection.execute("INSERT INTO file VALUES (?, ?)", (file_id, path))
+        table = "arc" if has_arcs == "1" else "line_bits"
+        for row in rows:
+            placeholders = ", ".join(["?"] * (len(row) + 1))
+            connection.execute(
+                f"INSERT INTO {table} VALUES ({placeholders})", (file_id, *row)
+            )
+    connection.commit()
+    connection.close()
+
+
+def test_sqlite_importer_lines(tmp_path):
+    make_coverage_db(
+        tmp_path / ".coverage",
+        "0",
+        {
+            # Lines 1, 2 and 3 in the first context, 3 and 9 in the second one
+            str(tmp_path / "app/views.py"): [(1, bytes([0b1110])), (2, b"\x08\x02")],
+            str(tmp_path / "app/models.py"): [],
+        },
+    )
+    report = import_sqlite(str(tmp_path / ".coverage"))
+    assert report == {
+        "app/views.py": FileCoverage(4, 0),
+        "app/models.py": FileCoverage(0, 0),
+    }
+
+    statements = {"app/views.py": 8, "app/models.py": 2, "app/urls.py": 3}
+    report = import_sqlite(str(tmp_path / ".coverage"), statements)
+    assert report == {
+        "app/views.py": FileCoverage(4, 4),
+        "app/models.py": FileCoverage(0, 2),
+        "app/urls.py": FileCoverage(0, 3),
+    }
+    # Files are listed in the same order on every run
+    assert list(report) == ["app/models.py", "app/urls.py", "app/views.py"]
+
+    # Files missing from the statement counts keep their executed lines
+    report = import_sqlite(str(tmp_path / ".coverage"), {"app/urls.py": 3})
+    assert report == {
+        "app/views.py": FileCoverage(4, 0),
+        "app/models.py": FileCoverage(0, 0),
+        "app/urls.py": FileCoverage(0, 3),
+    }
+
+
+def test_sqlite_importer_arcs(tmp_path):
+    make_coverage_db(
+        tmp_path / ".coverage",
+        "1",
+        {str(tmp_path / "app/views.py"): [(1, -1, 1), (1, 1, 2), (1, 2, -1)]},
+    )
+    report = import_sqlite(str(tmp_path / ".coverage"), {"app/views.py": 3})
+    assert report == {"app/views.py": FileCoverage(2, 1)}
+
 
 def test_xml_importer():
     xml_report = """
@@ -69,12 +189,143 @@ def test_xml_importer():
     assert report["foo/app/views.py"].total_lines() == 6
 
 
+def test_xml_file_importer(tmp_path):
+    xml_report = """
+    <?xml version="1.0" encoding="UTF-8"?>
+    <coverage>
+        <sources>
+            <source>/app/foo</source>
+        </sources>
+        <packages>
+            <package>
+                <classes>
+                    <class filename="app/views.py">
+                        <methods>
+                            <method name="index">
+                                <lines>
+                                    <line hits="1" number="2"/>
+                                </lines>
+                            </method>
+                        </methods>
+                        <lines>
+                            <line hits="1" number="1"/>
+                            <line hits="1" number="2"/>
+                            <line hits="0" number="3"/>
+                        </lines>
+                    </class>
+                    <class filename="app/models.py">
+                        <methods/>
+                        <lines>
+                            <line hits="0" number="1"/>
+                        </lines>
+                    </class>
+                </classes>
+            </package>
+        </packages>
+    </coverage>
+    """.strip()
+    coverage_xml = tmp_path / "coverage.xml"
+    coverage_xml.write_text(xml_report)
+
+    report = import_xml_file(str(coverage_xml))
+    assert sorted(report) == ["foo/app/models.py", "foo/app/views.py"]
+    assert report["foo/app/views.py"] == FileCoverage(2, 1)
+    assert report["foo/app/models.py"] == FileCoverage(0, 1)
+
+    with coverage_xml.open("rb") as fd:
+        assert import_xml_file(fd) == report
+
+
+def test_importers_path_filter(tmp_path):
+    files = {
+        "services/billing/api.py": (3, 1),
+        "services/billing/legacy.py": (0, 5),
+        "services/auth/api.py": (2, 2),
+    }
+    path_filter = PathFilter(
+        ["services/billing"], exclude=["services/billing/legacy.py"]
+    )
+    expected = {"services/billing/api.py": FileCoverage(3, 1)}
+
+    raw_report = {
+        "files": {
+            path: {"summary": {"covered_lines": covered, "missing_lines": missing}}
+            for path, (covered, missing) in files.items()
+        }
+    }
+    coverage_json = tmp_path / "coverage.json"
+    coverage_json.write_text(json.dumps(raw_report))
+    assert (
+        dict(import_json_file(str(coverage_json), path_filter=path_filter)) == expected
+    )
+    assert (
+        dict(import_json(json.dumps(raw_report), path_filter=path_filter)) == expected
+    )
+
+    # The root from <source> is a part of the path, even if it comes last
+    classes = "".join(
+        f'<class filename="{path[len("services/"):]}"><lines>'
+        + '<line hits="1"/>' * covered
+        + '<line hits="0"/>' * missing
+        + "</lines></class>"
+        for path, (covered, missing) in files.items()
+    )
+    for sources_first in (True, False):
+        sources = "<sources><source>/src/services</source></sources>"
+        packages = (
+            f"<packages><package><classes>{classes}</classes></package></packages>"
+        )
+        body = sources + packages if sources_first else packages + sources
+        report = import_xml(f"<coverage>{body}</coverage>", path_filter=path_filter)
+        assert dict(report) == expected
+
+    make_coverage_db(
+        tmp_path / ".coverage",
+        "0",
+        {str(tmp_path / path): [(1, bytes([0b10]))] for path in files},
+    )
+    statements = {path: sum(lines) for path, lines in files.items()}
+    report = import_sqlite(
+        str(tmp_path / ".coverage"), statements, path_filter=path_filter
+    )
+    assert dict(report) == {"services/billing/api.py": FileCoverage(1, 3)}
+
+
 def test_make_path_components():
     df = pd.DataFrame([{"path": "foo/bar/baz.py"}])
     ret = make_path_components(df)
     assert dict(ret.iloc[0]) == {"p0": "foo", "p1": "bar", "p2": "baz.py"}
 
 
+def test_make_path_components_padding():
+    df = pd.DataFrame([{"path": "foo/bar/baz.py"}, {"path": "foo/qux.py"}])
+    ret = make_path_components(df)
+    assert list(ret.columns) == ["p0", "p1", "p2"]
+    assert list(ret.iloc[1][:2]) == ["foo", "qux.py"]
+    assert pd.isnull(ret.iloc[1]["p2"])
+
+
+def test_make_path_components_max_depth():
+    df = pd.DataFrame([{"path": "foo/bar/baz/qux.py"}, {"path": "foo/spam.py"}])
+    ret = make_path_components(df, max_depth=2)
+    assert list(ret.columns) == ["p0", "p1"]
+    assert list(ret["p1"]) == ["bar/baz/qux.py", "spam.py"]
+
+
+def test_make_path_components_collapse_chains():
+    df = pd.DataFrame(
+        [
+            {"path": "src/app/models/user.py"},
+            {"path": "src/app/views/index.py"},
+            {"path": "src/app/views/helpers/html.py"},
+        ]
+    )
+    ret = make_path_components(df, collapse_chains=True)
+    assert list(ret.iloc[0].dropna()) == ["src/app", "models", "user.py"]
+    assert list(ret.iloc[1].dropna()) == ["src/app", "views", "index.py"]
+    assert list(ret.iloc[2].dropna()) == ["src/app", "views", "helpers", "html.py"]
+
+
 def test_export_df():
     report = {"app/foo.py": FileCoverage(1, 1), "app/bar.py": FileCoverage(2, 2)}
     importance = FileSizeImportance(report)
@@ -87,6 +338,50 @@ def test_export_df():
     ]
 
 
+def test_report_builder():
+    builder = ReportBuilder()
+    builder.add("app/foo.py", 1, 3)
+    builder.add("app/bar.py", 0, 0)
+    builder.add("app/foo.py", 3, 1)
+    report = builder.build()
+    assert isinstance(report, ColumnarReport)
+    assert report == {"app/foo.py": FileCoverage(3, 1), "app/bar.py": FileCoverage()}
+    assert list(report.percent_covered()) == [0.0, 75.0]
+
+
+def test_columnar_report_to_df():
+    report = ColumnarReport.from_mapping(
+        {"app/foo.py": FileCoverage(1, 1), "app/bar.py": FileCoverage(3, 0)}
+    )
+    df = report.to_df()
+    assert list(df.columns) == [
+        "path",
+        "covered_lines",
+        "missing_lines",
+        "percent_covered",
+    ]
+    assert list(df["path"]) == ["app/foo.py", "app/bar.py"]
+    assert list(df["percent_covered"]) == [50.0, 100.0]
+
+
+def test_export_df_columnar():
+    report = ColumnarReport(
+        paths=np.array(["app/foo.py", "app/bar.py", "app/empty.py"], dtype=object),
+        covered_lines=np.array([1, 2, 0]),
+        missing_lines=np.array([1, 2, 0]),
+    )
+    df = export_df(report, FileSizeImportance(report))
+    assert list(df["path"]) == ["app/bar.py", "app/foo.py"]
+    assert list(df["name"]) == ["bar.py", "foo.py"]
+    assert list(df["importance"]) == [4, 2]
+
+
+def test_file_size_importance_get_importances():
+    report = {"app/foo.py": FileCoverage(1, 1), "app/bar.py": FileCoverage(2, 2)}
+    importance = FileSizeImportance(report)
+    assert list(importance.get_importances(["app/bar.py", "app/foo.py"])) == [4, 2]
+
+
 def test_sunburst():
     report = {
         "app/utils.py": FileCoverage(40, 3),
@@ -98,3 +393,120 @@ def test_sunburst():
     importance = FileSizeImportance(report)
     figure = plot_sunburst(report, importance)
     assert figure.data[0].type == "sunburst"
+
+
+def test_build_tree():
+    report = {
+        "app/utils.py": FileCoverage(40, 0),
+        "app/models/foo.py": FileCoverage(10, 90),
+        "app/models/bar.py": FileCoverage(0, 0),
+        "app/views.py": FileCoverage(1, 0),
+    }
+    tree = build_tree(report, FileSizeImportance(report))
+    nodes = {
+        node_id: (parent, value, percent)
+        for node_id, parent, value, percent in zip(
+            tree.ids, tree.parents, tree.values, tree.percent_covered()
+        )
+    }
+    assert nodes == {
+        "app": ("", 141, pytest.approx(100 * 51 / 141)),
+        "app/models": ("app", 100, 10.0),
+        "app/models/foo.py": ("app/models", 100, 10.0),
+        "app/utils.py": ("app", 40, 100.0),
+        "app/views.py": ("app", 1, 100.0),
+    }
+    assert tree.labels[tree.ids.index("app/models/foo.py")] == "foo.py"
+
+
+def make_fold_report():
+    return {
+        "app/utils.py": FileCoverage(40, 0),
+        "app/models/foo.py": FileCoverage(10, 90),
+        "app/models/bar.py": FileCoverage(2, 2),
+        "app/models/baz.py": FileCoverage(1, 1),
+        "app/views.py": FileCoverage(1, 0),
+        "app/forms.py": FileCoverage(0, 1),
+    }
+
+
+def test_build_tree_max_nodes():
+    report = make_fold_report()
+    tree = build_tree(report, FileSizeImportance(report), max_nodes=6)
+    nodes = {
+        node_id: (parent, value, covered, missing)
+        for node_id, parent, value, covered, missing in zip(
+            tree.ids, tree.parents, tree.values, tree.covered_lines, tree.missing_lines
+        )
+    }
+    assert nodes == {
+        "app": ("", 148, 54, 94),
+        "app/models": ("app", 106, 13, 93),
+        "app/models/foo.py": ("app/models", 100, 10, 90),
+        "app/models/(2 other files)": ("app/models", 6, 3, 3),
+        "app/utils.py": ("app", 40, 40, 0),
+        "app/(2 other files)": ("app", 2, 1, 1),
+    }
+
+
+def test_build_tree_max_nodes_folds_directories():
+    report = make_fold_report()
+    tree = build_tree(report, FileSizeImportance(report), max_nodes=3)
+    assert len(tree.ids) == 3
+    assert tree.values[tree.ids.index("app")] == 148
+    assert tree.percent_covered()[0] == pytest.approx(100 * 54 / 148)
+    # Folding app/models leaves room for app/utils.py
+    assert tree.ids == ["app", "app/utils.py", "app/(5 other files)"]
+    assert list(tree.values) == [148, 40, 108]
+
+
+def test_build_tree_max_nodes_fits():
+    report = make_fold_report()
+    unfolded = build_tree(report, FileSizeImportance(report))
+    folded = build_tree(report, FileSizeImportance(report), max_nodes=100)
+    assert folded.ids == unfolded.ids
+
+
+def test_build_tree_max_nodes_is_deterministic():
+    report = {f"pkg/file{i}.py": FileCoverage(1, 1) for i in range(10)}
+    trees = [
+        build_tree(report, FileSizeImportance(report), max_nodes=5) for _ in range(2)
+    ]
+    assert trees[0].ids == trees[1].ids
+    assert len(trees[0].ids) == 5
+
+
+def test_treemap():
+    report = {
+        "src/app/utils.py": FileCoverage(40, 3),
+        "src/app/models/foo.py": FileCoverage(18, 1),
+    }
+    figure = plot_treemap(report, FileSizeImportance(report), collapse_chains=True)
+    assert figure.data[0].type == "treemap"
+    assert list(figure.data[0].ids) == [
+        "src/app",
+        "src/app/models",
+        "src/app/models/foo.py",
+        "src/app/utils.py",
+    ]
+
+
+def test_save_html_shared_plotlyjs(tmp_path):
+    report = {"app/utils.py": FileCoverage(40, 3), "app/views.py": FileCoverage(1, 2)}
+    figure = plot_treemap(report, FileSizeImportance(report))
+    save_html(figure, str(tmp_path / "first.html"), plotlyjs="shared")
+    save_html(figure, str(tmp_path / "second.html"), plotlyjs="shared")
+
+    bundles = list(tmp_path.glob("plotly-*.min.js"))
+    assert len(bundles) == 1
+    for name in ["first.html", "second.html"]:
+        html = (tmp_path / name).read_text()
+        assert f'src="{bundles[0].name}"' in html
+        assert len(html) < bundles[0].stat().st_size / 10
+
+
+def test_save_html_unknown_mode(tmp_path):
+    report = {"app/utils.py": FileCoverage(40, 3)}
+    figure = plot_treemap(report, FileSizeImportance(report))
+    with pytest.raises(ValueError):
+        save_html(figure, str(tmp_path / "plot.html"), plotlyjs="external")
@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from attrs import frozen
+
+from coverage_plot.decay import (
+    DecayCurve,
+    ExponentialDecay,
+    HyperbolicDecay,
+    LinearDecay,
+    StepDecay,
+    get_decay_curve,
+    score_timestamps,
+)
+
+NOW = datetime(2023, 6, 1, 12)
+
+
+def make_timestamps(*days_ago):
+    return np.array(
+        [None if days is None else NOW - timedelta(days=days) for days in days_ago],
+        dtype="datetime64[us]",
+    )
+
+
+@frozen
+class HalfAfterMonth(DecayCurve):
+    def get_importances(self, age_days):
+        return np.where(age_days < 30, 1000, 500)
+
+
+@pytest.mark.parametrize(
+    "decay, expected",
+    [
+        (HyperbolicDecay(), [1000, 1000, 1000, 500, 142, 0]),
+        (HyperbolicDecay(period_days=1), [1000, 1000, 166, 71, 20, 0]),
+        (StepDecay(window_days=7), [1000, 1000, 1000, 0, 0, 0]),
+        (ExponentialDecay(half_life_days=7), [1000, 1000, 552, 250, 7, 0]),
+        (LinearDecay(window_days=50), [1000, 1000, 880, 720, 0, 0]),
+        (HalfAfterMonth(), [1000, 1000, 1000, 1000, 500, 0]),
+    ],
+)
+def test_score_timestamps(decay, expected):
+    # Changes from the future count as made right now, and NaT as never made
+    last_modified = make_timestamps(-1, 0, 6, 14, 50, None)
+    assert list(score_timestamps(last_modified, NOW, decay)) == expected
+
+
+def test_hyperbolic_decay_matches_weeks():
+    days = np.arange(0, 400, 0.5)
+    weeks = np.floor(days).astype(np.int64) // 7
+    expected = [1000 if w <= 0 else 1000 // w for w in weeks]
+    assert list(HyperbolicDecay().get_importances(days)) == expected
+
+
+def test_get_decay_curve():
+    assert get_decay_curve("hyperbolic") == HyperbolicDecay()
+    assert get_decay_curve("exponential", 14) == ExponentialDecay(half_life_days=14)
+    assert get_decay_curve("linear", 30) == LinearDecay(window_days=30)
+    with pytest.raises(ValueError):
+        get_decay_curve("cubic")
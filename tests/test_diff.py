@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from coverage_plot.diff import build_diff_tree, diff_reports, merge_paths, plot_diff
+from coverage_plot.git_changes import get_renames
+from coverage_plot.plot import FileCoverage
+
+
+@pytest.fixture
+def diff():
+    base = {
+        "app/utils.py": FileCoverage(40, 10),
+        "app/old.py": FileCoverage(5, 5),
+        "app/removed.py": FileCoverage(1, 1),
+        "app/same.py": FileCoverage(3, 0),
+    }
+    head = {
+        "app/utils.py": FileCoverage(45, 5),
+        "app/new.py": FileCoverage(6, 4),
+        "app/added.py": FileCoverage(0, 2),
+        "app/same.py": FileCoverage(3, 0),
+    }
+    return diff_reports(base, head, renames={"app/old.py": "app/new.py"})
+
+
+def test_diff_reports(diff):
+    df = diff.to_df().set_index("path")
+    assert list(df.index) == [
+        "app/added.py",
+        "app/new.py",
+        "app/removed.py",
+        "app/same.py",
+        "app/utils.py",
+    ]
+    assert list(df["status"]) == [
+        "added",
+        "renamed",
+        "removed",
+        "unchanged",
+        "modified",
+    ]
+    assert list(df["covered_lines_delta"]) == [0, 1, -1, 0, 5]
+    assert list(df["missing_lines_delta"]) == [2, -1, -1, 0, -5]
+    assert list(df["percent_delta"]) == pytest.approx([0, 10, 0, 0, 10])
+
+
+def test_merge_paths():
+    base = np.array(["c", "a", "b"], dtype=object)
+    head = np.array(["d", "b"], dtype=object)
+    paths, base_positions, head_positions = merge_paths(base, head)
+    assert list(paths) == ["a", "b", "c", "d"]
+    assert list(paths[base_positions]) == list(base)
+    assert list(paths[head_positions]) == list(head)
+
+
+def test_build_diff_tree(diff):
+    tree = build_diff_tree(diff)
+    nodes = dict(zip(tree.ids, zip(tree.values, tree.percent_delta())))
+    # Lines of the larger side of every file: 2 + 10 + 2 + 3 + 50
+    assert nodes["app"] == (67, pytest.approx(100 * 54 / 65 - 100 * 49 / 65))
+    assert nodes["app/removed.py"] == (2, 0)
+    assert nodes["app/utils.py"] == (50, pytest.approx(10))
+
+
+@pytest.mark.parametrize("plot_type", ["treemap", "sunburst"])
+def test_plot_diff(diff, plot_type):
+    figure = plot_diff(diff, plot_type)
+    assert figure.data[0].type == plot_type
+    assert figure.layout.coloraxis.cmid == 0
+    assert figure.layout.coloraxis.cmin == -figure.layout.coloraxis.cmax
+
+
+def test_get_renames(git_repo):
+    base = git_repo.commit({"old.py": "print('hello')\n" * 10, "kept.py": "x = 1\n"})
+    git_repo.git("mv", "old.py", "new.py")
+    git_repo.git("commit", "-q", "-m", "Rename")
+    assert get_renames(git_repo.root, base) == {"old.py": "new.py"}
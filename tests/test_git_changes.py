@@ -1,19 +1,33 @@
+from datetime import datetime, timezone
+
+import pytest
+
 from coverage_plot.fake_implementations import (
     FakeCommit,
     FakeDeveloper,
     FakeModification,
 )
 from coverage_plot.git_changes import (
+    ExcludeAllCommits,
     ExcludeAllModifications,
     ExcludeAuthor,
     ExcludeMessage,
     FilterResult,
     IncludeAllCommits,
+    IncludeAllModifications,
     IncludeFile,
+    LogModification,
     apply_commit_filters,
     apply_modification_filters,
+    compile_commit_filters,
+    compile_modification_filters,
     filter_modifications,
+    get_blob_sizes,
+    get_git_changes,
+    list_commits,
+    parse_git_log,
 )
+from coverage_plot.path_filter import PathFilter
 
 
 def test_include_file_include():
@@ -94,3 +108,155 @@ def test_filter_commits():
     assert len(modifications) == 1
     assert modifications[0].msg == "Add README"
     assert modifications[0].path == "readme.py"
+
+
+def test_parse_git_log():
+    tokens = [
+        "\x1eabc\x1fJohn Doe\x1fjohn@example.com\x1f2023-01-01T12:00:00+02:00"
+        "\x1f2023-01-05T12:00:00+02:00\x1fRename files\n\nWith details\n",
+        "\nR100",
+        "old.py",
+        "new.py",
+        "D",
+        "deleted.py",
+        "\x1edef\x1fJohn Doe\x1fjohn@example.com\x1f2022-12-31T12:00:00+00:00"
+        "\x1f2022-12-31T12:00:00+00:00\x1fMerge branch 'foo'\n",
+        "\x1eghi\x1fJohn Doe\x1fjohn@example.com\x1f2022-12-30T12:00:00+00:00"
+        "\x1f2022-12-30T12:00:00+00:00\x1fInitial commit\n",
+        "\nA",
+        "added.py",
+        "M",
+        "modified.py",
+        "",
+    ]
+    commits = list(parse_git_log(iter(tokens)))
+    assert [commit.hash for commit in commits] == ["abc", "def", "ghi"]
+    assert commits[0].msg == "Rename files\n\nWith details"
+    assert commits[0].author_date.astimezone(timezone.utc) == datetime(
+        2023, 1, 1, 10, tzinfo=timezone.utc
+    )
+    assert commits[0].committer_date.astimezone(timezone.utc) == datetime(
+        2023, 1, 5, 10, tzinfo=timezone.utc
+    )
+    assert commits[0].modifications == [
+        LogModification(old_path="old.py", new_path="new.py"),
+        LogModification(old_path="deleted.py", new_path=None),
+    ]
+    assert commits[1].modifications == []
+    assert commits[2].modifications == [
+        LogModification(old_path=None, new_path="added.py"),
+        LogModification(old_path="modified.py", new_path="modified.py"),
+    ]
+
+
+@pytest.mark.parametrize("backend", ["git", "pydriller"])
+def test_get_git_changes(git_repo, backend):
+    git_repo.commit({"app/foo.py": "foo", "README.md": "readme"})
+    git_repo.commit({"app/bar.py": "bar"}, author_date="2023-02-01T12:00:00+00:00")
+    git_repo.git("mv", "app/foo.py", "app/spam.py")
+    git_repo.commit({}, message="Rename", author_date="2023-03-01T12:00:00+00:00")
+    git_repo.git("rm", "-q", "README.md")
+    git_repo.commit({}, message="Remove", author_date="2023-04-01T12:00:00+00:00")
+
+    changes = get_git_changes(
+        git_repo.root,
+        [IncludeAllCommits()],
+        [IncludeAllModifications()],
+        since=datetime(2023, 1, 15),
+        backend=backend,
+    )
+    assert sorted((mod.path, mod.author_date, mod.msg) for mod in changes) == [
+        ("README.md", datetime(2023, 4, 1, 12), "Remove"),
+        ("app/bar.py", datetime(2023, 2, 1, 12), "Update files"),
+        ("app/foo.py", datetime(2023, 3, 1, 12), "Rename"),
+    ]
+
+
+@pytest.mark.parametrize("backend", ["git", "pydriller"])
+def test_get_git_changes_path_filter(git_repo, backend):
+    git_repo.commit({"app/foo.py": "foo", "app/legacy/bar.py": "bar"})
+    git_repo.commit({"docs/index.md": "docs"}, message="Docs")
+    path_filter = PathFilter(["app"], exclude=["app/legacy"])
+
+    changes = get_git_changes(
+        git_repo.root,
+        [IncludeAllCommits()],
+        [IncludeAllModifications()],
+        backend=backend,
+        path_filter=path_filter,
+    )
+    assert [mod.path for mod in changes] == ["app/foo.py"]
+    assert list_commits(git_repo.root, path_filter=path_filter) == [
+        git_repo.git("rev-parse", "HEAD~1").strip()
+    ]
+
+
+def test_get_blob_sizes(git_repo):
+    first_commit = git_repo.commit({"app/foo.py": "foo", "README.md": "readme"})
+    git_repo.commit({"app/foo.py": "foofoo", "app/with space.py": "x"})
+    assert get_blob_sizes(git_repo.root) == {
+        "README.md": 6,
+        "app/foo.py": 6,
+        "app/with space.py": 1,
+    }
+    assert get_blob_sizes(git_repo.root, first_commit) == {
+        "README.md": 6,
+        "app/foo.py": 3,
+    }
+
+
+@pytest.mark.parametrize(
+    "commit_filters",
+    [
+        [ExcludeMessage("black"), IncludeAllCommits()],
+        [ExcludeAuthor("bot"), ExcludeMessage("black"), ExcludeAllCommits()],
+        [ExcludeAuthor("bot"), ExcludeMessage("fix"), ExcludeMessage("black")],
+        [ExcludeMessage("black"), IncludeAllCommits(), ExcludeAllCommits()],
+        [],
+    ],
+)
+def test_compile_commit_filters(commit_filters):
+    test_commits = [
+        FakeCommit(msg="Apply black formatting"),
+        FakeCommit(msg="Fix (the) bug"),
+        FakeCommit(msg="Add README", author=FakeDeveloper(name="robot")),
+        FakeCommit(author=FakeDeveloper(email="dependabot@github.com")),
+        FakeCommit(msg="Add *.py files"),
+    ]
+    compiled = compile_commit_filters(commit_filters)
+    for commit in test_commits:
+        try:
+            expected = apply_commit_filters(commit, commit_filters)
+        except RuntimeError:
+            with pytest.raises(RuntimeError):
+                compiled(commit)
+        else:
+            assert compiled(commit) == expected
+
+
+@pytest.mark.parametrize(
+    "modification_filters",
+    [
+        [IncludeFile("*.py"), ExcludeAllModifications()],
+        [IncludeFile("src/*.py"), IncludeFile("*.[ch]"), IncludeAllModifications()],
+        [IncludeFile("*.py"), IncludeFile("[!a]*.md")],
+        [IncludeAllModifications(), IncludeFile("*.py")],
+    ],
+)
+def test_compile_modification_filters(modification_filters):
+    test_modifications = [
+        FakeModification(path="src/models.py"),
+        FakeModification(path="README.md"),
+        FakeModification(path="abc.md"),
+        FakeModification(path="lib/foo.c"),
+        FakeModification(path="setup.cfg"),
+    ]
+    compiled = compile_modification_filters(modification_filters)
+    for modification in test_modifications:
+        try:
+            expected = apply_modification_filters(modification, modification_filters)
+        except RuntimeError:
+            with pytest.raises(RuntimeError):
+                compiled(modification)
+        else:
+            assert compiled(modification) == expected
@@ -0,0 +1,103 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from coverage_plot.history import CoverageHistory, is_under, plot_trend
+from coverage_plot.plot import FileCoverage
+
+
+@pytest.fixture
+def history(tmp_path):
+    history = CoverageHistory(str(tmp_path / "history"))
+    history.append(
+        {
+            "src/api/views.py": FileCoverage(10, 10),
+            "src/core/models.py": FileCoverage(5, 0),
+        },
+        commit="aaa",
+        timestamp=datetime(2023, 1, 1, tzinfo=timezone.utc),
+    )
+    history.append(
+        {
+            "src/api/views.py": FileCoverage(15, 5),
+            "src/api/serializers.py": FileCoverage(5, 0),
+            "src/core/models.py": FileCoverage(5, 0),
+        },
+        commit="bbb",
+        timestamp=datetime(2023, 2, 1, tzinfo=timezone.utc),
+    )
+    return history
+
+
+def test_trend(history):
+    trend = history.trend("src/api/")
+    assert list(trend["commit"]) == ["aaa", "bbb"]
+    assert list(trend["covered_lines"]) == [10, 20]
+    assert list(trend["missing_lines"]) == [10, 5]
+    assert list(trend["percent_covered"]) == pytest.approx([50, 80])
+    assert list(history.trend()["covered_lines"]) == [15, 25]
+
+
+def test_paths_are_stored_once(history):
+    # A new instance reads everything from the disk
+    history = CoverageHistory(history.directory)
+    assert history.get_paths() == [
+        "src/api/views.py",
+        "src/core/models.py",
+        "src/api/serializers.py",
+    ]
+
+
+def test_get_report(history):
+    report = CoverageHistory(history.directory).get_report("aaa")
+    assert dict(report) == {
+        "src/api/views.py": FileCoverage(10, 10),
+        "src/core/models.py": FileCoverage(5, 0),
+    }
+    with pytest.raises(KeyError):
+        history.get_report("ccc")
+
+
+def test_append_duplicate_commit(history):
+    with pytest.raises(ValueError):
+        history.append({}, commit="aaa", timestamp=datetime.now(timezone.utc))
+
+
+def test_interrupted_append_is_ignored(history):
+    with open(history.get_filename("records.bin"), "ab") as fd:
+        fd.write(b"\1" * 30)
+    with open(history.get_filename("paths.bin"), "ab") as fd:
+        fd.write(b"src/partial")
+    with open(history.get_filename("snapshots.jsonl"), "at") as fd:
+        fd.write('{"commit": "ccc"')
+
+    history = CoverageHistory(history.directory)
+    assert [snapshot.commit for snapshot in history.snapshots()] == ["aaa", "bbb"]
+    history.append(
+        {"src/new.py": FileCoverage(1, 1)},
+        commit="ddd",
+        timestamp=datetime(2023, 3, 1, tzinfo=timezone.utc),
+    )
+    history = CoverageHistory(history.directory)
+    assert dict(history.get_report("ddd")) == {"src/new.py": FileCoverage(1, 1)}
+    assert history.get_paths()[-1] == "src/new.py"
+
+
+@pytest.mark.parametrize(
+    "path, prefix, expected",
+    [
+        ("src/api/views.py", "src/api", True),
+        ("src/api/views.py", "src/api/", True),
+        ("src/apis/views.py", "src/api", False),
+        ("src/api/views.py", "src/api/views.py", True),
+        ("src/api/views.py", "", True),
+    ],
+)
+def test_is_under(path, prefix, expected):
+    assert is_under(path, prefix) == expected
+
+
+def test_plot_trend(history):
+    figure = plot_trend(history, ["src/api", "src/core"])
+    assert [trace.name for trace in figure.data] == ["src/api", "src/core"]
+    assert list(figure.data[0].y) == [50, 80]
@@ -0,0 +1,246 @@
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from coverage_plot.decay import StepDecay
+from coverage_plot.git_cache import get_filter_key
+from coverage_plot.git_changes import (
+    CommitFilter,
+    ExcludeAllModifications,
+    ExcludeMessage,
+    FilterResult,
+    IncludeAllCommits,
+    IncludeFile,
+)
+from coverage_plot.importance_recency import (
+    GitImportance,
+    get_last_modified,
+    merge_change_dates,
+    select_last_modified,
+    timestamp_to_importance,
+    timestamps_to_importance,
+)
+from coverage_plot.path_filter import PathFilter
+
+SINCE = datetime(2022, 1, 1)
+
+
+def test_merge_change_dates():
+    jan, feb, mar = datetime(2023, 1, 1), datetime(2023, 2, 1), datetime(2023, 3, 1)
+    target = {"foo.py": [(jan, jan)], "bar.py": [(feb, jan)]}
+    source = {"foo.py": [(feb, feb)], "bar.py": [(mar, jan), (feb, feb)]}
+    # Changes older by both dates are dropped, the others are kept
+    assert merge_change_dates(target, source) == {
+        "foo.py": [(feb, feb)],
+        "bar.py": [(mar, jan), (feb, feb)],
+    }
+    assert select_last_modified(target) == {"foo.py": feb, "bar.py": feb}
+    assert select_last_modified(target, since=datetime(2023, 2, 15)) == {"bar.py": jan}
+
+
+def test_git_importance_cache(git_repo, tmp_path, monkeypatch):
+    first_commit = git_repo.commit({"app/foo.py": "foo"})
+    cache_dir = str(tmp_path / "cache")
+
+    calls = []
+    mine_change_dates = GitImportance.mine_change_dates
+
+    def spy(self, from_commit=None):
+        calls.append(from_commit)
+        return mine_change_dates(self, from_commit)
+
+    monkeypatch.setattr(GitImportance, "mine_change_dates", spy)
+
+    importance = GitImportance(git_repo.root, since=SINCE, cache_dir=cache_dir)
+    assert importance.last_modified_dict == {"app/foo.py": datetime(2023, 1, 1, 12)}
+    assert calls == [None]
+
+    # Nothing changed, nothing to mine
+    importance = GitImportance(git_repo.root, since=SINCE, cache_dir=cache_dir)
+    assert importance.last_modified_dict == {"app/foo.py": datetime(2023, 1, 1, 12)}
+    assert calls == [None]
+
+    # Only new commits are mined
+    git_repo.commit({"app/bar.py": "bar"}, author_date="2023-02-01T12:00:00+00:00")
+    importance = GitImportance(git_repo.root, since=SINCE, cache_dir=cache_dir)
+    assert importance.last_modified_dict == {
+        "app/foo.py": datetime(2023, 1, 1, 12),
+        "app/bar.py": datetime(2023, 2, 1, 12),
+    }
+    assert calls == [None, first_commit]
+
+    # Requested time window is narrower than the cached one
+    importance = GitImportance(
+        git_repo.root, since=datetime(2023, 1, 15), cache_dir=cache_dir
+    )
+    assert importance.last_modified_dict == {"app/bar.py": datetime(2023, 2, 1, 12)}
+    assert calls == [None, first_commit]
+
+
+def test_git_importance_cache_committer_dates(git_repo, tmp_path):
+    # A commit authored long ago, and committed recently, e.g. cherry-picked
+    git_repo.commit({"app/foo.py": "foo"}, author_date="2023-03-01T12:00:00+00:00")
+    git_repo.commit(
+        {"app/bar.py": "bar"},
+        author_date="2022-06-01T12:00:00+00:00",
+        committer_date="2023-03-01T12:00:00+00:00",
+    )
+    cache_dir = str(tmp_path / "cache")
+    GitImportance(git_repo.root, since=SINCE, cache_dir=cache_dir)
+
+    # Cached and uncached runs select commits the same way
+    since = datetime(2023, 2, 1)
+    cached = GitImportance(git_repo.root, since=since, cache_dir=cache_dir)
+    uncached = GitImportance(git_repo.root, since=since)
+    assert cached.last_modified_dict == uncached.last_modified_dict
+    assert cached.last_modified_dict == {
+        "app/foo.py": datetime(2023, 3, 1, 12),
+        "app/bar.py": datetime(2022, 6, 1, 12),
+    }
+
+
+class IncludeEverything(CommitFilter):
+    def filter_commit(self, commit):
+        return FilterResult.INCLUDE
+
+
+def test_git_importance_cache_filter_keys(git_repo, tmp_path):
+    assert get_filter_key(ExcludeMessage("black")) == (
+        '["coverage_plot.git_changes.ExcludeMessage", {"message": "black"}]'
+    )
+    assert get_filter_key(IncludeEverything()) is None
+
+    # Filters without stable keys would get a new cache file in every process
+    git_repo.commit({"app/foo.py": "foo"})
+    cache_dir = tmp_path / "cache"
+    importance = GitImportance(
+        git_repo.root,
+        commit_filters=[IncludeEverything()],
+        since=SINCE,
+        cache_dir=str(cache_dir),
+    )
+    assert importance.last_modified_dict == {"app/foo.py": datetime(2023, 1, 1, 12)}
+    assert not cache_dir.exists()
+
+
+def test_git_importance_cache_history_rewrite(git_repo, tmp_path):
+    git_repo.commit({"app/foo.py": "foo"})
+    git_repo.commit({"app/bar.py": "bar"})
+    cache_dir = str(tmp_path / "cache")
+    GitImportance(git_repo.root, since=SINCE, cache_dir=cache_dir)
+
+    git_repo.git("reset", "-q", "--hard", "HEAD~1")
+    git_repo.commit({"app/baz.py": "baz"}, author_date="2023-02-01T12:00:00+00:00")
+    importance = GitImportance(git_repo.root, since=SINCE, cache_dir=cache_dir)
+    assert importance.last_modified_dict == {
+        "app/foo.py": datetime(2023, 1, 1, 12),
+        "app/baz.py": datetime(2023, 2, 1, 12),
+    }
+
+
+def test_get_last_modified_parallel(git_repo):
+    for i in range(20):
+        git_repo.commit(
+            {f"app/mod_{i % 7}.py": str(i), f"docs/page_{i % 3}.md": str(i)},
+            message="Apply black" if i % 5 == 0 else "Update files",
+            author_date=f"2023-01-{i + 1:02}T12:00:00+00:00",
+        )
+    args = (
+        git_repo.root,
+        [ExcludeMessage("black"), IncludeAllCommits()],
+        [IncludeFile("*.py"), ExcludeAllModifications()],
+    )
+    sequential = get_last_modified(*args, since=SINCE)
+    assert len(sequential) == 7
+    assert get_last_modified(*args, since=SINCE, workers=3) == sequential
+
+
+def test_get_last_modified_parallel_pydriller(git_repo):
+    git_repo.commit({"app/foo.py": "foo"})
+    with pytest.raises(ValueError):
+        get_last_modified(
+            git_repo.root,
+            [IncludeAllCommits()],
+            [ExcludeAllModifications()],
+            backend="pydriller",
+            workers=2,
+        )
+
+
+def test_timestamps_to_importance():
+    now = datetime.utcnow()
+    timestamps = [now - timedelta(days=days) for days in (0, 6, 7, 20, 100, 400)]
+    expected = [timestamp_to_importance(timestamp) for timestamp in timestamps]
+    last_modified = np.array(timestamps + [None], dtype="datetime64[us]")
+    assert list(timestamps_to_importance(last_modified, now)) == expected + [0]
+
+
+def test_git_importance_get_importances(git_repo):
+    git_repo.commit({"app/foo.py": "foo", "app/bar.py": "barbar"})
+    importance = GitImportance(git_repo.root, since=SINCE)
+    filenames = ["app/foo.py", "app/bar.py", "app/missing.py"]
+    expected = [importance.get_importance(filename) for filename in filenames]
+    assert expected[0] > 0
+    assert list(importance.get_importances(filenames)) == expected
+
+
+def test_git_importance_decay(git_repo):
+    # Commits of the test repository are made on 2023-01-01
+    git_repo.commit({"app/foo.py": "foo"})
+
+    # Ages are counted from the reference time, fixed for the whole run
+    for now, expected in [(datetime(2023, 1, 20), 1000), (datetime(2023, 2, 5), 0)]:
+        importance = GitImportance(
+            git_repo.root, since=SINCE, decay=StepDecay(30), now=now
+        )
+        assert importance.get_recency_importance("app/foo.py") == expected
+        assert list(importance.get_recency_importances(["app/foo.py"])) == [expected]
+
+
+def test_git_importance_prefetch_file_sizes(git_repo, monkeypatch):
+    git_repo.commit({"app/foo.py": "foo", "app/bar.py": "barbar"})
+    importance = GitImportance(git_repo.root, since=SINCE)
+    importance.prefetch_file_sizes()
+    assert importance.file_sizes == {"app/foo.py": 3, "app/bar.py": 6}
+
+    # Prefetched sizes are used without touching the file system
+    monkeypatch.setattr(os, "stat", None)
+    assert importance.get_filesize_importance("app/bar.py") == 6
+
+
+def test_git_importance_git_size_provider(git_repo):
+    git_repo.commit({"app/foo.py": "foo", "app/bar.py": "barbar"})
+    # Sizes are read from the commit, not from the work tree
+    os.remove(os.path.join(git_repo.root, "app/bar.py"))
+    importance = GitImportance(git_repo.root, since=SINCE, size_provider="git")
+    assert importance.get_filesize_importance("app/bar.py") == 6
+    assert importance.get_filesize_importance("app/missing.py") == 0
+
+    importance = GitImportance(git_repo.root, since=SINCE)
+    assert importance.get_filesize_importance("app/bar.py") == 0
+
+    # Unknown providers are rejected before mining git history
+    with pytest.raises(ValueError):
+        GitImportance(git_repo.root, since=SINCE, size_provider="svn")
+
+
+def test_git_importance_path_filter(git_repo, tmp_path):
+    git_repo.commit({"app/foo.py": "foo", "lib/bar.py": "bar"})
+    cache_dir = str(tmp_path / "cache")
+    importance = GitImportance(
+        git_repo.root, since=SINCE, workers=2, path_filter=PathFilter(["app"])
+    )
+    assert list(importance.last_modified_dict) == ["app/foo.py"]
+
+    # Histories of different selections are cached separately
+    for path_filter, expected in [
+        (PathFilter(["app"]), ["app/foo.py"]),
+        (None, ["app/foo.py", "lib/bar.py"]),
+        (PathFilter(["lib"]), ["lib/bar.py"]),
+    ]:
+        importance = GitImportance(
+            git_repo.root, since=SINCE, cache_dir=cache_dir, path_filter=path_filter
+        )
+        assert sorted(importance.last_modified_dict) == expected
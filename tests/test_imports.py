@@ -0,0 +1,44 @@
+import subprocess
+import sys
+
+import pytest
+
+# Cumulative import time of the CLI entry point, in microseconds. Importing it
+# used to take about 800ms with pandas, plotly and pydriller loaded eagerly.
+CLI_IMPORT_BUDGET = 300_000
+
+
+def get_import_times(statement: str):
+    """Return the cumulative import time of every module, in microseconds."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_cli_import_time():
+    times = get_import_times("import coverage_plot.cli")
+    assert times["coverage_plot.cli"] < CLI_IMPORT_BUDGET
+    assert not {"numpy", "pandas", "plotly", "pydriller"} & set(times)
+
+
+@pytest.mark.parametrize(
+    "statement, unexpected",
+    [
+        ("import coverage_plot", {"numpy", "pandas", "plotly", "pydriller"}),
+        ("from coverage_plot import import_json_file", {"pandas", "plotly"}),
+        ("import coverage_plot.importance_recency", {"pydriller", "git"}),
+    ],
+)
+def test_heavy_dependencies_are_lazy(statement, unexpected):
+    assert not unexpected & set(get_import_times(statement))
@@ -0,0 +1,120 @@
+import json
+
+import pytest
+
+from coverage_plot.importance_filesize import FileSizeImportance
+from coverage_plot.line_coverage import (
+    LineReport,
+    import_json_lines,
+    import_lines_file,
+    import_shards,
+    import_xml_lines,
+    make_bitmap,
+    merge_line_reports,
+)
+from coverage_plot.path_filter import PathFilter
+from coverage_plot.plot import FileCoverage, export_df
+
+
+def write_json_shard(filename, files):
+    raw_report = {
+        "meta": {"version": "7.2.3"},
+        "files": {
+            path: {
+                "executed_lines": executed,
+                "summary": {"covered_lines": len(executed)},
+                "missing_lines": missing,
+                "contexts": {"1": ["test_foo"]},
+            }
+            for path, (executed, missing) in files.items()
+        },
+    }
+    filename.write_text(json.dumps(raw_report))
+    return str(filename)
+
+
+def write_xml_shard(filename, files):
+    classes = "".join(
+        f'<class filename="{path}"><lines>'
+        + "".join(f'<line number="{n}" hits="1"/>' for n in executed)
+        + "".join(f'<line number="{n}" hits="0"/>' for n in missing)
+        + "</lines></class>"
+        for path, (executed, missing) in files.items()
+    )
+    filename.write_text(
+        "<coverage><sources><source>/src/app</source></sources>"
+        f"<packages><package><classes>{classes}</classes></package></packages>"
+        "</coverage>"
+    )
+    return str(filename)
+
+
+def test_make_bitmap():
+    assert make_bitmap([]) == 0
+    assert make_bitmap([1, 3, 3, 9]) == 0b1000001010
+    assert make_bitmap(range(1000)) == 2**1000 - 1
+
+
+def test_import_json_lines(tmp_path):
+    filename = write_json_shard(
+        tmp_path / "coverage.json",
+        {"app/views.py": ([1, 2], [3, 5]), "lib/utils.py": ([], [1])},
+    )
+    report = import_json_lines(filename)
+    assert list(report.paths) == ["app/views.py", "lib/utils.py"]
+    assert report.statements[0] == 0b101110
+    assert report.executed[0] == 0b110
+    assert dict(report) == {
+        "app/views.py": FileCoverage(2, 2),
+        "lib/utils.py": FileCoverage(0, 1),
+    }
+    assert list(import_json_lines(filename, PathFilter(["lib"]))) == ["lib/utils.py"]
+
+
+def test_import_xml_lines(tmp_path):
+    filename = write_xml_shard(tmp_path / "coverage.xml", {"views.py": ([1], [2, 4])})
+    report = import_xml_lines(filename)
+    assert list(report.paths) == ["app/views.py"]
+    assert report.statements[0] == 0b10110
+    assert report.executed[0] == 0b10
+
+
+def test_merge_shards():
+    # Line 2 is covered in one shard and missing in the other, and must be
+    # counted once
+    first = LineReport.from_mapping({"a.py": (0b110, 0b010), "b.py": (0b1, 0b1)})
+    second = LineReport.from_mapping({"a.py": (0b110, 0b100), "b.py": (0b1, 0)})
+    merged = first.merge(second)
+    assert dict(merged) == {"a.py": FileCoverage(2, 0), "b.py": FileCoverage(1, 0)}
+
+
+def test_merge_shards_with_different_files():
+    first = LineReport.from_mapping({"b.py": (0b110, 0b010)})
+    second = LineReport.from_mapping({"a.py": (0b1, 0b1), "b.py": (0b110, 0)})
+    third = LineReport.from_mapping({})
+    merged = merge_line_reports([first, second, third])
+    assert dict(merged) == {"a.py": FileCoverage(1, 0), "b.py": FileCoverage(1, 1)}
+    assert len(merge_line_reports([])) == 0
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_import_shards(tmp_path, workers):
+    filenames = [
+        write_json_shard(tmp_path / "coverage-1.json", {"app/a.py": ([1], [2, 3])}),
+        write_json_shard(tmp_path / "coverage-2.json", {"app/a.py": ([2], [1, 3])}),
+        write_xml_shard(tmp_path / "coverage-3.xml", {"b.py": ([], [1])}),
+    ]
+    report = import_shards(filenames, workers=workers)
+    assert dict(report) == {
+        "app/a.py": FileCoverage(2, 1),
+        "app/b.py": FileCoverage(0, 1),
+    }
+
+    df = export_df(report, FileSizeImportance(report))
+    assert list(df["path"]) == ["app/a.py", "app/b.py"]
+    assert list(df["percent_covered"]) == pytest.approx([100 * 2 / 3, 0])
+
+
+def test_import_lines_file_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        import_lines_file(str(tmp_path / ".coverage"))
@@ -0,0 +1,35 @@
+import pytest
+
+from coverage_plot.path_filter import PathFilter
+
+
+@pytest.mark.parametrize(
+    "path, expected",
+    [
+        ("services/billing/api.py", True),
+        ("services/billing", True),
+        ("services/billing2/api.py", False),
+        ("services/billing/legacy/api.py", False),
+        ("services/auth/api.py", False),
+        ("setup.py", True),
+    ],
+)
+def test_path_filter_matches(path, expected):
+    path_filter = PathFilter(
+        include=["services/billing/", "./setup.py"],
+        exclude=["services/billing/legacy"],
+    )
+    assert path_filter.matches(path) == expected
+
+
+def test_path_filter_exclude_only():
+    path_filter = PathFilter(exclude=["vendor"])
+    assert path_filter.matches("app/views.py")
+    assert not path_filter.matches("vendor/lib.py")
+    assert path_filter.get_pathspecs() == [":(top)", ":(top,literal,exclude)vendor"]
+
+
+def test_path_filter_key():
+    assert PathFilter(["a/", "b"]) == PathFilter(["b", "a"])
+    assert PathFilter(["a/", "b"]).get_key() == PathFilter(["b", "a"]).get_key()
+    assert PathFilter(["a"]).get_key() != PathFilter(exclude=["a"]).get_key()
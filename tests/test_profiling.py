@@ -0,0 +1,57 @@
+import io
+import json
+
+import pytest
+
+from coverage_plot.importance_filesize import FileSizeImportance
+from coverage_plot.plot import FileCoverage, export_df, plot_treemap
+from coverage_plot.profiling import Profiler, stage
+
+
+def test_profiler_stage():
+    profiler = Profiler()
+    with profiler.stage("count") as stats:
+        stats.items = sum(1 for _ in range(1000))
+    [stats] = profiler.stages
+    assert stats.name == "count"
+    assert stats.items == 1000
+    assert stats.wall_time > 0
+    assert stats.cpu_time >= 0
+    assert stats.peak_memory_delta is None or stats.peak_memory_delta >= 0
+
+
+def test_profiler_records_failed_stage():
+    profiler = Profiler()
+    with pytest.raises(ValueError):
+        with profiler.stage("fail"):
+            raise ValueError()
+    assert [stats.name for stats in profiler.stages] == ["fail"]
+
+
+def test_stage_without_profiler():
+    with stage(None, "noop") as stats:
+        stats.items = 1
+
+
+def test_plot_treemap_profiler():
+    report = {"app/utils.py": FileCoverage(40, 3), "app/views.py": FileCoverage(1, 2)}
+    profiler = Profiler()
+    plot_treemap(report, FileSizeImportance(report), max_nodes=2, profiler=profiler)
+    items = {stats.name: stats.items for stats in profiler.stages}
+    assert items == {
+        "score_report": 2,
+        "split_paths": 2,
+        "build_tree": 3,
+        "fold_tree": 2,
+        "make_figure": 2,
+    }
+
+
+def test_export_df_profiler():
+    report = {"app/utils.py": FileCoverage(40, 3)}
+    profiler = Profiler()
+    export_df(report, FileSizeImportance(report), profiler=profiler)
+    fd = io.StringIO()
+    profiler.dump(fd)
+    stages = json.loads(fd.getvalue())["stages"]
+    assert [stats["name"] for stats in stages] == ["score_report", "export_df"]
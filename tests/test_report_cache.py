@@ -0,0 +1,147 @@
+import io
+import os
+
+import pytest
+
+from coverage_plot import report_cache
+from coverage_plot.path_filter import PathFilter
+from coverage_plot.plot import (
+    FileCoverage,
+    import_json,
+    import_json_file,
+    import_xml_file,
+)
+from coverage_plot.report_cache import ReportCache
+
+XML_REPORT = """<?xml version="1.0" ?>
+<coverage>
+    <sources><source>/home/user/app</source></sources>
+    <packages><package name="app"><classes>
+        <class filename="utils.py">
+            <lines><line number="1" hits="1"/><line number="2" hits="0"/></lines>
+        </class>
+        <class filename="views/ünicode.py">
+            <lines><line number="1" hits="0"/></lines>
+        </class>
+    </classes></package></packages>
+</coverage>
+"""
+
+
+def make_old_file(path, content):
+    """Write the file with the same size and modification time every time."""
+    path.write_text(content, encoding="utf-8")
+    os.utime(path, (1_000_000_000, 1_000_000_000))
+    return str(path)
+
+
+def test_report_cache_hit(tmp_path, monkeypatch):
+    # Files in tests are too fresh to trust their stat signatures otherwise
+    monkeypatch.setattr(report_cache, "RACY_NANOSECONDS", -1)
+    filename = make_old_file(tmp_path / "coverage.xml", XML_REPORT)
+    cache = ReportCache(str(tmp_path / "cache"))
+    report = import_xml_file(filename, cache=cache)
+    assert dict(report) == {
+        "app/utils.py": FileCoverage(1, 1),
+        "app/views/ünicode.py": FileCoverage(0, 1),
+    }
+
+    # Neither parsing nor hashing happens on a hit with the same stat signature
+    def fail(*args):
+        raise AssertionError("Not cached")
+
+    monkeypatch.setattr(report_cache, "hash_file", fail)
+    cached_report = import_xml_file(filename, cache=ReportCache(cache.cache_dir))
+    assert dict(cached_report) == dict(report)
+
+
+def test_report_cache_rehashes_fresh_files(tmp_path, monkeypatch):
+    filename = make_old_file(tmp_path / "coverage.xml", XML_REPORT)
+    cache = ReportCache(str(tmp_path / "cache"))
+    import_xml_file(filename, cache=cache)
+    hashed = []
+    monkeypatch.setattr(report_cache, "hash_file", hashed.append)
+    import_xml_file(filename, cache=ReportCache(cache.cache_dir))
+    assert hashed == [os.path.realpath(filename)]
+
+
+def test_report_cache_invalidated_by_content(tmp_path, monkeypatch):
+    monkeypatch.setattr(report_cache, "RACY_NANOSECONDS", -1)
+    filename = make_old_file(tmp_path / "coverage.xml", XML_REPORT)
+    cache = ReportCache(str(tmp_path / "cache"))
+    import_xml_file(filename, cache=cache)
+    make_old_file(tmp_path / "coverage.xml", XML_REPORT.replace('hits="0"', 'hits="3"'))
+    report = import_xml_file(filename, cache=ReportCache(cache.cache_dir))
+    assert report["app/utils.py"] == FileCoverage(2, 0)
+
+
+def test_report_cache_separates_importers(tmp_path):
+    cache = ReportCache(str(tmp_path))
+    content = (
+        '{"files": {"app.py": {"summary": {"covered_lines": 1, "missing_lines": 2}}}}'
+    )
+    assert dict(import_json(content, cache=cache)) == {"app.py": FileCoverage(1, 2)}
+    assert dict(import_json(content, cache=cache)) == {"app.py": FileCoverage(1, 2)}
+    assert len(list(tmp_path.glob("report-json-*.npz"))) == 1
+
+
+def test_report_cache_separates_path_filters(tmp_path):
+    filename = make_old_file(tmp_path / "coverage.xml", XML_REPORT)
+    cache = ReportCache(str(tmp_path / "cache"))
+    path_filter = PathFilter(["app/views"])
+    report = import_xml_file(filename, cache=cache, path_filter=path_filter)
+    assert list(report) == ["app/views/ünicode.py"]
+    assert len(import_xml_file(filename, cache=cache)) == 2
+    report = import_xml_file(filename, cache=cache, path_filter=path_filter)
+    assert list(report) == ["app/views/ünicode.py"]
+
+
+def test_report_cache_empty_report(tmp_path):
+    filename = make_old_file(tmp_path / "coverage.json", '{"files": {}}')
+    cache = ReportCache(str(tmp_path / "cache"))
+    assert len(import_json_file(filename, cache=cache)) == 0
+    assert len(import_json_file(filename, cache=cache)) == 0
+
+
+def test_report_cache_skips_file_objects(tmp_path):
+    cache = ReportCache(str(tmp_path))
+    report = import_xml_file(io.BytesIO(XML_REPORT.encode("utf-8")), cache=cache)
+    assert len(report) == 2
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_report_cache_evicts_least_recently_used(tmp_path):
+    cache = ReportCache(str(tmp_path))
+    report = import_xml_file(io.BytesIO(XML_REPORT.encode("utf-8")))
+    cache.save("first", report)
+    cache.max_bytes = 2 * os.path.getsize(cache.get_filename("first"))
+    os.utime(cache.get_filename("first"), (1, 1))
+    cache.save("second", report)
+    os.utime(cache.get_filename("second"), (2, 2))
+    # Loading the first report makes it the most recently used one
+    assert cache.load("first") is not None
+    cache.save("third", report)
+    assert cache.load("second") is None
+    assert cache.load("first") is not None
+    assert cache.load("third") is not None
+
+
+@pytest.mark.parametrize("key", ["missing", "corrupted"])
+def test_report_cache_miss(tmp_path, key):
+    cache = ReportCache(str(tmp_path))
+    (tmp_path / "report-corrupted.npz").write_bytes(b"garbage")
+    assert cache.load(key) is None
+
+
+@pytest.mark.parametrize("error", [FileNotFoundError, PermissionError])
+def test_report_cache_hit_without_utime(tmp_path, monkeypatch, error):
+    # The report was evicted by another process after loading, or the cache is
+    # read-only
+    cache = ReportCache(str(tmp_path))
+    cache.save("first", import_xml_file(io.BytesIO(XML_REPORT.encode("utf-8"))))
+
+    def utime(filename):
+        raise error(filename)
+
+    monkeypatch.setattr(os, "utime", utime)
+    assert len(cache.load("first")) == 2
@@ -0,0 +1,89 @@
+import os
+import threading
+import urllib.error
+import urllib.request
+
+import plotly.graph_objects as go
+import pytest
+
+from coverage_plot.serve import FileWatcher, PlotPage, PlotServer
+
+
+def test_file_watcher_ignores_touch(tmp_path):
+    filename = tmp_path / "coverage.json"
+    filename.write_text("{}")
+    watcher = FileWatcher(str(filename))
+    assert watcher.poll()
+    assert not watcher.poll()
+
+    stat = os.stat(filename)
+    os.utime(filename, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert not watcher.poll()
+
+    filename.write_text('{"files": {}}')
+    assert watcher.poll()
+
+
+def test_plot_page_wait_for_update():
+    page = PlotPage()
+    page.update("<html><body>first</body></html>")
+    assert page.wait_for_update(0, timeout=0) == 1
+    assert page.wait_for_update(1, timeout=0) == 1
+
+    timer = threading.Timer(0.05, page.update, ["<html><body>second</body></html>"])
+    timer.start()
+    assert page.wait_for_update(1, timeout=5) == 2
+    assert "second" in page.html
+    assert "})(2);" in page.html
+
+
+def test_plot_server(tmp_path):
+    filename = tmp_path / "coverage.txt"
+    filename.write_text("first")
+
+    def render():
+        return go.Figure(layout={"title": {"text": filename.read_text()}})
+
+    server = PlotServer(str(filename), render, port=0)
+    server.start()
+    try:
+        with urllib.request.urlopen(server.url) as response:
+            assert "first" in response.read().decode("utf-8")
+
+        filename.write_text("second")
+        assert server.refresh()
+        with urllib.request.urlopen(f"{server.url}version?after=1") as response:
+            assert response.read() == b"2"
+        with urllib.request.urlopen(server.url) as response:
+            assert "second" in response.read().decode("utf-8")
+
+        with pytest.raises(urllib.error.HTTPError) as exc_info:
+            urllib.request.urlopen(f"{server.url}version?after=latest")
+        assert exc_info.value.code == 400
+    finally:
+        server.stop()
+
+
+def test_plot_server_keeps_page_on_errors(tmp_path):
+    filename = tmp_path / "coverage.txt"
+    filename.write_text("first")
+    texts = []
+
+    def render():
+        text = filename.read_text()
+        if text == "broken":
+            raise ValueError(text)
+        texts.append(text)
+        return go.Figure()
+
+    server = PlotServer(str(filename), render, port=0)
+    server.start()
+    try:
+        filename.write_text("broken")
+        assert not server.refresh()
+        assert server.page.version == 1
+        filename.write_text("second")
+        assert server.refresh()
+        assert texts == ["first", "second"]
+    finally:
+        server.stop()